@@ -0,0 +1,216 @@
+"""Headless JSON API for prayer times.
+
+Serves the same geocode -> timings -> formatting pipeline as the
+Streamlit app over plain HTTP, for mobile apps, signage screens and
+anything else that should not hold a Streamlit websocket session:
+
+    python api_server.py --port 8080
+    curl 'http://localhost:8080/v1/times?q=Douglasville,%20GA&method=2'
+
+Query parameters for ``/v1/times``:
+
+    q        location to geocode (or pass ``lat`` and ``lon``)
+    date     DD-MM-YYYY or YYYY-MM-DD, default today in the location's timezone
+    method   AlAdhan method id (1, 2, 3 or 4), default 2
+    tz       IANA timezone, default inferred from the coordinates
+
+Responses carry a strong ETag and a ``Cache-Control`` lifetime that ends
+at the next local midnight; ``If-None-Match`` revalidation returns 304.
+``/metrics`` exposes the process's latency histograms and cache counters
+in the Prometheus text format.
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import logging
+import math
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+import config
+import metrics
+from prayer_calc import METHODS, PRAYER_NAMES
+from prayer_service import fetch_timings_for_date, geocode_location
+from schedule import DaySchedule
+import timezones
+from timezones import infer_timezone
+
+logger = logging.getLogger(__name__)
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def _parse_date(value, tz_name):
+    if not value:
+        return timezones.today_in(tz_name)
+    for fmt in ("%d-%m-%Y", "%Y-%m-%d"):
+        try:
+            return datetime.datetime.strptime(value, fmt).date()
+        except ValueError:
+            pass
+    raise ApiError(400, "date must be DD-MM-YYYY or YYYY-MM-DD")
+
+
+def _param(params, name, default=None):
+    values = params.get(name)
+    return values[0] if values else default
+
+
+def seconds_until_midnight(tz_name, now=None):
+    """Seconds until the next midnight in ``tz_name``, DST included."""
+    return int(timezones.seconds_until_midnight(tz_name, now))
+
+
+def build_times(params):
+    """The ``/v1/times`` response body (a dict) for parsed query parameters."""
+    try:
+        method = int(_param(params, "method", 2))
+    except ValueError:
+        method = None
+    if method not in METHODS:
+        raise ApiError(400, f"method must be one of {sorted(METHODS)}")
+
+    query = _param(params, "q")
+    if _param(params, "lat") is not None and _param(params, "lon") is not None:
+        try:
+            lat, lon = float(_param(params, "lat")), float(_param(params, "lon"))
+        except ValueError:
+            raise ApiError(400, "lat and lon must be numbers")
+        if not (math.isfinite(lat) and math.isfinite(lon) and -90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ApiError(400, "lat must be between -90 and 90 and lon between -180 and 180")
+        display_name = query
+    elif query:
+        try:
+            lat, lon, display_name = geocode_location(query)
+        except requests.RequestException as e:
+            raise ApiError(502, f"geocoding failed: {e}")
+        if lat is None:
+            raise ApiError(404, f"could not find coordinates for '{query}'")
+    else:
+        raise ApiError(400, "pass q, or lat and lon")
+
+    tz_name = _param(params, "tz") or infer_timezone(lat, lon)
+    if not timezones.is_valid_timezone(tz_name):
+        raise ApiError(400, f"unknown timezone '{tz_name}'")
+    date = _parse_date(_param(params, "date"), tz_name)
+
+    try:
+        payload = fetch_timings_for_date(lat, lon, date, method, tz_name)
+    except requests.RequestException as e:
+        raise ApiError(502, f"fetching timings failed: {e}")
+    if payload is None:
+        raise ApiError(502, "no timings returned upstream")
+
+    schedule = DaySchedule.from_payload(payload, tz_name, date)
+    return {
+        "location": {"query": query, "latitude": lat, "longitude": lon, "display_name": display_name},
+        "timezone": tz_name,
+        "date": date.isoformat(),
+        "method": {"id": method, "name": METHODS[method]["name"]},
+        "timings": {name: payload["timings"][name][:5] for name in PRAYER_NAMES},
+        "formatted": {name: schedule.formatted(name) for name in PRAYER_NAMES},
+        "suhoor": schedule.formatted("Fajr"),
+        "iftar": schedule.formatted("Maghrib"),
+        "hijri": payload["date"]["hijri"],
+        "source": payload.get("meta", {}).get("source", "api"),
+    }
+
+
+def etag_for(body):
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(header, etag):
+    if not header:
+        return False
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    server_version = "RamadanTimesAPI/1.0"
+
+    def do_GET(self):
+        try:
+            self._route(urlsplit(self.path))
+        except Exception:
+            # Anything unexpected still gets a response instead of a dropped connection
+            logger.exception("Unhandled error serving %s", self.path)
+            self._send_json(500, {"error": "internal server error"}, cache_control="no-store")
+
+    def _route(self, url):
+        if url.path == "/healthz":
+            self._send_json(200, {"status": "ok"}, cache_control="no-store")
+            return
+        if url.path == "/metrics":
+            self._send_text(200, metrics.export_prometheus(), "text/plain; version=0.0.4; charset=utf-8")
+            return
+        if url.path != "/v1/times":
+            self._send_json(404, {"error": "not found"}, cache_control="no-store")
+            return
+        try:
+            with metrics.span("api:/v1/times"):
+                data = build_times(parse_qs(url.query))
+        except ApiError as e:
+            self._send_json(e.status, {"error": e.message}, cache_control="no-store")
+            return
+        max_age = seconds_until_midnight(data["timezone"])
+        self._send_json(200, data, cache_control=f"public, max-age={max_age}", conditional=True)
+
+    def _send_text(self, status, text, content_type):
+        body = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, data, cache_control, conditional=False):
+        body = json.dumps(data, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        etag = etag_for(body)
+        if conditional and etag_matches(self.headers.get("If-None-Match"), etag):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", cache_control)
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", cache_control)
+        if conditional:
+            self.send_header("ETag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def make_server(host=None, port=None):
+    return ThreadingHTTPServer((host or config.API_HOST, config.API_PORT if port is None else port), ApiHandler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve prayer times as JSON")
+    parser.add_argument("--host", default=config.API_HOST)
+    parser.add_argument("--port", type=int, default=config.API_PORT)
+    args = parser.parse_args()
+    server = make_server(args.host, args.port)
+    print(f"Serving on http://{args.host}:{args.port}/v1/times")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
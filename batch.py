@@ -0,0 +1,179 @@
+"""Vectorized prayer timetables for many locations and dates at once.
+
+The same algorithm as ``prayer_calc`` (and therefore the same results,
+minute for minute), evaluated with NumPy over a ``(locations, days)``
+grid instead of a Python loop per day. NumPy is an optional dependency
+that is only needed for this module:
+
+    pip install numpy
+"""
+import datetime
+
+from prayer_calc import IMSAK_MINUTES, METHODS, POLAR_LATITUDE_STEP, PRAYER_NAMES, RISE_SET_ANGLE, julian_date
+from timezones import localize
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+# Minutes value of a time that could not be computed (e.g. a NaN coordinate)
+MISSING = -1
+
+
+class BatchTimetable:
+    """Prayer times for ``len(locations)`` x ``len(dates)`` cells.
+
+    ``minutes`` is an int16 array of shape ``(6, locations, days)`` holding
+    minutes after local midnight for each name in ``names``, or
+    ``MISSING`` where ``valid`` (a bool array of the same shape) is False.
+    """
+
+    __slots__ = ("names", "dates", "minutes", "valid")
+
+    def __init__(self, names, dates, minutes, valid):
+        self.names = names
+        self.dates = dates
+        self.minutes = minutes
+        self.valid = valid
+
+    def __getitem__(self, name):
+        """``(locations, days)`` minutes array for one prayer."""
+        return self.minutes[self.names.index(name)]
+
+    def timings(self, location_index, day_index):
+        """AlAdhan-style ``{"Fajr": "HH:MM", ...}`` for one cell; missing times are None."""
+        cell = self.minutes[:, location_index, day_index]
+        return {
+            name: f"{m // 60:02d}:{m % 60:02d}" if m != MISSING else None
+            for name, m in zip(self.names, cell.tolist())
+        }
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("batch timetables need NumPy: pip install numpy")
+
+
+def _fix(a, b):
+    return a - b * np.floor(a / b)
+
+
+def _sun_position(jd):
+    d = jd - 2451545.0
+    g = np.radians(_fix(357.529 + 0.98560028 * d, 360))
+    q = _fix(280.459 + 0.98564736 * d, 360)
+    l = np.radians(_fix(q + 1.915 * np.sin(g) + 0.020 * np.sin(2 * g), 360))
+    e = np.radians(23.439 - 0.00000036 * d)
+    ra = _fix(np.degrees(np.arctan2(np.cos(e) * np.sin(l), np.cos(l))) / 15.0, 24)
+    decl = np.degrees(np.arcsin(np.sin(e) * np.sin(l)))
+    return decl, q / 15.0 - ra
+
+
+def _mid_day(jd, t):
+    _, eqt = _sun_position(jd + t)
+    return _fix(12 - eqt, 24)
+
+
+def _sun_angle_time(jd, lat, angle, t, ccw=False):
+    decl, _ = _sun_position(jd + t)
+    noon = _mid_day(jd, t)
+    rlat, rdecl = np.radians(lat), np.radians(decl)
+    cos_h = (-np.sin(np.radians(angle)) - np.sin(rdecl) * np.sin(rlat)) / (np.cos(rdecl) * np.cos(rlat))
+    valid = np.abs(cos_h) <= 1
+    h = np.where(valid, np.degrees(np.arccos(np.clip(cos_h, -1, 1))) / 15.0, np.nan)
+    return noon - h if ccw else noon + h
+
+
+def _asr_time(jd, lat, t):
+    decl, _ = _sun_position(jd + t)
+    angle = -np.degrees(np.arctan(1.0 / (1 + np.tan(np.radians(np.abs(lat - decl))))))
+    return _sun_angle_time(jd, lat, angle, t)
+
+
+def _utc_offsets(tz_names, dates):
+    """``(locations, days)`` UTC offsets in hours, one zone lookup per unique zone and day."""
+    unique = sorted(set(tz_names))
+    per_zone = np.empty((len(unique), len(dates)))
+    for i, name in enumerate(unique):
+        for j, date in enumerate(dates):
+            noon = localize(date, datetime.time(12, 0), name)
+            per_zone[i, j] = noon.utcoffset().total_seconds() / 3600.0
+    index = np.array([unique.index(name) for name in tz_names])
+    return per_zone[index]
+
+
+def compute_timetable(lats, lons, tz_names, methods, start_date, days, names=PRAYER_NAMES):
+    """Compute prayer times for every location on ``days`` consecutive dates.
+
+    ``lats``, ``lons``, ``tz_names`` and ``methods`` are equal-length
+    sequences describing the locations (``methods`` may also be a single
+    AlAdhan method id). Returns a ``BatchTimetable``.
+    """
+    _require_numpy()
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+    n = lats.shape[0]
+    if np.ndim(methods) == 0:
+        methods = [methods] * n
+    tz_names = list(tz_names)
+    if not (lons.shape[0] == len(tz_names) == len(methods) == n):
+        raise ValueError("lats, lons, tz_names and methods must have the same length")
+    dates = [start_date + datetime.timedelta(days=i) for i in range(days)]
+
+    # Per-location method parameters, broadcast against the day axis
+    fajr_angle = np.array([METHODS[m]["fajr"] for m in methods])[:, None]
+    isha_angle = np.array([METHODS[m].get("isha", np.nan) for m in methods])[:, None]
+    isha_minutes = np.array([METHODS[m].get("isha_minutes", np.nan) for m in methods])[:, None]
+
+    lat = lats[:, None]
+    lon = lons[:, None]
+    jd0 = np.array([julian_date(d) for d in dates])[None, :]
+    jd = jd0 - lon / (15.0 * 24.0)
+
+    # Polar day or night: as in prayer_calc, each such cell steps towards the
+    # equator until it reaches a latitude where the sun rises and sets
+    lat = np.repeat(lat, days, axis=1)
+    polar = np.ones(lat.shape, dtype=bool)
+    sunrise, sunset, asr = (np.empty(lat.shape) for _ in range(3))
+    while True:
+        sunrise[polar] = _sun_angle_time(jd, lat, RISE_SET_ANGLE, 6 / 24.0, ccw=True)[polar]
+        sunset[polar] = _sun_angle_time(jd, lat, RISE_SET_ANGLE, 18 / 24.0)[polar]
+        asr[polar] = _asr_time(jd, lat, 13 / 24.0)[polar]
+        polar &= (np.isnan(sunrise) | np.isnan(sunset) | np.isnan(asr)) & (np.abs(lat) > POLAR_LATITUDE_STEP)
+        if not polar.any():
+            break
+        lat = np.where(polar, lat - np.copysign(POLAR_LATITUDE_STEP, lat), lat)
+
+    fajr = _sun_angle_time(jd, lat, fajr_angle, 5 / 24.0, ccw=True)
+    dhuhr = _mid_day(jd, 12 / 24.0)
+    isha = _sun_angle_time(jd, lat, np.nan_to_num(isha_angle), 18 / 24.0)
+
+    shift = _utc_offsets(tz_names, dates) - lon / 15.0
+    fajr, sunrise, dhuhr, asr, sunset, isha = (t + shift for t in (fajr, sunrise, dhuhr, asr, sunset, isha))
+
+    # Angle-based high-latitude adjustment, as in prayer_calc
+    night = _fix(sunrise - sunset, 24)
+    fajr_portion = fajr_angle / 60.0 * night
+    fajr = np.where(np.isnan(fajr) | (_fix(sunrise - fajr, 24) > fajr_portion), sunrise - fajr_portion, fajr)
+    isha_portion = np.nan_to_num(isha_angle) / 60.0 * night
+    isha = np.where(np.isnan(isha) | (_fix(isha - sunset, 24) > isha_portion), sunset + isha_portion, isha)
+    isha = np.where(np.isnan(isha_minutes), isha, sunset + np.nan_to_num(isha_minutes) / 60.0)
+
+    hours = {
+        "Imsak": fajr - IMSAK_MINUTES / 60.0,
+        "Fajr": fajr,
+        "Sunrise": sunrise,
+        "Dhuhr": dhuhr,
+        "Asr": asr,
+        "Sunset": sunset,
+        "Maghrib": sunset,
+        "Isha": isha,
+        "Midnight": sunset + night / 2.0,
+    }
+    minutes = np.full((len(names), n, days), MISSING, dtype=np.int16)
+    valid = np.empty((len(names), n, days), dtype=bool)
+    for i, name in enumerate(names):
+        valid[i] = np.isfinite(hours[name])
+        minutes[i][valid[i]] = np.floor(_fix(hours[name][valid[i]] + 0.5 / 60.0, 24) * 60)
+    return BatchTimetable(list(names), dates, minutes, valid)
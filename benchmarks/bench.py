@@ -0,0 +1,153 @@
+"""Offline benchmark of the app's hot paths.
+
+Runs against the local AlAdhan/Nominatim stubs and reports per-stage
+latency percentiles and allocations as JSON:
+
+    python -m benchmarks.bench --iterations 200 --latency-ms 50 -o bench.json
+
+Stages cover geocoding, the two timing fetches (cold and warm cache),
+``format_time`` and whole-script reruns of main.py driven through
+Streamlit's ``AppTest`` harness (a first load with empty caches, and a
+warm rerun of an existing session).
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from benchmarks.stats import summarize
+from benchmarks.stubs import StubUpstreams
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN_SCRIPT = os.path.join(ROOT, "main.py")
+LOCATION = "Douglasville, GA"
+TZ_NAME = "America/New_York"
+METHOD = 2
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def measure(fn, iterations, setup=None, alloc_iterations=20):
+    """Time ``fn`` ``iterations`` times, then trace allocations on a few more runs."""
+    durations = []
+    for _ in range(iterations):
+        if setup:
+            setup()
+        started = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - started)
+
+    peaks, nets = [], []
+    tracemalloc.start()
+    try:
+        for _ in range(min(alloc_iterations, iterations)):
+            if setup:
+                setup()
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            fn()
+            after, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - before)
+            nets.append(after - before)
+    finally:
+        tracemalloc.stop()
+
+    result = summarize(durations)
+    result["alloc_peak_kib"] = max(peaks) / 1024.0 if peaks else None
+    result["alloc_net_kib"] = (sum(nets) / len(nets)) / 1024.0 if nets else None
+    return result
+
+
+def run(iterations, rerun_iterations):
+    # Imported here so config picks up the stub URLs exported by StubUpstreams
+    import cache
+    import prayer_service
+    from schedule import format_time
+    from streamlit.testing.v1 import AppTest
+
+    def clear_caches():
+        cache.geocode_cache.clear()
+        cache.timings_cache.clear()
+
+    lat, lon, _ = prayer_service.geocode_location(LOCATION)
+    stages = {}
+
+    stages["geocode_cold"] = measure(lambda: prayer_service.geocode_location(LOCATION), iterations, setup=cache.geocode_cache.clear)
+    stages["geocode_warm"] = measure(lambda: prayer_service.geocode_location(LOCATION), iterations)
+
+    fetch_today = lambda: prayer_service.fetch_prayer_times(lat, lon, METHOD, TZ_NAME)
+    fetch_tomorrow = lambda: prayer_service.fetch_next_day_prayer_times(lat, lon, METHOD, TZ_NAME)
+    stages["fetch_prayer_times_cold"] = measure(fetch_today, iterations, setup=cache.timings_cache.clear)
+    stages["fetch_prayer_times_warm"] = measure(fetch_today, iterations)
+    stages["fetch_next_day_prayer_times_cold"] = measure(fetch_tomorrow, iterations, setup=cache.timings_cache.clear)
+    stages["fetch_next_day_prayer_times_warm"] = measure(fetch_tomorrow, iterations)
+
+    stages["format_time"] = measure(lambda: format_time("18:27"), iterations * 10)
+
+    def first_load():
+        app = AppTest.from_file(MAIN_SCRIPT, default_timeout=60)
+        app.run()
+        if app.exception:
+            raise RuntimeError(app.exception[0].value)
+
+    stages["rerun_first_load"] = measure(first_load, rerun_iterations, setup=clear_caches, alloc_iterations=5)
+
+    session = AppTest.from_file(MAIN_SCRIPT, default_timeout=60)
+    session.run()
+    stages["rerun_warm"] = measure(session.run, rerun_iterations, alloc_iterations=5)
+    return stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark main.py hot paths against local upstream stubs")
+    parser.add_argument("--iterations", type=int, default=100, help="samples per function-level stage")
+    parser.add_argument("--reruns", type=int, default=30, help="samples per full-script rerun stage")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="stub response latency")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="extra random stub latency")
+    parser.add_argument("-o", "--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    # Cold stages must reach the stubs, not an on-disk store left by an earlier run
+    os.environ.setdefault("RAMADAN_STORE_PATH", "")
+    # The stubs have no usage policy; do not pace geocoding at Nominatim's 1/s
+    os.environ.setdefault("RAMADAN_GEOCODE_RATE", "0")
+    with StubUpstreams(args.latency_ms / 1000.0, args.jitter_ms / 1000.0) as stubs:
+        stages = run(args.iterations, args.reruns)
+        upstream_requests = stubs.requests
+
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+            "reruns": args.reruns,
+            "stub_latency_ms": args.latency_ms,
+            "stub_jitter_ms": args.jitter_ms,
+        },
+        "stages": stages,
+        "upstream_requests": upstream_requests,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
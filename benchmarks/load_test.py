@@ -0,0 +1,308 @@
+"""Concurrent-session load test for one Streamlit process running main.py.
+
+Starts ``streamlit run main.py`` against the local upstream stubs and
+drives N simulated browser sessions over Streamlit's websocket protocol,
+stepping N through ``--levels``. Every session runs the same script:
+first load, idle ticks, a location change, a method change and a force
+refresh, with ``--think-ms`` between actions:
+
+    python -m benchmarks.load_test --levels 1,2,4,8,16,32 --rounds 3 -o load.json
+
+The JSON report gives, per concurrency level, rerun latency percentiles
+(overall and per action), throughput in reruns per second, errors and
+the bytes sent per rerun and the server's resident memory per connected
+session. Each level runs on a freshly started server, and memory is
+sampled after a garbage collection inside it (benchmarks/serve.py) once
+before the sessions connect and once while they are all still
+connected. It also names the saturation point: the first level where throughput grows by less than
+``--min-gain`` over the previous level, or where p95 latency exceeds
+``--p95-limit-ms``.
+
+Needs the ``websockets`` package. Widget states and the hashes of
+already-received elements (which the server then sends as references)
+are reported the way the installed Streamlit version's frontend does.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import socket
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
+
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+from benchmarks.bench import MAIN_SCRIPT, ROOT, git_revision
+from benchmarks.serve import RSS_FILE_ENV
+from benchmarks.stats import summarize
+from benchmarks.stubs import StubUpstreams
+
+LOCATIONS = (
+    "Douglasville, GA", "Atlanta, GA", "Houston, TX", "Dearborn, MI", "Chicago, IL",
+    "Paterson, NJ", "Toronto, ON", "London, UK", "Birmingham, UK", "Sydney, Australia",
+)
+
+# ScriptFinishedStatus values that end a whole-app run (fragment runs and
+# runs cut short by st.rerun() are followed by more messages)
+_RUN_COMPLETE = {0, 1}
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class AppServer:
+    """``streamlit run main.py`` in a subprocess, pointed at the stubs."""
+
+    def __init__(self, port=None):
+        self.port = port or _free_port()
+        self.process = None
+        self.rss_file = None
+
+    def start(self, timeout=60):
+        self.rss_file = os.path.join(tempfile.gettempdir(), f"ramadan-rss-{self.port}")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.serve", "run", MAIN_SCRIPT, "--server.headless=true",
+             f"--server.port={self.port}", "--server.address=127.0.0.1", "--browser.gatherUsageStats=false"],
+            cwd=ROOT, env={**os.environ, RSS_FILE_ENV: self.rss_file},
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{self.port}/_stcore/health", timeout=1) as response:
+                    if response.status == 200:
+                        return self
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError("streamlit did not become healthy")
+
+    def rss_kib(self, timeout=30):
+        """The server's resident memory after it has collected garbage."""
+        self.process.send_signal(signal.SIGUSR1)
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                with open(self.rss_file) as f:
+                    value = int(f.read())
+            except FileNotFoundError:
+                time.sleep(0.05)
+                continue
+            os.unlink(self.rss_file)
+            return value
+        return None
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait(timeout=30)
+        if self.rss_file is not None and os.path.exists(self.rss_file):
+            os.unlink(self.rss_file)
+
+
+class Session:
+    """One simulated browser tab."""
+
+    def __init__(self, url):
+        self.url = url
+        self.ws = None
+        self.widgets = {}    # label -> (widget id, element type, proto)
+        self.states = {}     # widget id -> WidgetState carried across reruns
+        self.cached = set()  # hashes of cacheable elements already received
+        self.samples = []    # (action, seconds, error, bytes received)
+
+    async def connect(self):
+        self.ws = await websockets.connect(self.url, subprotocols=["streamlit"], max_size=None)
+
+    async def close(self):
+        await self.ws.close()
+
+    async def rerun(self, action, triggers=()):
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        for state in self.states.values():
+            msg.rerun_script.widget_states.widgets.append(state)
+        for widget_id in triggers:
+            msg.rerun_script.widget_states.widgets.append(WidgetState(id=widget_id, trigger_value=True))
+        msg.rerun_script.cached_message_hashes.extend(self.cached)
+        started = time.perf_counter()
+        await self.ws.send(msg.SerializeToString())
+        error = False
+        received = 0
+        while True:
+            frame = await self.ws.recv()
+            received += len(frame)
+            forward = ForwardMsg()
+            forward.ParseFromString(frame)
+            if forward.metadata.cacheable:
+                self.cached.add(forward.hash)
+            kind = forward.WhichOneof("type")
+            if kind == "delta" and forward.delta.WhichOneof("type") == "new_element":
+                element = forward.delta.new_element
+                element_type = element.WhichOneof("type")
+                if element_type == "exception":
+                    error = True
+                proto = getattr(element, element_type)
+                widget_id = getattr(proto, "id", "")
+                if widget_id and getattr(proto, "label", ""):
+                    self.widgets[proto.label] = (widget_id, element_type, proto)
+            elif kind == "script_finished" and forward.script_finished in _RUN_COMPLETE:
+                break
+        self.samples.append((action, time.perf_counter() - started, error, received))
+
+    def _set(self, label, **value):
+        widget_id = self.widgets[label][0]
+        self.states[widget_id] = WidgetState(id=widget_id, **value)
+
+    def _trigger(self, label):
+        return [self.widgets[label][0]] if label in self.widgets else []
+
+    async def run_script(self, rounds, idle_ticks, think, rng):
+        await self.rerun("first_load")
+        for _ in range(rounds):
+            for _ in range(idle_ticks):
+                await asyncio.sleep(think)
+                await self.rerun("idle_tick")
+            await asyncio.sleep(think)
+            self._set("Enter City, State/Country", string_value=rng.choice(LOCATIONS))
+            await self.rerun("location_change", self._trigger("Update Prayer Times"))
+            await asyncio.sleep(think)
+            methods = list(self.widgets["Calculation Method"][2].options)
+            self._set("Calculation Method", string_value=rng.choice(methods))
+            await self.rerun("method_change", self._trigger("Update Prayer Times"))
+            await asyncio.sleep(think)
+            await self.rerun("force_refresh", self._trigger("Force Refresh Data"))
+
+
+async def run_level(server, sessions, rounds, idle_ticks, think, seed):
+    url = f"ws://127.0.0.1:{server.port}/_stcore/stream"
+    rss_before = server.rss_kib()
+    clients = [Session(url) for _ in range(sessions)]
+    await asyncio.gather(*(client.connect() for client in clients))
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        client.run_script(rounds, idle_ticks, think, random.Random(seed + i)) for i, client in enumerate(clients)
+    ))
+    elapsed = time.perf_counter() - started
+    rss_connected = server.rss_kib()
+    await asyncio.gather(*(client.close() for client in clients))
+
+    samples = [sample for client in clients for sample in client.samples]
+    by_action = {}
+    for action, seconds, _, _ in samples:
+        by_action.setdefault(action, []).append(seconds)
+    return {
+        "sessions": sessions,
+        "reruns": len(samples),
+        "errors": sum(1 for _, _, error, _ in samples if error),
+        "elapsed_s": elapsed,
+        "throughput_rps": len(samples) / elapsed if elapsed else None,
+        "latency": summarize([seconds for _, seconds, _, _ in samples]),
+        "latency_by_action": {action: summarize(values) for action, values in sorted(by_action.items())},
+        "bytes_per_rerun": sum(received for _, _, _, received in samples) / len(samples),
+        "rss_before_kib": rss_before,
+        "rss_connected_kib": rss_connected,
+        "rss_per_session_kib": (rss_connected - rss_before) / sessions if rss_before and rss_connected else None,
+    }
+
+
+def find_saturation(levels, min_gain, p95_limit_ms=None):
+    """``{"sessions", "reason"}`` for the first saturated level, or None."""
+    for previous, level in zip([None] + levels, levels):
+        if p95_limit_ms is not None and level["latency"]["p95_ms"] > p95_limit_ms:
+            return {"sessions": level["sessions"], "reason": f"p95 {level['latency']['p95_ms']:.0f} ms > {p95_limit_ms:.0f} ms"}
+        if previous and level["throughput_rps"] < previous["throughput_rps"] * (1 + min_gain):
+            return {
+                "sessions": level["sessions"],
+                "reason": f"throughput {level['throughput_rps']:.1f}/s vs {previous['throughput_rps']:.1f}/s "
+                          f"at {previous['sessions']} sessions",
+            }
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test one Streamlit process running main.py")
+    parser.add_argument("--levels", default="1,2,4,8,16,32", help="comma-separated concurrent session counts")
+    parser.add_argument("--rounds", type=int, default=3, help="interaction rounds per session")
+    parser.add_argument("--idle-ticks", type=int, default=2, help="plain reruns per round")
+    parser.add_argument("--think-ms", type=float, default=200.0, help="pause between a session's actions")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="stub response latency")
+    parser.add_argument("--jitter-ms", type=float, default=20.0, help="extra random stub latency")
+    parser.add_argument("--min-gain", type=float, default=0.1, help="throughput gain below which a level counts as saturated")
+    parser.add_argument("--p95-limit-ms", type=float, help="p95 rerun latency above which a level counts as saturated")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-o", "--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+    if websockets is None:
+        parser.error("the load test needs the websockets package (pip install websockets)")
+
+    levels = [int(value) for value in args.levels.split(",")]
+    # Same isolation as bench.py: no on-disk store, no Nominatim pacing against the stubs
+    os.environ.setdefault("RAMADAN_STORE_PATH", "")
+    os.environ.setdefault("RAMADAN_GEOCODE_RATE", "0")
+    results = []
+    with StubUpstreams(args.latency_ms / 1000.0, args.jitter_ms / 1000.0) as stubs:
+        for sessions in levels:
+            # A fresh server per level: memory freed by an earlier level
+            # would otherwise be reused and make the per-session figure
+            # meaningless (or negative)
+            server = AppServer().start()
+            try:
+                # One throwaway session first, so module imports and the
+                # first script compile are billed to neither the baseline
+                # memory nor the level's latencies
+                asyncio.run(run_level(server, 1, 0, 0, 0.0, args.seed))
+                result = asyncio.run(run_level(server, sessions, args.rounds, args.idle_ticks, args.think_ms / 1000.0, args.seed))
+            finally:
+                server.stop()
+            results.append(result)
+            print(f"{sessions:>4} sessions: {result['throughput_rps']:.1f} reruns/s, "
+                  f"p50 {result['latency']['p50_ms']:.0f} ms, p95 {result['latency']['p95_ms']:.0f} ms, "
+                  f"{result['bytes_per_rerun'] / 1024:.1f} KiB/rerun, "
+                  f"{result['errors']} errors", file=sys.stderr)
+        upstream_requests = stubs.requests
+
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "rounds": args.rounds,
+            "idle_ticks": args.idle_ticks,
+            "think_ms": args.think_ms,
+            "stub_latency_ms": args.latency_ms,
+            "stub_jitter_ms": args.jitter_ms,
+        },
+        "levels": results,
+        "saturation": find_saturation(results, args.min_gain, args.p95_limit_ms),
+        "upstream_requests": upstream_requests,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""``streamlit run`` with a memory probe, used by load_test.py.
+
+Takes the same arguments as ``streamlit``. On SIGUSR1 the server collects
+garbage, hands freed heap back to the OS where the C library allows it,
+and writes its resident memory in KiB to the file named by
+``RAMADAN_BENCH_RSS_FILE``, so the memory the load test reads is held by
+live objects and not by garbage or allocator slack:
+
+    python -m benchmarks.serve run main.py --server.headless=true
+"""
+import ctypes
+import ctypes.util
+import gc
+import os
+import signal
+import sys
+
+RSS_FILE_ENV = "RAMADAN_BENCH_RSS_FILE"
+
+try:
+    _malloc_trim = ctypes.CDLL(ctypes.util.find_library("c")).malloc_trim
+except (OSError, AttributeError, TypeError):
+    _malloc_trim = None
+
+
+def rss_kib(pid="self"):
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return None
+
+
+def _report_rss(signum, frame):
+    gc.collect()
+    if _malloc_trim is not None:
+        _malloc_trim(0)
+    path = os.environ[RSS_FILE_ENV]
+    # Written then renamed, so the reader never sees a partial file
+    with open(path + ".tmp", "w") as f:
+        f.write(str(rss_kib()))
+    os.replace(path + ".tmp", path)
+
+
+def main():
+    signal.signal(signal.SIGUSR1, _report_rss)
+    from streamlit.web import cli
+    sys.argv = ["streamlit"] + sys.argv[1:]
+    sys.exit(cli.main())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""Summary statistics shared by the benchmark and load-test tools."""
+
+
+def percentile(sorted_values, p):
+    """Linear-interpolated percentile ``p`` (0-100) of an already sorted list."""
+    if not sorted_values:
+        return float("nan")
+    rank = (len(sorted_values) - 1) * p / 100.0
+    low = int(rank)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def summarize(seconds):
+    """Latency summary in milliseconds for a list of durations in seconds."""
+    values = sorted(s * 1000.0 for s in seconds)
+    if not values:
+        return {"n": 0}
+    return {
+        "n": len(values),
+        "mean_ms": sum(values) / len(values),
+        "min_ms": values[0],
+        "p50_ms": percentile(values, 50),
+        "p95_ms": percentile(values, 95),
+        "p99_ms": percentile(values, 99),
+        "max_ms": values[-1],
+    }
@@ -0,0 +1,223 @@
+"""Local stand-ins for AlAdhan and Nominatim that replay recorded responses.
+
+``StubUpstreams`` starts one HTTP server per upstream on an ephemeral
+port and points the app at them through ``RAMADAN_ALADHAN_BASE_URL`` and
+``RAMADAN_NOMINATIM_BASE_URL``, so benchmarks and load tests run fully
+offline with a controllable latency.
+
+Responses are replayed from ``benchmarks/fixtures``. The recorded
+AlAdhan day is re-dated to whatever date is requested, and calendar
+requests are answered with one re-dated copy per day. To refresh the
+fixtures from the live services:
+
+    python -m benchmarks.stubs --record
+"""
+import argparse
+import copy
+import datetime
+import json
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+_TIMINGS_PATH = re.compile(r"^/v1/timings/(\d{2}-\d{2}-\d{4})$")
+_CALENDAR_PATH = re.compile(r"^/v1/calendar/from/(\d{2}-\d{2}-\d{4})/to/(\d{2}-\d{2}-\d{4})$")
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _parse(date_text):
+    return datetime.datetime.strptime(date_text, "%d-%m-%Y").date()
+
+
+def redate(day, date):
+    """Copy of a recorded AlAdhan day payload with its Gregorian fields set to ``date``."""
+    day = copy.deepcopy(day)
+    gregorian = day["date"]["gregorian"]
+    gregorian.update({
+        "date": date.strftime("%d-%m-%Y"),
+        "day": date.strftime("%d"),
+        "weekday": {"en": date.strftime("%A")},
+        "month": {"number": date.month, "en": date.strftime("%B")},
+        "year": str(date.year),
+    })
+    day["date"]["readable"] = date.strftime("%d %b %Y")
+    return day
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        upstream = self.server.upstream
+        upstream.requests += 1
+        if upstream.latency:
+            time.sleep(upstream.latency + random.uniform(0, upstream.jitter))
+        url = urlsplit(self.path)
+        status, body = upstream.respond(url.path, parse_qs(url.query))
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+class _StubServer:
+    """One replaying upstream on 127.0.0.1 and an ephemeral port."""
+
+    def __init__(self, latency=0.0, jitter=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.requests = 0
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.upstream = self
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class AlAdhanStub(_StubServer):
+    def __init__(self, latency=0.0, jitter=0.0):
+        super().__init__(latency, jitter)
+        self.recorded = load_fixture("aladhan_timings.json")["data"]
+
+    @property
+    def base_url(self):
+        return self.url + "/v1"
+
+    def respond(self, path, query):
+        match = _TIMINGS_PATH.match(path)
+        if match:
+            return 200, {"code": 200, "status": "OK", "data": redate(self.recorded, _parse(match.group(1)))}
+        match = _CALENDAR_PATH.match(path)
+        if match:
+            start, end = _parse(match.group(1)), _parse(match.group(2))
+            days = []
+            while start <= end:
+                day = redate(self.recorded, start)
+                # The calendar endpoint suffixes every time with the zone abbreviation
+                day["timings"] = {name: f"{value} (EST)" for name, value in day["timings"].items()}
+                days.append(day)
+                start += datetime.timedelta(days=1)
+            return 200, {"code": 200, "status": "OK", "data": days}
+        return 404, {"code": 404, "status": "NOT FOUND", "data": "Invalid endpoint"}
+
+
+class NominatimStub(_StubServer):
+    def __init__(self, latency=0.0, jitter=0.0):
+        super().__init__(latency, jitter)
+        self.recorded = load_fixture("nominatim_search.json")
+
+    @property
+    def base_url(self):
+        return self.url
+
+    def respond(self, path, query):
+        if path != "/search":
+            return 404, {"error": "not found"}
+        # Every distinct query lands somewhere else (within half a degree of the
+        # recorded place) so different locations get their own cache entries
+        places = copy.deepcopy(self.recorded)
+        text = query.get("q", [""])[0]
+        if places and text:
+            seed = zlib.crc32(text.casefold().encode("utf-8"))
+            places[0]["lat"] = f"{float(places[0]['lat']) + (seed % 1000) / 1000 - 0.5:.7f}"
+            places[0]["lon"] = f"{float(places[0]['lon']) + (seed // 1000 % 1000) / 1000 - 0.5:.7f}"
+            places[0]["display_name"] = f"{text} (stub)"
+        return 200, places
+
+
+class StubUpstreams:
+    """Context manager running both stubs and exporting their URLs to the app.
+
+    Must be entered before ``config`` is first imported, since settings
+    are read from the environment at import time.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0):
+        self.aladhan = AlAdhanStub(latency, jitter)
+        self.nominatim = NominatimStub(latency, jitter)
+
+    def __enter__(self):
+        self.aladhan.start()
+        self.nominatim.start()
+        os.environ["RAMADAN_ALADHAN_BASE_URL"] = self.aladhan.base_url
+        os.environ["RAMADAN_NOMINATIM_BASE_URL"] = self.nominatim.base_url
+        return self
+
+    def __exit__(self, *exc_info):
+        self.aladhan.stop()
+        self.nominatim.stop()
+
+    @property
+    def requests(self):
+        return {"aladhan": self.aladhan.requests, "nominatim": self.nominatim.requests}
+
+
+def record(location="Douglasville, GA", date=None, method=2, tz_name="America/New_York"):
+    """Refresh the fixtures from the live AlAdhan and Nominatim services."""
+    import requests
+
+    headers = {"User-Agent": "RamadanTimesApp/1.0 (benchmark fixture recording)"}
+    places = requests.get(
+        "https://nominatim.openstreetmap.org/search",
+        params={"q": location, "format": "json", "limit": 1}, headers=headers, timeout=30,
+    ).json()
+    lat, lon = places[0]["lat"], places[0]["lon"]
+    date = date or datetime.date.today()
+    timings = requests.get(
+        f"http://api.aladhan.com/v1/timings/{date.strftime('%d-%m-%Y')}",
+        params={"latitude": lat, "longitude": lon, "method": method, "timezone": tz_name}, timeout=30,
+    ).json()
+    for name, data in (("nominatim_search.json", places), ("aladhan_timings.json", timings)):
+        with open(os.path.join(FIXTURES, name), "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+    print(f"Recorded fixtures for {location} on {date} into {FIXTURES}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay or record upstream fixtures")
+    parser.add_argument("--record", action="store_true", help="refresh fixtures from the live services")
+    parser.add_argument("--location", default="Douglasville, GA")
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+    if args.record:
+        record(args.location)
+        return
+    with StubUpstreams(args.latency_ms / 1000.0) as stubs:
+        print(f"AlAdhan stub:   {stubs.aladhan.base_url}")
+        print(f"Nominatim stub: {stubs.nominatim.base_url}")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""Process-wide in-memory caches shared across Streamlit sessions.
+
+Streamlit re-executes main.py on every interaction, but imported modules
+live for the lifetime of the server process, so anything kept here is
+shared by every browser session.
+"""
+import datetime
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import config
+import grid
+import metrics
+import timezones
+
+# Words, and numbers with their sign and decimal point ("-33.9" must not
+# become "33 9", or a coordinate query would share its key with others)
+_TOKEN = re.compile(r"(?<!\w)[-+]?\d+(?:\.\d+)?(?!\w)|\w+", re.UNICODE)
+
+
+def normalize_query(query):
+    """Fold case, punctuation and whitespace so equivalent queries share a key.
+
+    "Douglasville, GA", "douglasville  ga" and " DOUGLASVILLE,GA. " all
+    normalize to "douglasville ga"; "-33.9, 18.4" keeps its numbers whole
+    as "-33.9 18.4".
+    """
+    if query is None:
+        return ""
+    text = unicodedata.normalize("NFKC", str(query)).casefold()
+    return " ".join(_TOKEN.findall(text))
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a time-to-live.
+
+    Entries are evicted least-recently-used first once ``maxsize`` is
+    reached; expired entries are kept until then for ``get_stale``.
+    Hit, miss, expiry and eviction counters are kept for diagnostics.
+    """
+
+    def __init__(self, maxsize=1024, ttl=3600.0, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at <= self._clock():
+                # Expired entries stay until evicted so get_stale can serve them
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def get_stale(self, key, default=None):
+        """Return a value even if it has expired, e.g. while an upstream is down."""
+        with self._lock:
+            entry = self._data.get(key)
+            return default if entry is None else entry[0]
+
+    def set(self, key, value, ttl=None):
+        expires_at = self._clock() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[1] > self._clock()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+# Geocode results keyed by normalize_query(location_name)
+geocode_cache = TTLCache(
+    maxsize=config.GEOCODE_CACHE_SIZE,
+    ttl=config.GEOCODE_CACHE_TTL,
+)
+
+
+def timings_cache_key(lat, lon, date, method, tz_name):
+    """Key for one day's timetable: snapped coordinates, date, method and tz."""
+    lat, lon = grid.snap(lat, lon)
+    return (
+        lat,
+        lon,
+        date.isoformat(),
+        int(method),
+        tz_name,
+    )
+
+
+def timings_ttl(date, tz_name, now=None):
+    """Seconds until ``date`` is over in ``tz_name``, clamped to the config bounds.
+
+    A timetable is only useful until its day ends locally, so entries for
+    today expire at the next local midnight while entries fetched ahead
+    (tomorrow, the rest of Ramadan) live until their own day is over.
+    """
+    now = now or timezones.now_in(tz_name)
+    day_end = timezones.localize(date + datetime.timedelta(days=1), datetime.time(0, 0), tz_name)
+    remaining = day_end.timestamp() - now.timestamp()
+    return min(max(remaining, config.TIMINGS_CACHE_MIN_TTL), config.TIMINGS_CACHE_MAX_TTL)
+
+
+# AlAdhan day payloads keyed by timings_cache_key(...)
+timings_cache = TTLCache(
+    maxsize=config.TIMINGS_CACHE_SIZE,
+    ttl=config.TIMINGS_CACHE_MAX_TTL,
+)
+
+
+@metrics.register_collector
+def _cache_metrics():
+    caches = {"geocode": geocode_cache.stats(), "timings": timings_cache.stats()}
+    return [
+        ("cache_entries", "gauge", "Entries held per cache.",
+         [({"cache": name}, stats["size"]) for name, stats in caches.items()]),
+    ] + [
+        (f"cache_{counter}_total", "counter", f"Cache {counter} per cache.",
+         [({"cache": name}, stats[counter]) for name, stats in caches.items()])
+        for counter in ("hits", "misses", "expirations", "evictions")
+    ]
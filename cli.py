@@ -0,0 +1,400 @@
+"""Command-line timetables for many locations at once.
+
+Reads locations from a CSV or JSONL file and writes one row per location
+and day, e.g. for a year of printed mosque timetables:
+
+    python cli.py mosques.csv --from 2026-02-18 --to 2026-03-19 -o ramadan.csv
+    python cli.py mosques.jsonl --from 2026-01-01 --days 365 -o year.parquet --workers 8
+
+Each input record has a ``location`` to geocode, or ``latitude`` and
+``longitude``, plus an optional ``method`` (AlAdhan id, default
+``--method``) and ``timezone`` (inferred from the coordinates when
+missing). Locations are geocoded in the main process, through the
+app's caches, on-disk store and Nominatim queue, so the whole run
+shares one rate limit. Their timetables are then fetched or computed
+by ``fetch_timings_for_date`` on a pool of worker processes
+(``--source`` picks AlAdhan or the local calculation). Times are formatted by ``schedule.format_time``, or kept as
+"HH:MM" with ``--clock 24``.
+
+Rows are streamed to CSV, JSONL or Parquet (``pip install pyarrow``) in
+the order locations finish. Every time the output is flushed to disk,
+the locations it holds are recorded in ``<output>.progress``. After a
+crash or failed locations, ``--resume`` drops anything written after the
+last record and runs only the locations still missing.
+"""
+import argparse
+import concurrent.futures
+import csv
+import datetime
+import io
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+
+import config
+import geocode_scheduler
+import timezones
+from hijri import hijri_date_info
+from prayer_calc import METHODS, PRAYER_NAMES
+from prayer_service import fetch_timings_for_date, geocode_location
+from schedule import format_time
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = pq = None
+
+COLUMNS = ["record", "location", "display_name", "latitude", "longitude", "timezone", "method", "date", "hijri_date"] + PRAYER_NAMES
+
+FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".parquet": "parquet"}
+
+# Threads geocoding in the main process; few are needed, since lookups that
+# reach Nominatim go out one at a time anyway
+GEOCODE_THREADS = 4
+
+
+def read_locations(path):
+    """``(record number, dict)`` for each location in a CSV (with a header row) or JSONL file."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            records = (json.loads(line) for line in f if line.strip())
+        else:
+            records = csv.DictReader(f)
+        return list(enumerate(records, start=1))
+
+
+def has_coordinates(record):
+    return record.get("latitude") not in (None, "") and record.get("longitude") not in (None, "")
+
+
+def geocode_job(job):
+    """``job`` with the coordinates of its ``location`` filled in; runs in the main process."""
+    number, record = job
+    query = record.get("location") or ""
+    if not query:
+        raise ValueError("needs a location, or latitude and longitude")
+    lat, lon, display_name = geocode_location(query, geocode_scheduler.BACKGROUND)
+    if lat is None:
+        raise ValueError(f"could not find coordinates for '{query}'")
+    return number, dict(record, latitude=lat, longitude=lon, display_name=display_name)
+
+
+def timetable_rows(job, start_date, days, default_method, clock):
+    """``(record number, output rows)`` of one location; runs in a worker process."""
+    number, record = job
+    query = record.get("location") or ""
+    if not has_coordinates(record):
+        raise ValueError("needs a location, or latitude and longitude")
+    lat, lon = float(record["latitude"]), float(record["longitude"])
+    display_name = record.get("display_name") or query
+    method = int(record.get("method") or default_method)
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {sorted(METHODS)}")
+    tz_name = record.get("timezone") or timezones.infer_timezone(lat, lon)
+    if not timezones.is_valid_timezone(tz_name):
+        raise ValueError(f"unknown timezone '{tz_name}'")
+
+    rows = []
+    for offset in range(days):
+        date = start_date + datetime.timedelta(days=offset)
+        payload = fetch_timings_for_date(lat, lon, date, method, tz_name)
+        if payload is None:
+            raise RuntimeError(f"no timings returned for {date.isoformat()}")
+        row = {
+            "record": number,
+            "location": query,
+            "display_name": display_name or "",
+            "latitude": lat,
+            "longitude": lon,
+            "timezone": tz_name,
+            "method": method,
+            "date": date.isoformat(),
+            "hijri_date": hijri_date_info(date)["date"],
+        }
+        for name in PRAYER_NAMES:
+            time_str = payload["timings"][name][:5]
+            row[name] = format_time(time_str) if clock == 12 else time_str
+        rows.append(row)
+    return number, rows
+
+
+class _TextWriter:
+    """Rows appended to a text file; a position is a byte offset."""
+
+    def __init__(self, path, position=None):
+        self._raw = open(path, "r+b" if position is not None else "wb")
+        if position is not None:
+            # Whatever was written after the last recorded commit is dropped
+            self._raw.truncate(position)
+            self._raw.seek(position)
+        self._file = io.TextIOWrapper(self._raw, encoding="utf-8", newline="")
+        self._fresh = not position
+
+    def commit_due(self):
+        return True
+
+    def commit(self):
+        """Flush to disk; returns the position to resume from."""
+        self._file.flush()
+        os.fsync(self._raw.fileno())
+        return self._raw.tell()
+
+    def close(self, complete=True):
+        self._file.close()
+
+
+class CsvWriter(_TextWriter):
+    def __init__(self, path, position=None):
+        super().__init__(path, position)
+        self._csv = csv.DictWriter(self._file, COLUMNS)
+        if self._fresh:
+            self._csv.writeheader()
+
+    def write(self, rows):
+        self._csv.writerows(rows)
+
+
+class JsonlWriter(_TextWriter):
+    def write(self, rows):
+        for row in rows:
+            self._file.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+class ParquetWriter:
+    """Rows buffered into numbered part files, joined into one Parquet file at the end.
+
+    A Parquet file is only readable once its footer is written, so each
+    commit closes a complete part in ``<output>.parts``; a position is the
+    number of parts.
+    """
+
+    def __init__(self, path, position=None, batch_rows=None):
+        if pa is None:
+            raise ImportError("Parquet output needs pyarrow: pip install pyarrow")
+        self.path = path
+        self.parts_dir = path + ".parts"
+        self.batch_rows = config.CLI_BATCH_ROWS if batch_rows is None else batch_rows
+        self._parts = position or 0
+        self._rows = []
+        if position is None and os.path.isdir(self.parts_dir):
+            shutil.rmtree(self.parts_dir)
+        os.makedirs(self.parts_dir, exist_ok=True)
+        for name in os.listdir(self.parts_dir):
+            if not name.endswith(".parquet") or int(name.split(".")[0]) >= self._parts:
+                os.remove(os.path.join(self.parts_dir, name))
+        self.schema = pa.schema(
+            [("record", pa.int64()), ("location", pa.string()), ("display_name", pa.string()),
+             ("latitude", pa.float64()), ("longitude", pa.float64()), ("timezone", pa.string()),
+             ("method", pa.int64()), ("date", pa.string()), ("hijri_date", pa.string())]
+            + [(name, pa.string()) for name in PRAYER_NAMES]
+        )
+
+    def _part(self, index):
+        return os.path.join(self.parts_dir, f"{index:06d}.parquet")
+
+    def write(self, rows):
+        self._rows.extend(rows)
+
+    def commit_due(self):
+        return len(self._rows) >= self.batch_rows
+
+    def commit(self):
+        if self._rows:
+            temporary = self._part(self._parts) + ".tmp"
+            pq.write_table(pa.Table.from_pylist(self._rows, schema=self.schema), temporary)
+            os.replace(temporary, self._part(self._parts))
+            self._parts += 1
+            self._rows = []
+        return self._parts
+
+    def close(self, complete=True):
+        if not complete:
+            # Kept for --resume
+            return
+        with pq.ParquetWriter(self.path, self.schema) as writer:
+            for index in range(self._parts):
+                writer.write_table(pq.read_table(self._part(index)))
+        shutil.rmtree(self.parts_dir)
+
+
+WRITERS = {"csv": CsvWriter, "jsonl": JsonlWriter, "parquet": ParquetWriter}
+
+
+class Checkpoint:
+    """``<output>.progress``: one ``position<TAB>record,record,...`` line per commit."""
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.position = None
+        self.done = set()
+        if resume and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    # A line cut short by a crash was never committed
+                    if not line.endswith("\n"):
+                        break
+                    position, _, records = line.rstrip("\n").partition("\t")
+                    self.position = int(position)
+                    self.done.update(int(record) for record in records.split(",") if record)
+        self._file = open(path, "w", encoding="utf-8")
+        if self.position is not None:
+            self.record(self.position, sorted(self.done))
+
+    def record(self, position, records):
+        self._file.write(f"{position}\t{','.join(str(record) for record in records)}\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+class Progress:
+    """A single status line on stderr, redrawn at most every ``interval`` seconds."""
+
+    def __init__(self, total, stream=sys.stderr, interval=0.5):
+        self.total = total
+        self.stream = stream
+        self.interval = interval
+        self.started = time.monotonic()
+        self._drawn = 0.0
+        self._width = 0
+
+    def update(self, done, failed, force=False):
+        now = time.monotonic()
+        if not force and now - self._drawn < self.interval:
+            return
+        self._drawn = now
+        elapsed = now - self.started
+        rate = done / elapsed if elapsed > 0 else 0.0
+        eta = f"{(self.total - done) / rate:.0f}s" if rate > 0 else "?"
+        percent = 100.0 * done / self.total if self.total else 100.0
+        line = f"{done}/{self.total} locations ({percent:.0f}%), {rate:.1f}/s, ETA {eta}, {failed} failed"
+        self._width = max(self._width, len(line))
+        self.stream.write("\r" + line.ljust(self._width))
+        self.stream.flush()
+
+    def note(self, message):
+        """A line of its own above the status line."""
+        self.stream.write("\r" + message.ljust(self._width) + "\n")
+        self._drawn = 0.0
+
+    def finish(self, done, failed):
+        self.update(done, failed, force=True)
+        self.stream.write("\n")
+
+
+def run(jobs, writer, checkpoint, progress, workers, *job_args):
+    """Run ``timetable_rows`` for every job on a process pool; returns (done, failed).
+
+    Jobs without coordinates are geocoded first, by ``geocode_job`` on
+    threads of this process: one Nominatim queue, and one rate limit,
+    for the whole run.
+    """
+    done = failed = 0
+    uncommitted = []
+    jobs = iter(jobs)
+    # Future -> (record number, whether it yields rows rather than a geocoded job)
+    in_flight = {}
+    # Spawned workers import config afresh, so the environment set in main() applies
+    context = multiprocessing.get_context("spawn")
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool, \
+                concurrent.futures.ThreadPoolExecutor(GEOCODE_THREADS, thread_name_prefix="ramadan-cli-geocode") as geocoder:
+            while True:
+                # Only a couple of jobs per worker are queued, so memory stays flat
+                while len(in_flight) < 2 * workers:
+                    job = next(jobs, None)
+                    if job is None:
+                        break
+                    if has_coordinates(job[1]):
+                        in_flight[pool.submit(timetable_rows, job, *job_args)] = (job[0], True)
+                    else:
+                        in_flight[geocoder.submit(geocode_job, job)] = (job[0], False)
+                if not in_flight:
+                    break
+                finished, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    number, yields_rows = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        failed += 1
+                        progress.note(f"record {number}: {e}")
+                        continue
+                    if not yields_rows:
+                        in_flight[pool.submit(timetable_rows, result, *job_args)] = (number, True)
+                        continue
+                    _, rows = result
+                    writer.write(rows)
+                    uncommitted.append(number)
+                    done += 1
+                    if writer.commit_due():
+                        checkpoint.record(writer.commit(), uncommitted)
+                        uncommitted = []
+                    progress.update(done, failed)
+    finally:
+        if uncommitted:
+            checkpoint.record(writer.commit(), uncommitted)
+    return done, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write prayer timetables for many locations")
+    parser.add_argument("input", help="CSV (with a header row) or JSONL file of locations")
+    parser.add_argument("-o", "--output", required=True, help="output file (.csv, .jsonl or .parquet)")
+    parser.add_argument("--from", dest="start", required=True, type=datetime.date.fromisoformat, help="first date, YYYY-MM-DD")
+    span = parser.add_mutually_exclusive_group()
+    span.add_argument("--to", dest="end", type=datetime.date.fromisoformat, help="last date, YYYY-MM-DD")
+    span.add_argument("--days", type=int, help="number of days (default 1)")
+    parser.add_argument("--format", choices=sorted(WRITERS), help="output format (default: from the extension)")
+    parser.add_argument("--method", type=int, default=2, choices=sorted(METHODS), help="method for records without one")
+    parser.add_argument("--source", choices=("api", "local", "verify"), help="timings source (default RAMADAN_TIMINGS_SOURCE)")
+    parser.add_argument("--clock", type=int, choices=(12, 24), default=12, help="12-hour (format_time) or 24-hour times")
+    parser.add_argument("--workers", type=int, default=config.CLI_WORKERS or os.cpu_count(), help="worker processes")
+    parser.add_argument("--resume", action="store_true", help="continue an interrupted run into the same output")
+    args = parser.parse_args()
+
+    days = (args.end - args.start).days + 1 if args.end else (args.days or 1)
+    if days < 1:
+        parser.error("--to is before --from")
+    output_format = args.format or FORMATS.get(os.path.splitext(args.output)[1].lower())
+    if output_format is None:
+        parser.error("cannot tell the output format from the extension; pass --format")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+
+    if args.source:
+        os.environ["RAMADAN_TIMINGS_SOURCE"] = args.source
+
+    checkpoint = Checkpoint(args.output + ".progress", resume=args.resume)
+    if checkpoint.position is not None and not os.path.exists(args.output if output_format != "parquet" else args.output + ".parts"):
+        parser.error(f"{args.output} is missing; cannot resume")
+    writer = WRITERS[output_format](args.output, checkpoint.position)
+    jobs = [job for job in read_locations(args.input) if job[0] not in checkpoint.done]
+    if checkpoint.done:
+        print(f"Resuming: {len(checkpoint.done)} locations already written", file=sys.stderr)
+
+    progress = Progress(len(jobs))
+    complete = False
+    try:
+        done, failed = run(jobs, writer, checkpoint, progress, args.workers, args.start, days, args.method, args.clock)
+        progress.finish(done, failed)
+        complete = not failed
+    finally:
+        writer.close(complete)
+        checkpoint.close()
+    if complete:
+        os.remove(checkpoint.path)
+        print(f"Wrote {len(checkpoint.done) + done} locations x {days} days to {args.output}", file=sys.stderr)
+    else:
+        print(f"{failed} locations failed; rerun with --resume to retry them", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
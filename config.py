@@ -0,0 +1,139 @@
+"""Runtime settings for the Ramadan Times app.
+
+Every value can be overridden with an environment variable so the same
+code runs unchanged on a laptop and on a shared deployment.
+"""
+import os
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _env_str(name, default):
+    return os.environ.get(name, default).strip()
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+# Geocoding cache (shared by every Streamlit session in this process)
+GEOCODE_CACHE_TTL = _env_float("RAMADAN_GEOCODE_CACHE_TTL", 7 * 24 * 3600)
+GEOCODE_CACHE_SIZE = _env_int("RAMADAN_GEOCODE_CACHE_SIZE", 2048)
+
+# Prayer timings cache (one entry per location/date/method/timezone)
+TIMINGS_CACHE_SIZE = _env_int("RAMADAN_TIMINGS_CACHE_SIZE", 20000)
+TIMINGS_CACHE_MAX_TTL = _env_float("RAMADAN_TIMINGS_CACHE_MAX_TTL", 35 * 24 * 3600)
+TIMINGS_CACHE_MIN_TTL = _env_float("RAMADAN_TIMINGS_CACHE_MIN_TTL", 3600)
+# Decimal places kept from coordinates when building cache keys (4 ~ 11 m)
+TIMINGS_COORD_PRECISION = _env_int("RAMADAN_TIMINGS_COORD_PRECISION", 4)
+# Coordinates are snapped to grid cells sized so that no prayer time moves
+# by more than this many seconds (grid.py); 0 turns snapping off
+GRID_MAX_ERROR = _env_float("RAMADAN_GRID_MAX_ERROR", 30)
+# Precomputed latitude sensitivities the grid is laid out from
+GRID_TABLE_PATH = _env_str("RAMADAN_GRID_TABLE_PATH", os.path.join(BASE_DIR, "data", "grid_sensitivity.txt"))
+
+# Where prayer timings come from: "api" (AlAdhan), "local" (computed
+# in-process, no network) or "verify" (local, cross-checked against AlAdhan)
+TIMINGS_SOURCE = _env_str("RAMADAN_TIMINGS_SOURCE", "api").lower()
+# Largest acceptable local/API difference, in minutes, in "verify" mode
+VERIFY_TOLERANCE_MINUTES = _env_int("RAMADAN_VERIFY_TOLERANCE_MINUTES", 2)
+# Days fetched from AlAdhan in one calendar request outside Ramadan (during
+# Ramadan the whole month is fetched at once); 1 disables range fetching
+RANGE_FETCH_DAYS = _env_int("RAMADAN_RANGE_FETCH_DAYS", 30)
+
+# Upstream I/O: seconds allowed per call and worker threads shared by all sessions
+UPSTREAM_TIMEOUT = _env_float("RAMADAN_UPSTREAM_TIMEOUT", 10)
+IO_WORKERS = _env_int("RAMADAN_IO_WORKERS", 16)
+
+# Upstream endpoints
+ALADHAN_BASE_URL = _env_str("RAMADAN_ALADHAN_BASE_URL", "http://api.aladhan.com/v1").rstrip("/")
+NOMINATIM_BASE_URL = _env_str("RAMADAN_NOMINATIM_BASE_URL", "https://nominatim.openstreetmap.org").rstrip("/")
+
+# HTTP client: pooled keep-alive connections, retries and circuit breaker
+HTTP_POOL_SIZE = _env_int("RAMADAN_HTTP_POOL_SIZE", 16)
+HTTP_CONNECT_TIMEOUT = _env_float("RAMADAN_HTTP_CONNECT_TIMEOUT", 3.05)
+HTTP_RETRIES = _env_int("RAMADAN_HTTP_RETRIES", 2)
+HTTP_BACKOFF = _env_float("RAMADAN_HTTP_BACKOFF", 0.3)
+HTTP_BREAKER_THRESHOLD = _env_int("RAMADAN_HTTP_BREAKER_THRESHOLD", 5)
+HTTP_BREAKER_RESET = _env_float("RAMADAN_HTTP_BREAKER_RESET", 30)
+# Compute timings locally when AlAdhan is unreachable and nothing is cached
+LOCAL_FALLBACK = _env_str("RAMADAN_LOCAL_FALLBACK", "1") not in ("0", "false", "no")
+
+# Geocoder: "nominatim" (online), "offline" (bundled gazetteer only) or
+# "offline_first" (gazetteer, then Nominatim for places it does not know)
+GEOCODER = _env_str("RAMADAN_GEOCODER", "nominatim").lower()
+GAZETTEER_PATH = _env_str("RAMADAN_GAZETTEER_PATH", os.path.join(BASE_DIR, "data", "cities15000.tsv.gz"))
+
+# Hijri calendar: Umm al-Qura month table, and days by which local moon
+# sighting starts each month after it (negative: before)
+HIJRI_TABLE_PATH = _env_str("RAMADAN_HIJRI_TABLE_PATH", os.path.join(BASE_DIR, "data", "umm_al_qura.txt"))
+HIJRI_DAY_OFFSET = _env_int("RAMADAN_HIJRI_DAY_OFFSET", 0)
+
+# Nominatim request scheduling: requests per second (Nominatim's usage policy
+# allows 1; 0 disables throttling), burst size, waiting lookups and seconds
+# a lookup may wait for its turn (app lookups wait at most UPSTREAM_TIMEOUT)
+GEOCODE_RATE = _env_float("RAMADAN_GEOCODE_RATE", 1.0)
+GEOCODE_BURST = _env_int("RAMADAN_GEOCODE_BURST", 1)
+GEOCODE_QUEUE_SIZE = _env_int("RAMADAN_GEOCODE_QUEUE_SIZE", 100)
+GEOCODE_QUEUE_TIMEOUT = _env_float("RAMADAN_GEOCODE_QUEUE_TIMEOUT", 30)
+
+# Timezone map (zones per 1-degree cell, border polygons where zones meet),
+# and inferred timezones memoized per ~100 m cell
+TIMEZONE_MAP_PATH = _env_str("RAMADAN_TIMEZONE_MAP_PATH", os.path.join(BASE_DIR, "data", "timezone_map.txt.gz"))
+TIMEZONE_CACHE_SIZE = _env_int("RAMADAN_TIMEZONE_CACHE_SIZE", 8192)
+
+# Rendered HTML fragments (cards, header) and parsed day schedules memoized
+# per distinct input
+RENDER_CACHE_SIZE = _env_int("RAMADAN_RENDER_CACHE_SIZE", 4096)
+
+# Unreferenced day records kept in the shared payload store (records some
+# session still holds are never evicted)
+PAYLOAD_STORE_SIZE = _env_int("RAMADAN_PAYLOAD_STORE_SIZE", 10000)
+
+# On-disk SQLite store for geocode results and timetables, so restarts start
+# warm; an empty path disables it
+STORE_PATH = _env_str("RAMADAN_STORE_PATH", os.path.join(BASE_DIR, "ramadan_store.sqlite3"))
+# Most requested locations loaded into memory when the process starts
+STORE_PRELOAD_LOCATIONS = _env_int("RAMADAN_STORE_PRELOAD_LOCATIONS", 500)
+# Seconds between compactions, and how long expired rows are kept for
+# serving while an upstream is down
+STORE_COMPACT_INTERVAL = _env_float("RAMADAN_STORE_COMPACT_INTERVAL", 6 * 3600)
+STORE_EXPIRED_GRACE = _env_float("RAMADAN_STORE_EXPIRED_GRACE", 7 * 24 * 3600)
+
+# Background prefetch of the next days' timings before each location's
+# local midnight: spread over the window from PREFETCH_WINDOW_START to
+# PREFETCH_WINDOW_END minutes before midnight
+PREFETCH_ENABLED = _env_str("RAMADAN_PREFETCH", "1") not in ("0", "false", "no")
+PREFETCH_WINDOW_START = _env_float("RAMADAN_PREFETCH_WINDOW_START", 45)
+PREFETCH_WINDOW_END = _env_float("RAMADAN_PREFETCH_WINDOW_END", 5)
+# Hours a location stays registered after a session last showed it
+PREFETCH_ACTIVE_HOURS = _env_float("RAMADAN_PREFETCH_ACTIVE_HOURS", 48)
+# Seconds between scheduler passes and before retrying a failed prefetch
+PREFETCH_POLL_INTERVAL = _env_float("RAMADAN_PREFETCH_POLL_INTERVAL", 30)
+PREFETCH_RETRY_DELAY = _env_float("RAMADAN_PREFETCH_RETRY_DELAY", 120)
+
+# Latency histograms and error counters for the hot paths (metrics.py)
+METRICS_ENABLED = _env_str("RAMADAN_METRICS", "1") not in ("0", "false", "no")
+# Port on which the Streamlit app process serves its own /metrics (0 = off;
+# api_server.py always serves /metrics on its API port)
+METRICS_HOST = _env_str("RAMADAN_METRICS_HOST", "127.0.0.1")
+METRICS_PORT = _env_int("RAMADAN_METRICS_PORT", 0)
+
+# Headless JSON API (api_server.py)
+API_HOST = _env_str("RAMADAN_API_HOST", "127.0.0.1")
+API_PORT = _env_int("RAMADAN_API_PORT", 8080)
+
+# Command-line timetables (cli.py): worker processes (0 = one per CPU) and
+# rows per Parquet part written before progress is recorded
+CLI_WORKERS = _env_int("RAMADAN_CLI_WORKERS", 0)
+CLI_BATCH_ROWS = _env_int("RAMADAN_CLI_BATCH_ROWS", 50000)
@@ -0,0 +1,140 @@
+"""Self-updating clock and next-prayer countdown.
+
+Both widgets are rendered once per script run as a small HTML component
+whose JavaScript ticks every second in the browser, so keeping them live
+costs no reruns and no server round trips. Component iframes cannot see
+the app's CSS variables, hence the copy of the relevant colours below.
+"""
+import json
+import time
+
+import streamlit as st
+import streamlit.components.v1 as components
+
+_STYLE = """
+<style>
+    :root {
+        --bg-secondary: #f8f9fa;
+        --bg-tertiary: #ecf0f1;
+        --text-primary: #2c3e50;
+        --text-secondary: #34495e;
+        --text-muted: #7f8c8d;
+    }
+    @media (prefers-color-scheme: dark) {
+        :root {
+            --bg-secondary: #2d3436;
+            --bg-tertiary: #2c3e50;
+            --text-primary: #ecf0f1;
+            --text-secondary: #bdc3c7;
+            --text-muted: #95a5a6;
+        }
+    }
+    body {
+        margin: 0;
+        font-family: "Source Sans Pro", sans-serif;
+        background: transparent;
+    }
+    h2, h3, p { margin: 0; }
+    p { color: var(--text-secondary); margin-bottom: 0.5rem; }
+    .card {
+        background-color: var(--bg-secondary);
+        padding: 1rem;
+        border-radius: 10px;
+        text-align: center;
+    }
+    .card h3 { color: var(--text-secondary); font-weight: 600; margin-bottom: 0.5rem; }
+    .countdown {
+        font-size: 1.2rem;
+        font-weight: 600;
+        color: var(--text-primary);
+        background-color: var(--bg-tertiary);
+        padding: 1rem;
+        border-radius: 10px;
+        text-align: center;
+    }
+    .countdown h2 { color: var(--text-primary); }
+    @media (max-width: 768px) {
+        .countdown { font-size: 1rem; padding: 0.8rem; }
+    }
+</style>
+"""
+
+# Shared by both widgets: the browser clock corrected by the server's, so a
+# skewed client clock does not shift the countdown
+_CLOCK_SCRIPT = """
+<script>
+    const skew = %(server_now_ms)d - Date.now();
+    function now() { return Date.now() + skew; }
+</script>
+"""
+
+_CLOCK_CARD = """
+<div class='card'>
+    <h3>🗓️ %(date)s</h3>
+    <p style='color: var(--text-muted);'>%(hijri)s</p>
+    <p style='color: var(--text-primary); font-weight: 600; margin-top: 0.5rem;'>⏰ <span id='clock'></span></p>
+</div>
+<script>
+    const clockFormat = new Intl.DateTimeFormat('en-US', {
+        timeZone: %(tz_name)s, hour: '2-digit', minute: '2-digit', second: '2-digit',
+        hour12: true, timeZoneName: 'short'
+    });
+    function tickClock() {
+        document.getElementById('clock').textContent = clockFormat.format(new Date(now()));
+    }
+    tickClock();
+    setInterval(tickClock, 1000);
+</script>
+"""
+
+_COUNTDOWN = """
+<div class='countdown' id='countdown'></div>
+<script>
+    const prayers = %(prayers)s;
+    const pad = (n) => String(n).padStart(2, '0');
+    function tickCountdown() {
+        const t = now();
+        const next = prayers.find((p) => p.at > t);
+        const box = document.getElementById('countdown');
+        if (!next) {
+            box.innerHTML = "<p>🎉 All prayers completed for today!</p>" +
+                "<p>Check back tomorrow for new prayer times.</p>";
+            return;
+        }
+        const left = Math.floor((next.at - t) / 1000);
+        box.innerHTML = "<p>⏳ Next Prayer: " + next.icon + " " + next.name + " in</p>" +
+            "<h2>" + pad(Math.floor(left / 3600)) + ":" + pad(Math.floor(left %% 3600 / 60)) + ":" + pad(left %% 60) + "</h2>";
+    }
+    tickCountdown();
+    setInterval(tickCountdown, 1000);
+</script>
+"""
+
+
+def _page(body, **values):
+    values["server_now_ms"] = int(time.time() * 1000)
+    return _STYLE + (_CLOCK_SCRIPT % values) + (body % values)
+
+
+def _embed(html, height):
+    # Streamlit versions with st.iframe deprecate components.html and warn
+    # on every run; older ones (down to the 1.37 minimum) only have the latter
+    if hasattr(st, "iframe"):
+        st.iframe(html, height=height)
+    else:
+        components.html(html, height=height)
+
+
+def render_clock_card(date_readable, hijri_text, tz_name, height=150):
+    """Date card with a live clock for ``tz_name`` (replaces the static header card)."""
+    html = _page(_CLOCK_CARD, date=date_readable, hijri=hijri_text, tz_name=json.dumps(tz_name))
+    _embed(html, height)
+
+
+def render_countdown(prayers, height=130):
+    """Live countdown to the next of ``prayers``: (name, icon, tz-aware datetime) tuples."""
+    data = [
+        {"name": name, "icon": icon, "at": int(moment.timestamp() * 1000)}
+        for name, icon, moment in prayers
+    ]
+    _embed(_page(_COUNTDOWN, prayers=json.dumps(data)), height)
@@ -0,0 +1,206 @@
+"""Offline geocoding against a bundled GeoNames city list.
+
+The dataset (``data/cities15000.tsv.gz``, every city with 15,000+
+inhabitants) is loaded once per process into flat arrays:
+
+* a sorted array of normalized names and aliases (GeoNames alternate
+  names such as "Mecca" for Makkah) for exact lookups and as-you-type
+  prefix suggestions (binary search stands in for a trie at a fraction
+  of the memory), and
+* a 1-degree grid of city indices for nearest-city reverse lookups.
+
+``geocode`` honours the same ``(lat, lon, display_name)`` contract as the
+Nominatim-backed ``prayer_service.geocode_location``.
+"""
+import bisect
+import gzip
+import math
+import threading
+import unicodedata
+from array import array
+
+import config
+from cache import normalize_query
+
+# Largest distance, in km, at which reverse() still reports a city
+REVERSE_MAX_KM = 150.0
+
+
+def fold(text):
+    """``normalize_query`` plus accent stripping, so "Sao Paulo" finds "São Paulo"."""
+    decomposed = unicodedata.normalize("NFKD", normalize_query(text))
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def _haversine_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 12742.0 * math.asin(min(1.0, math.sqrt(a)))
+
+
+class Gazetteer:
+    """In-memory city index built from a gazetteer TSV (see scripts/build_gazetteer.py)."""
+
+    def __init__(self, path):
+        self.names = []
+        self.admin1 = []
+        self.country_codes = []
+        self.countries = []
+        self.timezones = []
+        self.lats = array('d')
+        self.lons = array('d')
+        self.populations = array('q')
+        self._zone_ids = array('H')
+
+        zone_index = {}
+        keyed = []
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            next(f)  # header
+            for line in f:
+                name, admin1, country_code, country, lat, lon, population, tz_name, aliases = line.rstrip("\n").split("\t")
+                i = len(self.names)
+                # Aliases are stored folded, and distinct from the folded name
+                keyed.append((fold(name), i))
+                keyed.extend((alias, i) for alias in aliases.split(",") if alias)
+                self.names.append(name)
+                self.admin1.append(admin1)
+                self.country_codes.append(country_code)
+                self.countries.append(country)
+                self.lats.append(float(lat))
+                self.lons.append(float(lon))
+                self.populations.append(int(population or 0))
+                if tz_name not in zone_index:
+                    zone_index[tz_name] = len(self.timezones)
+                    self.timezones.append(tz_name)
+                self._zone_ids.append(zone_index[tz_name])
+
+        # Sorted (folded name or alias, index) pairs, split into parallel arrays for bisect
+        keyed.sort()
+        self._keys = [key for key, _ in keyed]
+        self._key_ids = array('l', (i for _, i in keyed))
+
+        self._grid = {}
+        for i in range(len(self.names)):
+            self._grid.setdefault(self._cell(self.lats[i], self.lons[i]), []).append(i)
+
+    def __len__(self):
+        return len(self.names)
+
+    @staticmethod
+    def _cell(lat, lon):
+        return int(math.floor(lat)), int(math.floor(lon)) % 360
+
+    def display_name(self, i):
+        parts = [self.names[i]]
+        # US/CA admin1 codes are the familiar state abbreviations; others are opaque ids
+        if self.admin1[i] and not self.admin1[i].isdigit():
+            parts.append(self.admin1[i])
+        parts.append(self.countries[i])
+        return ", ".join(parts)
+
+    def timezone(self, i):
+        return self.timezones[self._zone_ids[i]]
+
+    def _prefix_ids(self, prefix):
+        start = bisect.bisect_left(self._keys, prefix)
+        end = bisect.bisect_left(self._keys, prefix + "\uffff")
+        return self._key_ids[start:end]
+
+    def _exact_ids(self, name):
+        start = bisect.bisect_left(self._keys, name)
+        end = bisect.bisect_right(self._keys, name)
+        return self._key_ids[start:end]
+
+    def _matches_qualifiers(self, i, qualifiers):
+        fields = {fold(self.admin1[i]), fold(self.country_codes[i]), fold(self.countries[i])}
+        return all(q in fields for q in qualifiers)
+
+    def lookup(self, query):
+        """Index of the best city for "City[, region][, country]", or None.
+
+        The city must match a name or alias exactly (partial names are
+        left to the online geocoder); qualifiers after the first comma
+        must match the region code, country code or country name; ties go
+        to the most populous city.
+        """
+        parts = [fold(part) for part in str(query).split(",")]
+        parts = [part for part in parts if part]
+        if not parts:
+            return None
+        name, qualifiers = parts[0], parts[1:]
+        qualified = [i for i in self._exact_ids(name) if self._matches_qualifiers(i, qualifiers)]
+        if not qualified:
+            return None
+        return max(qualified, key=self.populations.__getitem__)
+
+    def geocode(self, query):
+        i = self.lookup(query)
+        if i is None:
+            return None, None, None
+        return self.lats[i], self.lons[i], self.display_name(i)
+
+    def suggest(self, prefix, limit=5):
+        """As-you-type suggestions: display names of the largest cities matching ``prefix``."""
+        parts = [fold(part) for part in str(prefix).split(",")]
+        if not parts or not parts[0]:
+            return []
+        ids = {i for i in self._prefix_ids(parts[0]) if self._matches_qualifiers(i, [p for p in parts[1:] if p])}
+        # Cities whose own name matches come before those matching by alias only
+        ids = sorted(ids, key=lambda i: (fold(self.names[i]).startswith(parts[0]), self.populations[i]), reverse=True)
+        return [self.display_name(i) for i in ids[:limit]]
+
+    def nearest(self, lat, lon, max_km=REVERSE_MAX_KM):
+        """Index of the closest city within ``max_km``, searching outward ring by ring."""
+        base_lat, base_lon = self._cell(lat, lon)
+        best, best_km = None, max_km
+        # Cells narrow towards the poles; search enough rings to cover max_km
+        cell_km = 111.0 * max(math.cos(math.radians(lat)), 0.05)
+        max_ring = min(int(max_km / cell_km) + 1, 180)
+        for ring in range(max_ring + 1):
+            for dlat in range(-ring, ring + 1):
+                for dlon in range(-ring, ring + 1):
+                    if max(abs(dlat), abs(dlon)) != ring:
+                        continue
+                    for i in self._grid.get((base_lat + dlat, (base_lon + dlon) % 360), ()):
+                        km = _haversine_km(lat, lon, self.lats[i], self.lons[i])
+                        if km < best_km:
+                            best, best_km = i, km
+            # Anything in further rings is at least `ring` cells away
+            if best is not None and best_km <= ring * cell_km:
+                break
+        return best
+
+    def reverse(self, lat, lon):
+        i = self.nearest(lat, lon)
+        if i is None:
+            return None
+        return self.display_name(i)
+
+
+_gazetteer = None
+_lock = threading.Lock()
+
+
+def get_gazetteer():
+    """The process-wide gazetteer, loaded on first use."""
+    global _gazetteer
+    if _gazetteer is None:
+        with _lock:
+            if _gazetteer is None:
+                _gazetteer = Gazetteer(config.GAZETTEER_PATH)
+    return _gazetteer
+
+
+def geocode(query):
+    return get_gazetteer().geocode(query)
+
+
+def suggest(prefix, limit=5):
+    return get_gazetteer().suggest(prefix, limit)
+
+
+def reverse(lat, lon):
+    return get_gazetteer().reverse(lat, lon)
@@ -0,0 +1,280 @@
+"""Rate-limited, prioritized queue for Nominatim lookups.
+
+Nominatim's usage policy allows about one request per second per
+application, so every lookup that has to reach it goes through one
+process-wide ``GeocodeScheduler``. A token bucket spaces the requests
+out, and a single worker thread sends them one at a time. Waiting
+lookups sit in a bounded priority queue: interactive lookups (a user is
+watching a spinner) go ahead of background ones (prefetch, batch jobs).
+Queuing a query that is already waiting, or whose request is being
+sent, joins the existing ticket instead of adding a second request. Requests are sent without the HTTP
+client's own retries; a lookup that fails transiently (e.g. a 429) goes
+back into the queue, so every retry waits for a token too.
+
+Each ``Ticket`` can report its queue position and an ETA, which the UI
+shows while it waits.
+"""
+import heapq
+import itertools
+import threading
+import time
+
+import requests
+
+import config
+import http_client
+import metrics
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+
+class QueueFullError(requests.RequestException):
+    """The geocoding queue is full; treated like an unavailable upstream."""
+
+
+class QueueTimeoutError(requests.RequestException):
+    """A queued lookup was not answered in time."""
+
+
+class TokenBucket:
+    """``rate`` tokens per second, holding at most ``burst``; rate <= 0 means unlimited."""
+
+    def __init__(self, rate, burst=1, clock=time.monotonic):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._updated = clock()
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay(self):
+        """Seconds until a token is available."""
+        if self.rate <= 0:
+            return 0.0
+        self._refill()
+        return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+
+    def take(self):
+        if self.rate > 0:
+            self._refill()
+            self._tokens -= 1
+
+
+class Ticket:
+    """A queued lookup; ``wait`` returns its result or raises its error."""
+
+    __slots__ = ("key", "query", "priority", "seq", "attempts", "done", "value", "error", "_scheduler")
+
+    def __init__(self, scheduler, key, query, priority, seq):
+        self._scheduler = scheduler
+        self.key = key
+        self.query = query
+        self.priority = priority
+        self.seq = seq
+        self.attempts = 0
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+    def wait(self, timeout=None):
+        if not self.done.wait(timeout):
+            raise QueueTimeoutError(f"geocoding '{self.query}' is still queued (position {self.position()})")
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+    def position(self):
+        """1-based place in the queue; 0 once it has been sent."""
+        return self._scheduler.position(self)
+
+    def eta(self):
+        """Estimated seconds until the request is sent."""
+        return self._scheduler.eta(self.position())
+
+
+class GeocodeScheduler:
+    """Sends ``fetch(query)`` calls at no more than ``rate`` per second, by priority."""
+
+    def __init__(self, fetch, rate=None, burst=None, maxsize=None, retries=None, clock=time.monotonic):
+        self._fetch = fetch
+        self._bucket = TokenBucket(
+            config.GEOCODE_RATE if rate is None else rate,
+            config.GEOCODE_BURST if burst is None else burst,
+            clock,
+        )
+        self.maxsize = config.GEOCODE_QUEUE_SIZE if maxsize is None else maxsize
+        self.retries = config.HTTP_RETRIES if retries is None else retries
+        self._cond = threading.Condition()
+        self._heap = []
+        self._pending = {}
+        # Tickets whose request is being sent, still joinable until they complete
+        self._in_flight = {}
+        self._seq = itertools.count()
+        self._thread = None
+        self.dispatched = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.retried = 0
+
+    def submit(self, key, query, priority=INTERACTIVE):
+        """Queue a lookup (or join the waiting or in-flight one for ``key``) and return its ticket."""
+        with self._cond:
+            ticket = self._pending.get(key) or self._in_flight.get(key)
+            if ticket is not None:
+                self.deduplicated += 1
+                if priority < ticket.priority and self._pending.get(key) is ticket:
+                    # Re-queue at the higher priority; the old heap entry is skipped
+                    ticket.priority = priority
+                    heapq.heappush(self._heap, (priority, ticket.seq, ticket))
+                return ticket
+            if len(self._pending) >= self.maxsize and not self._evict_for(priority):
+                self.rejected += 1
+                raise QueueFullError(f"geocoding queue is full ({self.maxsize} waiting)")
+            ticket = Ticket(self, key, query, priority, next(self._seq))
+            self._pending[key] = ticket
+            heapq.heappush(self._heap, (priority, ticket.seq, ticket))
+            self._cond.notify()
+        self._start()
+        return ticket
+
+    def _evict_for(self, priority):
+        # Make room for a more urgent lookup by dropping the newest lower-priority one
+        victims = [ticket for ticket in self._pending.values() if ticket.priority > priority]
+        if not victims:
+            return False
+        victim = max(victims, key=lambda ticket: (ticket.priority, ticket.seq))
+        del self._pending[victim.key]
+        self.rejected += 1
+        victim.error = QueueFullError("dropped from the geocoding queue for a more urgent lookup")
+        victim.done.set()
+        return True
+
+    def fetch(self, key, query, priority=INTERACTIVE, timeout=None):
+        """Queue a lookup and block until its result is in.
+
+        Waits at most ``GEOCODE_QUEUE_TIMEOUT`` seconds, or ``timeout`` if
+        that is sooner. A lookup that times out stays queued, so its
+        result still reaches the caches for the next attempt.
+        """
+        if timeout is None or timeout > config.GEOCODE_QUEUE_TIMEOUT:
+            timeout = config.GEOCODE_QUEUE_TIMEOUT
+        return self.submit(key, query, priority).wait(timeout)
+
+    def _start(self):
+        with self._cond:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="ramadan-geocode", daemon=True)
+        self._thread.start()
+
+    def _next(self):
+        # Highest-priority live ticket, skipping entries superseded or evicted
+        while self._heap:
+            priority, seq, ticket = heapq.heappop(self._heap)
+            if self._pending.get(ticket.key) is ticket and ticket.priority == priority:
+                del self._pending[ticket.key]
+                self._in_flight[ticket.key] = ticket
+                return ticket
+        return None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                delay = self._bucket.delay()
+                if delay > 0:
+                    # Wait for a token, then pick whatever is most urgent by then
+                    self._cond.wait(delay)
+                    continue
+                ticket = self._next()
+                if ticket is None:
+                    continue
+                self._bucket.take()
+                self.dispatched += 1
+                ticket.attempts += 1
+            try:
+                with metrics.span("geocode_queue:dispatch"):
+                    ticket.value = self._fetch(ticket.query)
+            except Exception as e:
+                if ticket.attempts <= self.retries and http_client.is_transient(e) and self._requeue(ticket):
+                    continue
+                ticket.error = e
+            with self._cond:
+                del self._in_flight[ticket.key]
+            ticket.done.set()
+
+    def _requeue(self, ticket):
+        # Back in at its original place, so the retry is next once a token is free
+        with self._cond:
+            if ticket.key in self._pending:
+                # Cannot normally happen: submit() joins the in-flight ticket
+                return False
+            del self._in_flight[ticket.key]
+            self._pending[ticket.key] = ticket
+            heapq.heappush(self._heap, (ticket.priority, ticket.seq, ticket))
+            self.retried += 1
+            return True
+
+    def position(self, ticket):
+        with self._cond:
+            if self._pending.get(ticket.key) is not ticket:
+                return 0
+            return 1 + sum(
+                1 for other in self._pending.values()
+                if (other.priority, other.seq) < (ticket.priority, ticket.seq)
+            )
+
+    def estimate(self, priority=INTERACTIVE):
+        """``(position, eta seconds)`` a lookup queued now at ``priority`` would get."""
+        with self._cond:
+            position = 1 + sum(1 for other in self._pending.values() if other.priority <= priority)
+        return position, self.eta(position)
+
+    def eta(self, position):
+        if position <= 0:
+            return 0.0
+        with self._cond:
+            delay = self._bucket.delay()
+        rate = self._bucket.rate
+        return delay + ((position - 1) / rate if rate > 0 else 0.0)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "queued": len(self._pending),
+                "in_flight": len(self._in_flight),
+                "dispatched": self.dispatched,
+                "deduplicated": self.deduplicated,
+                "rejected": self.rejected,
+                "retried": self.retried,
+            }
+
+
+def nominatim_search(query):
+    """Raw Nominatim ``/search`` result list for ``query`` (best match only).
+
+    Not retried here; the scheduler re-queues transient failures.
+    """
+    url = f"{config.NOMINATIM_BASE_URL}/search"
+    return http_client.get_json(url, params={"q": query, "format": "json", "limit": 1}, retries=0)
+
+
+# The process-wide queue every Nominatim lookup goes through
+scheduler = GeocodeScheduler(nominatim_search)
+
+
+@metrics.register_collector
+def _scheduler_metrics():
+    stats = scheduler.stats()
+    return [
+        ("geocode_queue_length", "gauge", "Lookups waiting for a Nominatim slot.", [({}, stats["queued"])]),
+    ] + [
+        (f"geocode_queue_{counter}_total", "counter", f"Nominatim lookups {counter}.", [({}, stats[counter])])
+        for counter in ("dispatched", "deduplicated", "rejected", "retried")
+    ]
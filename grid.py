@@ -0,0 +1,238 @@
+"""Coordinate snapping, so nearby users share one cached timetable.
+
+Geocoders return coordinates at full precision. Without snapping, two
+users a few streets apart would each need their own AlAdhan request and
+cache entry. ``snap`` moves a point to the centre of its grid cell
+before it reaches a cache key or an upstream URL. The cell size follows
+from ``GRID_MAX_ERROR``, the largest change in any prayer time, in
+seconds, that snapping may cause. Half of that budget goes to each axis:
+
+* Longitude moves every prayer time by 4 minutes (240 s) per degree,
+  so a cell is ``GRID_MAX_ERROR / 240`` degrees wide.
+* Latitude's effect depends on the latitude, the season and the
+  method. Its sensitivity is measured numerically with ``prayer_calc``
+  for each whole degree, over half a year and every method, and kept as
+  the steepest value of each degree and its neighbours. Latitude bands
+  are then laid out from the equator, each as tall as the steepest
+  sensitivity within it allows.
+
+Measuring the sensitivities takes a few hundred milliseconds, so they
+are shipped precomputed in ``data/grid_sensitivity.txt`` (built by
+scripts/build_grid_table.py) and only measured at run time when that
+file is missing.
+
+Beyond ``MAX_LATITUDE`` the times change too fast near the summer
+solstice for a useful cell, so those points are only rounded. With a
+budget of 0, snapping is turned off. ``measure`` compares sampled points
+with their snapped cell centres over a whole year and reports the
+largest deviation it finds:
+
+    python grid.py --max-error 30
+"""
+import argparse
+import bisect
+import collections
+import datetime
+import functools
+import logging
+import math
+import threading
+
+import config
+from prayer_calc import METHODS, compute_day_hours
+
+logger = logging.getLogger(__name__)
+
+# Seconds every prayer time moves per degree of longitude
+LONGITUDE_SENSITIVITY = 240.0
+
+# No snapping poleward of this latitude
+MAX_LATITUDE = 60.0
+
+# Headroom for the peaks that sampling whole degrees every ten days misses;
+# without it measure() finds deviations a few percent over the budget
+SENSITIVITY_MARGIN = 1.15
+
+# Times that depend on latitude (Dhuhr only on longitude; Imsak follows Fajr)
+_TIMES = ("Fajr", "Sunrise", "Asr", "Maghrib", "Isha")
+
+# A snapped point's cell, and the bound on the time change snapping introduces
+Cell = collections.namedtuple("Cell", "lat lon lat_half_height lon_half_width max_error")
+
+
+def _seasons(step=10):
+    # Solstice to solstice; the other half-year mirrors it
+    first = datetime.date(2025, 12, 21)
+    return [first + datetime.timedelta(days=i) for i in range(0, 183, step)]
+
+
+def time_change(lat_a, lon_a, lat_b, lon_b, dates, methods=METHODS, names=_TIMES):
+    """Largest difference, in seconds, between any prayer time at two points on any of ``dates``."""
+    worst = 0.0
+    for date in dates:
+        for method in methods:
+            a = compute_day_hours(lat_a, lon_a, date, method)
+            b = compute_day_hours(lat_b, lon_b, date, method)
+            for name in names:
+                if not (math.isnan(a[name]) or math.isnan(b[name])):
+                    worst = max(worst, abs(a[name] - b[name]) * 3600)
+    return worst
+
+
+def measure_latitude_sensitivity():
+    """Seconds per degree of latitude, for each whole degree from 0 to ``MAX_LATITUDE``, steepest of it and its neighbours."""
+    dates = _seasons()
+    step = 0.05
+    raw = [
+        time_change(lat + step, 0.0, lat - step, 0.0, dates) / (2 * step)
+        for lat in range(int(MAX_LATITUDE) + 2)
+    ]
+    return tuple(SENSITIVITY_MARGIN * max(raw[max(i - 1, 0):i + 2]) for i in range(int(MAX_LATITUDE) + 1))
+
+
+def load_latitude_sensitivity(path):
+    """The table written by scripts/build_grid_table.py: ``degree seconds`` per line."""
+    values = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#") or not line.strip():
+                continue
+            degree, seconds = line.split()
+            if int(degree) != len(values):
+                raise ValueError(f"{path}: degree {degree} is out of sequence")
+            values.append(float(seconds))
+    if len(values) != int(MAX_LATITUDE) + 1:
+        raise ValueError(f"{path}: expected degrees 0 to {int(MAX_LATITUDE)}")
+    return tuple(values)
+
+
+@functools.lru_cache(maxsize=1)
+def latitude_sensitivity():
+    """``measure_latitude_sensitivity()``, read from ``GRID_TABLE_PATH`` when it is there."""
+    try:
+        return load_latitude_sensitivity(config.GRID_TABLE_PATH)
+    except (OSError, ValueError) as e:
+        logger.warning("No usable grid table (%s); measuring latitude sensitivity", e)
+        return measure_latitude_sensitivity()
+
+
+class Grid:
+    """Latitude bands and longitude columns sized for ``max_error`` seconds."""
+
+    def __init__(self, max_error):
+        self.max_error = max_error
+        self.lon_width = max_error / LONGITUDE_SENSITIVITY
+        sensitivity = latitude_sensitivity()
+        # Band edges from the equator to MAX_LATITUDE; the south mirrors them
+        self.edges = [0.0]
+        self.band_sensitivity = []
+        while self.edges[-1] < MAX_LATITUDE:
+            edge = self.edges[-1]
+            steepest = sensitivity[min(int(edge), len(sensitivity) - 1)]
+            height = max_error / steepest
+            # Steeper degrees inside the band shrink it
+            steepest = max(sensitivity[int(edge):min(int(math.ceil(edge + height)), len(sensitivity) - 1) + 1])
+            height = max_error / steepest
+            self.edges.append(min(edge + height, MAX_LATITUDE))
+            self.band_sensitivity.append(steepest)
+
+    def cell(self, lat, lon):
+        """The ``Cell`` a point snaps to (itself, with no error bound, beyond ``MAX_LATITUDE``)."""
+        lat, lon = float(lat), float(lon)
+        if abs(lat) >= MAX_LATITUDE:
+            return Cell(lat, lon, 0.0, 0.0, None)
+        band = min(bisect.bisect_right(self.edges, abs(lat)) - 1, len(self.band_sensitivity) - 1)
+        lower, upper = self.edges[band], self.edges[band + 1]
+        centre = math.copysign((lower + upper) / 2, lat)
+        column = math.floor((lon + 180.0) / self.lon_width)
+        centre_lon = (column + 0.5) * self.lon_width - 180.0
+        if centre_lon > 180.0:
+            centre_lon -= 360.0
+        lat_half = (upper - lower) / 2
+        lon_half = self.lon_width / 2
+        max_error = lat_half * self.band_sensitivity[band] + lon_half * LONGITUDE_SENSITIVITY
+        return Cell(centre, centre_lon, lat_half, lon_half, max_error)
+
+    def stats(self):
+        return {
+            "max_error_s": self.max_error,
+            "bands": 2 * len(self.band_sensitivity),
+            "lon_width_deg": self.lon_width,
+            "lat_height_deg": {lat: self.cell(lat, 0).lat_half_height * 2 for lat in (0, 20, 40, 50, 59)},
+        }
+
+
+_grids = {}
+_lock = threading.Lock()
+
+
+def get_grid(max_error=None):
+    """The grid for ``max_error`` seconds (default ``GRID_MAX_ERROR``), or None when snapping is off."""
+    max_error = config.GRID_MAX_ERROR if max_error is None else max_error
+    if max_error <= 0:
+        return None
+    grid = _grids.get(max_error)
+    if grid is None:
+        with _lock:
+            grid = _grids.get(max_error)
+            if grid is None:
+                grid = _grids[max_error] = Grid(max_error)
+    return grid
+
+
+def snap(lat, lon):
+    """``(lat, lon)`` of the cell centre, rounded to ``TIMINGS_COORD_PRECISION`` places."""
+    precision = config.TIMINGS_COORD_PRECISION
+    grid = get_grid()
+    if grid is not None:
+        cell = grid.cell(lat, lon)
+        lat, lon = cell.lat, cell.lon
+    return round(float(lat), precision), round(float(lon), precision)
+
+
+def measure(max_error=None, latitudes=None, lon=0.0, step_days=3):
+    """Largest time change between sampled points and their snapped centres, over a year.
+
+    Samples both latitude edges and both longitude edges of the cell
+    around each of ``latitudes``. Returns ``{"bound_s", "worst_s",
+    "at"}``, where ``at`` is the sampled point that deviated most.
+    """
+    grid = get_grid(max_error)
+    if grid is None:
+        return {"bound_s": 0.0, "worst_s": 0.0, "at": None}
+    latitudes = latitudes if latitudes is not None else [lat + 0.5 for lat in range(-int(MAX_LATITUDE), int(MAX_LATITUDE))]
+    dates = [datetime.date(2026, 1, 1) + datetime.timedelta(days=i) for i in range(0, 365, step_days)]
+    bound = worst = 0.0
+    at = None
+    for lat in latitudes:
+        cell = grid.cell(lat, lon)
+        bound = max(bound, cell.max_error)
+        # Just inside the cell's corners (the edges themselves belong to the next cell)
+        inset = 1 - 1e-6
+        for dlat in (-cell.lat_half_height * inset, cell.lat_half_height * inset):
+            for dlon in (-cell.lon_half_width * inset, cell.lon_half_width * inset):
+                change = time_change(cell.lat + dlat, cell.lon + dlon, cell.lat, cell.lon, dates)
+                if change > worst:
+                    worst, at = change, (cell.lat + dlat, cell.lon + dlon)
+    return {"bound_s": bound, "worst_s": worst, "at": at}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the coordinate grid and the time error it introduces")
+    parser.add_argument("--max-error", type=float, default=config.GRID_MAX_ERROR, help="budget in seconds")
+    parser.add_argument("--step-days", type=int, default=3, help="sample every N days of the year")
+    args = parser.parse_args()
+    grid = get_grid(args.max_error)
+    if grid is None:
+        print("Snapping is off (budget 0)")
+        return
+    stats = grid.stats()
+    print(f"Budget {args.max_error:g} s: {stats['bands']} latitude bands, columns {stats['lon_width_deg']:.4f} deg wide")
+    for lat, height in stats["lat_height_deg"].items():
+        print(f"  band height at {lat:>2} deg: {height:.4f} deg ({height * 111.2:.1f} km)")
+    result = measure(args.max_error, step_days=args.step_days)
+    print(f"Worst-case bound {result['bound_s']:.1f} s, largest measured deviation {result['worst_s']:.1f} s at {result['at']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""Gregorian to Hijri date conversion without network calls.
+
+Dates between 1356 and 1500 AH (1937-2077) come from the Umm al-Qura
+month table in ``data/umm_al_qura.txt`` (built by
+scripts/build_hijri_table.py). It is loaded once per process into a flat
+array of month-start day numbers, so a conversion either way is an
+index computation plus at most a step or two. Outside that range, the
+arithmetical (tabular) Islamic calendar is used; it agrees with the
+observed calendar to within a day or two.
+
+``HIJRI_DAY_OFFSET`` shifts every month start by whole days, for
+communities whose moon sighting runs ahead of or behind Umm al-Qura.
+Ramadan's dates are indexed by Gregorian year (``ramadan_ranges``), so
+range fetches and prefetching can tell which days matter without asking
+AlAdhan. ``hijri_date_info`` mirrors the ``date.hijri`` block of an
+AlAdhan response so it can be dropped into locally computed payloads.
+"""
+import datetime
+import logging
+import math
+import threading
+from array import array
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Ordinal (proleptic Gregorian) of 1 Muharram 1 AH, i.e. 16 July 622 Julian
+ISLAMIC_EPOCH = 227015
+
+# Mean synodic month in days
+SYNODIC_MONTH = 29.530588853
+
+MONTHS_EN = [
+    "Muḥarram", "Ṣafar", "Rabīʿ al-awwal", "Rabīʿ al-thānī",
+    "Jumādá al-ūlá", "Jumādá al-ākhirah", "Rajab", "Shaʿbān",
+    "Ramaḍān", "Shawwāl", "Dhū al-Qaʿdah", "Dhū al-Ḥijjah",
+]
+MONTHS_AR = [
+    "مُحَرَّم", "صَفَر", "رَبيع الأوَّل", "رَبيع الثاني",
+    "جُمادى الأولى", "جُمادى الآخرة", "رَجَب", "شَعْبان",
+    "رَمَضان", "شَوّال", "ذوالقعدة", "ذوالحجة",
+]
+RAMADAN = 9
+
+
+def tabular_to_ordinal(year, month, day):
+    """Ordinal day number of a tabular Hijri date."""
+    return (
+        day
+        + math.ceil(29.5 * (month - 1))
+        + (year - 1) * 354
+        + (3 + 11 * year) // 30
+        + ISLAMIC_EPOCH - 1
+    )
+
+
+def tabular_from_ordinal(ordinal):
+    """``(year, month, day)`` in the tabular Hijri calendar."""
+    year = (30 * (ordinal - ISLAMIC_EPOCH) + 10646) // 10631
+    month = min(12, math.ceil((ordinal - 29 - tabular_to_ordinal(year, 1, 1)) / 29.5) + 1)
+    day = ordinal - tabular_to_ordinal(year, month, 1) + 1
+    return year, month, day
+
+
+class MonthTable:
+    """Month starts of consecutive Hijri years, shifted by ``offset`` days."""
+
+    def __init__(self, path, offset=0):
+        self.first_year = None
+        # Ordinal of the 1st of every month, plus the day after the last one
+        self.starts = array("l")
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("#") or not line.strip():
+                    continue
+                year, first, flags = line.split()
+                year = int(year)
+                if self.first_year is None:
+                    self.first_year = year
+                elif year != self.first_year + len(self.starts) // 12:
+                    raise ValueError(f"{path}: {year} AH is out of sequence")
+                start = datetime.date.fromisoformat(first).toordinal() + offset
+                if self.starts and self.starts[-1] != start:
+                    raise ValueError(f"{path}: {year} AH does not follow on from the year before")
+                elif self.starts:
+                    self.starts.pop()
+                for flag in flags:
+                    self.starts.append(start)
+                    start += 30 if flag == "1" else 29
+                self.starts.append(start)
+        self.last_year = self.first_year + len(self.starts) // 12 - 1
+        # Gregorian year -> ((hijri year, first ordinal, last ordinal), ...);
+        # a Gregorian year holds two Ramadans about every 33 years
+        self.ramadans = {}
+        for year in range(self.first_year, self.last_year + 1):
+            index = (year - self.first_year) * 12 + RAMADAN - 1
+            span = (year, self.starts[index], self.starts[index + 1] - 1)
+            for gregorian_year in {datetime.date.fromordinal(day).year for day in span[1:]}:
+                self.ramadans.setdefault(gregorian_year, ())
+                self.ramadans[gregorian_year] += (span,)
+
+    def month_start(self, year, month):
+        """Ordinal of the 1st of that month, or None outside the table."""
+        if not self.first_year <= year <= self.last_year:
+            return None
+        return self.starts[(year - self.first_year) * 12 + month - 1]
+
+    def from_ordinal(self, ordinal):
+        """``(year, month, day)`` of an ordinal day number, or None outside the table."""
+        starts = self.starts
+        if not starts[0] <= ordinal < starts[-1]:
+            return None
+        # The mean month lands within a step of the right one
+        index = min(int((ordinal - starts[0]) / SYNODIC_MONTH), len(starts) - 2)
+        while starts[index] > ordinal:
+            index -= 1
+        while starts[index + 1] <= ordinal:
+            index += 1
+        return self.first_year + index // 12, index % 12 + 1, ordinal - starts[index] + 1
+
+
+_table = None
+_lock = threading.Lock()
+
+
+def get_table():
+    """The process-wide month table, loaded on first use (None without its data file)."""
+    global _table
+    if _table is None:
+        with _lock:
+            if _table is None:
+                try:
+                    _table = MonthTable(config.HIJRI_TABLE_PATH, config.HIJRI_DAY_OFFSET)
+                except OSError:
+                    logger.warning("No Hijri month table at %s; using the tabular calendar", config.HIJRI_TABLE_PATH)
+                    _table = False
+    return _table or None
+
+
+def hijri_to_ordinal(year, month, day):
+    """Ordinal day number of a Hijri date."""
+    table = get_table()
+    start = table.month_start(year, month) if table else None
+    if start is None:
+        return tabular_to_ordinal(year, month, day) + config.HIJRI_DAY_OFFSET
+    return start + day - 1
+
+
+def gregorian_to_hijri(date):
+    """Return ``(year, month, day)`` in the Hijri calendar."""
+    ordinal = date.toordinal()
+    table = get_table()
+    hijri = table.from_ordinal(ordinal) if table else None
+    if hijri is None:
+        return tabular_from_ordinal(ordinal - config.HIJRI_DAY_OFFSET)
+    return hijri
+
+
+def hijri_to_gregorian(year, month, day):
+    return datetime.date.fromordinal(hijri_to_ordinal(year, month, day))
+
+
+def ramadan_range(hijri_year):
+    """First and last Gregorian dates of Ramadan in ``hijri_year``."""
+    start = hijri_to_gregorian(hijri_year, RAMADAN, 1)
+    end = hijri_to_gregorian(hijri_year, RAMADAN + 1, 1) - datetime.timedelta(days=1)
+    return start, end
+
+
+def ramadan_ranges(gregorian_year):
+    """``[(hijri_year, first date, last date)]`` of every Ramadan overlapping ``gregorian_year``."""
+    table = get_table()
+    if table and gregorian_year in table.ramadans:
+        return [
+            (hijri_year, datetime.date.fromordinal(first), datetime.date.fromordinal(last))
+            for hijri_year, first, last in table.ramadans[gregorian_year]
+        ]
+    ranges = []
+    # Outside the table: the Ramadans of the Hijri years around January and December
+    for date in (datetime.date(gregorian_year, 1, 1), datetime.date(gregorian_year, 12, 31)):
+        hijri_year = gregorian_to_hijri(date)[0]
+        for year in (hijri_year - 1, hijri_year):
+            start, end = ramadan_range(year)
+            if start.year <= gregorian_year <= end.year and (year, start, end) not in ranges:
+                ranges.append((year, start, end))
+    return ranges
+
+
+def next_ramadan(date):
+    """``(first date, last date)`` of the Ramadan ``date`` falls in, or else of the next one."""
+    for _, start, end in ramadan_ranges(date.year) + ramadan_ranges(date.year + 1):
+        if end >= date:
+            return start, end
+    return None
+
+
+def hijri_date_info(date):
+    """The ``date.hijri`` dict AlAdhan returns, computed locally."""
+    year, month, day = gregorian_to_hijri(date)
+    return {
+        "date": f"{day:02d}-{month:02d}-{year}",
+        "format": "DD-MM-YYYY",
+        "day": f"{day:02d}",
+        "month": {"number": month, "en": MONTHS_EN[month - 1], "ar": MONTHS_AR[month - 1]},
+        "year": str(year),
+    }
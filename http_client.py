@@ -0,0 +1,231 @@
+"""Shared HTTP client for upstream APIs (AlAdhan, Nominatim).
+
+One pooled ``requests.Session`` per host keeps connections alive between
+calls. Every call has a deadline that covers all of its attempts,
+transient failures are retried with jittered exponential backoff (or
+after the server's ``Retry-After``), and a per-host circuit breaker
+fails fast while an upstream is down so callers can fall back to cached
+data instead of tying up a worker thread.
+"""
+import email.utils
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+import metrics
+
+USER_AGENT = 'RamadanTimesApp/1.0'
+
+# Statuses worth retrying: rate limiting and server-side failures
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Statuses whose Retry-After header says when to try again
+RETRY_AFTER_STATUSES = {429, 503}
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised without touching the network while a host's breaker is open."""
+
+
+class ErrorResponse(requests.HTTPError):
+    """An error status whose body is not JSON, e.g. an HTML 403 page."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    After ``failure_threshold`` failures in a row the breaker opens and
+    rejects calls for ``reset_timeout`` seconds. It then lets a single
+    trial call through (half-open); success closes it again, failure
+    re-opens it.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return self.CLOSED
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        """Whether a call may go out now."""
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+
+
+_lock = threading.Lock()
+_sessions = {}
+_breakers = {}
+
+
+def _host(url):
+    return urlsplit(url).netloc
+
+
+def get_session(host):
+    """Keep-alive session for ``host``, created on first use."""
+    with _lock:
+        session = _sessions.get(host)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=1,
+                pool_maxsize=config.HTTP_POOL_SIZE,
+                max_retries=0,
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers['User-Agent'] = USER_AGENT
+            _sessions[host] = session
+        return session
+
+
+def get_breaker(host):
+    with _lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = CircuitBreaker(config.HTTP_BREAKER_THRESHOLD, config.HTTP_BREAKER_RESET)
+            _breakers[host] = breaker
+        return breaker
+
+
+def breaker_states():
+    """Current breaker state per host, for diagnostics."""
+    with _lock:
+        breakers = dict(_breakers)
+    return {host: breaker.state for host, breaker in breakers.items()}
+
+
+@metrics.register_collector
+def _breaker_metrics():
+    states = breaker_states()
+    return [
+        ("circuit_open", "gauge", "1 while a host's circuit breaker is not closed.",
+         [({"host": host}, int(state != CircuitBreaker.CLOSED)) for host, state in states.items()]),
+    ]
+
+
+def _backoff(attempt):
+    # "Full jitter": a uniform delay up to the exponential cap
+    return random.uniform(0, config.HTTP_BACKOFF * (2 ** attempt))
+
+
+def _retry_after(error):
+    """Seconds the server asked us to wait before retrying, or None."""
+    response = getattr(error, "response", None)
+    if response is None or response.status_code not in RETRY_AFTER_STATUSES:
+        return None
+    value = response.headers.get("Retry-After", "").strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(when.timestamp() - time.time(), 0.0)
+
+
+def is_transient(error):
+    """Whether a ``get_json`` failure is worth retrying."""
+    return (isinstance(error, (requests.RequestException, ValueError))
+            and not isinstance(error, (CircuitOpenError, ErrorResponse)))
+
+
+def _decode(response):
+    try:
+        return response.json()
+    except ValueError:
+        if response.ok:
+            # A truncated or garbled success body is worth another try
+            raise
+        raise ErrorResponse(f"{response.status_code} with a non-JSON body from {response.url}", response=response)
+
+
+def get_json(url, params=None, headers=None, timeout=None, retries=None):
+    """GET ``url`` and decode its JSON body.
+
+    The whole call, retries and waits included, takes at most ``timeout``
+    seconds (default ``config.UPSTREAM_TIMEOUT``): each attempt gets what
+    is left of it. Connection errors, timeouts and retryable statuses
+    are retried up to ``retries`` times (default ``config.HTTP_RETRIES``),
+    after the ``Retry-After`` a 429 or 503 asks for, or a jittered
+    backoff; a wait that would overrun the deadline ends the call. Other 4xx
+    responses are returned as-is (AlAdhan reports bad input in the JSON
+    body), or raise ``ErrorResponse`` when their body is not JSON; they
+    are not retried and do not count against the breaker. Raises
+    ``CircuitOpenError`` while the host is failing.
+    """
+    host = _host(url)
+    breaker = get_breaker(host)
+    if not breaker.allow():
+        raise CircuitOpenError(f"{host} is unavailable (circuit open)")
+
+    session = get_session(host)
+    deadline = time.monotonic() + (timeout or config.UPSTREAM_TIMEOUT)
+    attempts = (config.HTTP_RETRIES if retries is None else retries) + 1
+    # One span per logical request, retries and backoff included
+    with metrics.span(f"upstream:{host}"):
+        for attempt in range(attempts):
+            remaining = deadline - time.monotonic()
+            try:
+                response = session.get(url, params=params, headers=headers,
+                                       timeout=(min(config.HTTP_CONNECT_TIMEOUT, remaining), remaining))
+                if response.status_code in RETRY_STATUSES:
+                    response.raise_for_status()
+                data = _decode(response)
+            except ErrorResponse:
+                # The host answered; only the request was refused
+                breaker.record_success()
+                raise
+            except Exception as e:
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = _backoff(attempt)
+                if not is_transient(e) or attempt + 1 >= attempts or time.monotonic() + delay >= deadline:
+                    breaker.record_failure()
+                    raise
+                time.sleep(delay)
+                continue
+            breaker.record_success()
+            return data
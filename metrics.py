@@ -0,0 +1,250 @@
+"""Process-wide timing spans, latency histograms and error counters.
+
+Wrap a hot path in ``span`` (or decorate it with ``timed``) and every
+call is folded into a fixed-bucket latency histogram shared by all
+sessions in the process, with calls that raise counted as errors:
+
+    with metrics.span("render"):
+        ...
+
+``export_prometheus`` renders everything in the Prometheus text format,
+together with whatever other modules report through
+``register_collector`` (cache and circuit-breaker state), and
+``start_http_server`` serves that on ``/metrics`` from a background
+thread. Streamlit's rerun and stop signals pass through spans without
+counting as errors. With ``RAMADAN_METRICS=0`` spans are a shared no-op
+object and ``timed`` returns functions undecorated.
+"""
+import logging
+import sys
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import config
+
+logger = logging.getLogger(__name__)
+
+ENABLED = config.METRICS_ENABLED
+
+# Upper bounds, in seconds, of the latency histogram buckets
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_PREFIX = "ramadan"
+
+
+class Histogram:
+    """Cumulative-by-export latency histogram with an error counter."""
+
+    __slots__ = ("buckets", "counts", "count", "sum", "errors")
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        # One slot per bucket plus the +Inf overflow
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.errors = 0
+
+    def observe(self, seconds, error=False):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if error:
+            self.errors += 1
+
+    def quantile(self, q):
+        """Estimate the ``q`` quantile by interpolating inside its bucket."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class Registry:
+    """Named histograms behind one lock."""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds, error=False):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram(self.buckets)
+            histogram.observe(seconds, error)
+
+    def snapshot(self):
+        """``{span name: count, errors, sum, mean, p50, p95, p99}``, sorted by name."""
+        with self._lock:
+            return {name: self._histograms[name].snapshot() for name in sorted(self._histograms)}
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+    def export_lines(self):
+        name = f"{_PREFIX}_span_duration_seconds"
+        errors_name = f"{_PREFIX}_span_errors_total"
+        with self._lock:
+            histograms = [(span_name, self._histograms[span_name]) for span_name in sorted(self._histograms)]
+            lines = [f"# HELP {name} Latency of instrumented spans.", f"# TYPE {name} histogram"]
+            for span_name, histogram in histograms:
+                label = _escape(span_name)
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, histogram.counts):
+                    cumulative += bucket_count
+                    lines.append(f'{name}_bucket{{span="{label}",le="{bound:g}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{span="{label}",le="+Inf"}} {histogram.count}')
+                lines.append(f'{name}_sum{{span="{label}"}} {histogram.sum!r}')
+                lines.append(f'{name}_count{{span="{label}"}} {histogram.count}')
+            lines += [f"# HELP {errors_name} Instrumented spans that raised.", f"# TYPE {errors_name} counter"]
+            for span_name, histogram in histograms:
+                lines.append(f'{errors_name}{{span="{_escape(span_name)}"}} {histogram.errors}')
+        return lines
+
+
+registry = Registry()
+_collectors = []
+
+
+def _is_control_flow(exc_type):
+    # st.rerun() and st.stop() unwind the script with these; looked up only
+    # once Streamlit is loaded, so the API server and CLI never import it
+    scriptrunner = sys.modules.get("streamlit.runtime.scriptrunner")
+    return scriptrunner is not None and issubclass(exc_type, (scriptrunner.RerunException, scriptrunner.StopException))
+
+
+class _Span:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        error = exc_type is not None and not _is_control_flow(exc_type)
+        registry.observe(self.name, time.perf_counter() - self.started, error)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name):
+    """Context manager timing its block into the ``name`` histogram."""
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def timed(name):
+    """Decorator form of ``span``; a no-op when metrics are disabled."""
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def register_collector(collector):
+    """Add a callable returning ``(name, type, help, [(labels, value), ...])`` tuples to the export."""
+    _collectors.append(collector)
+    return collector
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def export_prometheus():
+    """All spans and collected gauges/counters in the Prometheus text format."""
+    lines = registry.export_lines()
+    for collector in _collectors:
+        for name, kind, help_text, samples in collector():
+            name = f"{_PREFIX}_{name}"
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = export_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+_http_server = None
+_http_lock = threading.Lock()
+
+
+def start_http_server(host, port):
+    """Serve ``/metrics`` for this process from a daemon thread; later calls are no-ops.
+
+    Returns the server, or None if the port could not be bound.
+    """
+    global _http_server
+    with _http_lock:
+        if _http_server is None:
+            try:
+                _http_server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            except OSError as e:
+                logger.warning("Cannot serve metrics on %s:%s: %s", host, port, e)
+                _http_server = False
+            else:
+                threading.Thread(target=_http_server.serve_forever, name="ramadan-metrics", daemon=True).start()
+    return _http_server or None
@@ -0,0 +1,223 @@
+"""Shared, compact day timetables that sessions point into.
+
+Sessions used to keep whole AlAdhan payloads in their state: nested
+``date``, ``hijri`` and ``meta`` dicts, most of which the page never
+reads, duplicated for every session showing the same place. Now a
+payload is reduced once to a ``DayRecord``, an immutable tuple of the
+fields the page shows, with the short strings interned. The record is
+kept in the process-wide ``store``, and a session holds only a
+``Handle``: a location key plus a day index.
+
+The store counts the live handles of each record. Referenced records
+are never evicted. Unreferenced ones stay in an LRU of
+``PAYLOAD_STORE_SIZE`` entries, so the next session asking for the
+same day gets them for free. A handle gives its reference back when it
+is garbage collected, e.g. when its session ends or replaces it. Per-
+session memory therefore stays one small handle per day, however large
+the payloads are.
+"""
+import collections
+import datetime
+import sys
+import threading
+import weakref
+
+import config
+import grid
+from prayer_calc import PRAYER_NAMES
+
+
+class DayRecord(collections.namedtuple("DayRecord", (
+    "date", "readable", "times", "timezone", "latitude", "longitude", "source", "verification",
+))):
+    """One day's timetable as the page shows it; ``times`` follows ``PRAYER_NAMES``."""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_payload(cls, payload):
+        """Reduce an AlAdhan-style payload; the strings shared between days are interned."""
+        date = payload["date"]
+        meta = payload.get("meta", {})
+        verification = meta.get("verification")
+        if verification is not None:
+            verification = (sys.intern(verification["status"]), verification.get("max_difference_minutes"))
+        return cls(
+            datetime.datetime.strptime(date["gregorian"]["date"], "%d-%m-%Y").date(),
+            date["readable"],
+            tuple(sys.intern(payload["timings"][name][:5]) for name in PRAYER_NAMES),
+            sys.intern(meta.get("timezone") or ""),
+            meta.get("latitude"),
+            meta.get("longitude"),
+            sys.intern(meta.get("source", "api")),
+            verification,
+        )
+
+    def time(self, name):
+        """"HH:MM" of one prayer."""
+        return self.times[PRAYER_NAMES.index(name)]
+
+
+# Per-session summary of the last fetch, shown in the debug panel
+FetchInfo = collections.namedtuple("FetchInfo", "date date_source timezone timezone_source latencies")
+
+
+class Handle:
+    """A session's reference to one stored day; gives it back when collected."""
+
+    __slots__ = ("key", "__weakref__")
+
+    def __init__(self, store, key):
+        self.key = key
+        weakref.finalize(self, store._released.append, key)
+
+    @property
+    def location(self):
+        """``(lat, lon, method, tz_name)``."""
+        return self.key[0]
+
+    @property
+    def lat(self):
+        return self.key[0][0]
+
+    @property
+    def lon(self):
+        return self.key[0][1]
+
+    @property
+    def method(self):
+        return self.key[0][2]
+
+    @property
+    def tz_name(self):
+        return self.key[0][3]
+
+    @property
+    def date(self):
+        return datetime.date.fromordinal(self.key[1])
+
+
+class _Entry:
+    __slots__ = ("record", "refs")
+
+    def __init__(self, record):
+        self.record = record
+        self.refs = 0
+
+
+class PayloadStore:
+    """Interned ``DayRecord``s keyed by (location, day), refcounted with an LRU of unreferenced ones."""
+
+    def __init__(self, maxsize=None):
+        self.maxsize = config.PAYLOAD_STORE_SIZE if maxsize is None else maxsize
+        self._lock = threading.Lock()
+        self._entries = collections.OrderedDict()
+        # Each distinct record once, with the number of entries using it
+        self._records = {}
+        self._record_uses = collections.Counter()
+        # Finalizers may run on any thread, even inside a locked section
+        # (a collection triggered by an allocation), so they only queue the
+        # key here and the next store operation applies the decrement
+        self._released = collections.deque()
+        self.evictions = 0
+        self.interned = 0
+
+    @staticmethod
+    def location_key(lat, lon, method, tz_name):
+        return grid.snap(lat, lon) + (int(method), tz_name)
+
+    def put(self, lat, lon, method, tz_name, date, payload):
+        """Store ``payload`` as the timetable of ``date`` at that location; returns a new handle."""
+        if payload is None:
+            return None
+        record = DayRecord.from_payload(payload)
+        key = (self.location_key(lat, lon, method, tz_name), date.toordinal())
+        with self._lock:
+            self._drain()
+            # Equal records from any location or session share one object
+            shared = self._records.setdefault(record, record)
+            if shared is not record:
+                self.interned += 1
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(shared)
+                self._record_uses[shared] += 1
+            elif entry.record is not shared:
+                # Refetched with different content: every handle sees the new one
+                self._forget(entry.record)
+                entry.record = shared
+                self._record_uses[shared] += 1
+            entry.refs += 1
+            self._entries.move_to_end(key)
+            self._evict()
+        return Handle(self, key)
+
+    def acquire(self, lat, lon, method, tz_name, date):
+        """A new handle to a day that is still stored, or None."""
+        key = (self.location_key(lat, lon, method, tz_name), date.toordinal())
+        with self._lock:
+            self._drain()
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            entry.refs += 1
+            self._entries.move_to_end(key)
+        return Handle(self, key)
+
+    def get(self, handle):
+        """The ``DayRecord`` behind a handle (None for a None handle)."""
+        if handle is None:
+            return None
+        with self._lock:
+            return self._entries[handle.key].record
+
+    def _drain(self):
+        while self._released:
+            entry = self._entries.get(self._released.popleft())
+            if entry is not None:
+                entry.refs -= 1
+
+    def _forget(self, record):
+        self._record_uses[record] -= 1
+        if self._record_uses[record] <= 0:
+            del self._record_uses[record]
+            del self._records[record]
+
+    def _evict(self):
+        # Oldest unreferenced entries first; referenced ones are pinned
+        excess = len(self._entries) - self.maxsize
+        if excess <= 0:
+            return
+        for key in [key for key, entry in self._entries.items() if entry.refs <= 0][:excess]:
+            entry = self._entries.pop(key)
+            self._forget(entry.record)
+            self.evictions += 1
+
+    def memory_report(self):
+        """Entry counts and approximate bytes held (records, their tuples and strings)."""
+        with self._lock:
+            self._drain()
+            records = list(self._records)
+            referenced = sum(1 for entry in self._entries.values() if entry.refs > 0)
+            handles = sum(max(entry.refs, 0) for entry in self._entries.values())
+            entries = len(self._entries)
+        seen = set()
+        size = 0
+        for record in records:
+            for part in (record, record.times, record.verification) + tuple(record) + record.times:
+                if part is not None and id(part) not in seen:
+                    seen.add(id(part))
+                    size += sys.getsizeof(part)
+        return {
+            "entries": entries,
+            "records": len(records),
+            "referenced": referenced,
+            "handles": handles,
+            "bytes": size,
+            "interned": self.interned,
+            "evictions": self.evictions,
+        }
+
+
+# The process-wide store every session's handles point into
+store = PayloadStore()
@@ -0,0 +1,247 @@
+"""Local astronomical prayer-time calculation.
+
+A pure-Python port of the standard PrayTimes solar-position algorithm,
+configured to match the AlAdhan API defaults (Standard Asr, angle-based
+high-latitude adjustment, Standard midnight) for the calculation methods
+offered in the sidebar. ``compute_prayer_times`` returns the same dict
+shape as an AlAdhan ``/v1/timings`` response so the rest of the app can
+use either source interchangeably.
+
+On days of polar day or polar night, when the sun does not rise and set
+at the location, the times of the nearest latitude (towards the
+equator) where it does are used instead: the "nearest latitude" rule.
+"""
+import datetime
+import math
+
+from hijri import hijri_date_info
+from timezones import localize
+
+# Calculation methods offered in the sidebar, keyed by AlAdhan method id.
+# "isha" is either a depression angle in degrees or a fixed delay in
+# minutes after Maghrib ("isha_minutes").
+METHODS = {
+    1: {"name": "University of Islamic Sciences, Karachi", "fajr": 18.0, "isha": 18.0},
+    2: {"name": "Islamic Society of North America (ISNA)", "fajr": 15.0, "isha": 15.0},
+    3: {"name": "Muslim World League", "fajr": 18.0, "isha": 17.0},
+    4: {"name": "Umm Al-Qura University, Makkah", "fajr": 18.5, "isha_minutes": 90},
+}
+
+PRAYER_NAMES = ['Fajr', 'Sunrise', 'Dhuhr', 'Asr', 'Maghrib', 'Isha']
+
+# Depression of the sun's centre at sunrise/sunset (refraction + semi-diameter)
+RISE_SET_ANGLE = 0.833
+# Minutes between Imsak and Fajr, as used by AlAdhan
+IMSAK_MINUTES = 10
+# Degrees stepped towards the equator per try when looking for the nearest
+# latitude where the sun rises and sets (polar day and night)
+POLAR_LATITUDE_STEP = 0.5
+
+
+def _sin(d):
+    return math.sin(math.radians(d))
+
+
+def _cos(d):
+    return math.cos(math.radians(d))
+
+
+def _tan(d):
+    return math.tan(math.radians(d))
+
+
+def _arcsin(x):
+    return math.degrees(math.asin(x))
+
+
+def _arccos(x):
+    return math.degrees(math.acos(x))
+
+
+def _arctan2(y, x):
+    return math.degrees(math.atan2(y, x))
+
+
+def _arccot(x):
+    return math.degrees(math.atan(1.0 / x))
+
+
+def _fix(a, b):
+    a = a - b * math.floor(a / b)
+    return a + b if a < 0 else a
+
+
+def julian_date(date):
+    """Julian date at 0h UT of a ``datetime.date``."""
+    return date.toordinal() + 1721424.5
+
+
+def sun_position(jd):
+    """Return ``(declination, equation_of_time)`` for a Julian date."""
+    d = jd - 2451545.0
+    g = _fix(357.529 + 0.98560028 * d, 360)
+    q = _fix(280.459 + 0.98564736 * d, 360)
+    l = _fix(q + 1.915 * _sin(g) + 0.020 * _sin(2 * g), 360)
+    e = 23.439 - 0.00000036 * d
+    ra = _fix(_arctan2(_cos(e) * _sin(l), _cos(l)) / 15.0, 24)
+    eqt = q / 15.0 - ra
+    decl = _arcsin(_sin(e) * _sin(l))
+    return decl, eqt
+
+
+class _SolarDay:
+    """Solar geometry for one location and one local date (times in UT hours)."""
+
+    def __init__(self, lat, lon, date):
+        self.lat = lat
+        self.lon = lon
+        self.jd = julian_date(date) - lon / (15.0 * 24.0)
+
+    def mid_day(self, t):
+        _, eqt = sun_position(self.jd + t)
+        return _fix(12 - eqt, 24)
+
+    def sun_angle_time(self, angle, t, ccw=False):
+        decl, _ = sun_position(self.jd + t)
+        noon = self.mid_day(t)
+        cos_h = (-_sin(angle) - _sin(decl) * _sin(self.lat)) / (_cos(decl) * _cos(self.lat))
+        if cos_h < -1 or cos_h > 1:
+            # The sun never reaches this angle today (high latitudes)
+            return float('nan')
+        h = _arccos(cos_h) / 15.0
+        return noon - h if ccw else noon + h
+
+    def asr_time(self, factor, t):
+        decl, _ = sun_position(self.jd + t)
+        angle = -_arccot(factor + _tan(abs(self.lat - decl)))
+        return self.sun_angle_time(angle, t)
+
+
+def _time_diff(t1, t2):
+    return _fix(t2 - t1, 24)
+
+
+def utc_offset_hours(tz_name, date):
+    """UTC offset of ``tz_name`` at local noon on ``date``, honouring DST."""
+    noon = localize(date, datetime.time(12, 0), tz_name)
+    return noon.utcoffset().total_seconds() / 3600.0
+
+
+def compute_day_hours(lat, lon, date, method=2, utc_offset=0.0):
+    """Prayer times for one day as fractional local hours.
+
+    Returns a dict with Imsak, Fajr, Sunrise, Dhuhr, Asr, Sunset, Maghrib,
+    Isha and Midnight. Values may exceed 24 or be negative when a time
+    falls on the neighbouring day. During polar day or night the times
+    follow the nearest latitude where the sun rises and sets.
+    """
+    params = METHODS[method]
+    day = _SolarDay(lat, lon, date)
+
+    # One refinement pass starting from the usual rough guesses
+    sunrise = day.sun_angle_time(RISE_SET_ANGLE, 6 / 24.0, ccw=True)
+    sunset = day.sun_angle_time(RISE_SET_ANGLE, 18 / 24.0)
+    asr = day.asr_time(1, 13 / 24.0)
+    if (math.isnan(sunrise) or math.isnan(sunset) or math.isnan(asr)) and abs(lat) > POLAR_LATITUDE_STEP:
+        # Polar day or night: no sunrise or sunset to anchor the night on
+        return compute_day_hours(lat - math.copysign(POLAR_LATITUDE_STEP, lat), lon, date, method, utc_offset)
+    fajr = day.sun_angle_time(params["fajr"], 5 / 24.0, ccw=True)
+    dhuhr = day.mid_day(12 / 24.0)
+    isha = float('nan')
+    if "isha" in params:
+        isha = day.sun_angle_time(params["isha"], 18 / 24.0)
+
+    shift = utc_offset - lon / 15.0
+    fajr, sunrise, dhuhr, asr, sunset, isha = (
+        t + shift for t in (fajr, sunrise, dhuhr, asr, sunset, isha)
+    )
+    maghrib = sunset
+
+    # Angle-based high-latitude adjustment (AlAdhan latitudeAdjustmentMethod=3)
+    night = _time_diff(sunset, sunrise)
+    fajr_portion = params["fajr"] / 60.0 * night
+    if math.isnan(fajr) or _time_diff(fajr, sunrise) > fajr_portion:
+        fajr = sunrise - fajr_portion
+    if "isha_minutes" in params:
+        isha = maghrib + params["isha_minutes"] / 60.0
+    else:
+        isha_portion = params["isha"] / 60.0 * night
+        if math.isnan(isha) or _time_diff(sunset, isha) > isha_portion:
+            isha = sunset + isha_portion
+
+    return {
+        "Imsak": fajr - IMSAK_MINUTES / 60.0,
+        "Fajr": fajr,
+        "Sunrise": sunrise,
+        "Dhuhr": dhuhr,
+        "Asr": asr,
+        "Sunset": sunset,
+        "Maghrib": maghrib,
+        "Isha": isha,
+        "Midnight": sunset + night / 2.0,
+    }
+
+
+def format_hours(hours):
+    """Fractional hours to an AlAdhan-style "HH:MM" string (nearest minute)."""
+    total_minutes = int(math.floor(_fix(hours + 0.5 / 60.0, 24) * 60))
+    return f"{total_minutes // 60:02d}:{total_minutes % 60:02d}"
+
+
+def compute_prayer_times(lat, lon, date, method=2, tz_name='US/Eastern'):
+    """Compute a day's timings locally in the shape of an AlAdhan payload."""
+    if method not in METHODS:
+        raise ValueError(f"Unsupported calculation method: {method}")
+    offset = utc_offset_hours(tz_name, date)
+    hours = compute_day_hours(lat, lon, date, method, offset)
+    params = METHODS[method]
+    midnight = localize(date, datetime.time(0, 0), tz_name)
+
+    return {
+        "timings": {name: format_hours(value) for name, value in hours.items()},
+        "date": {
+            "readable": date.strftime("%d %b %Y"),
+            "timestamp": str(int(midnight.timestamp())),
+            "gregorian": {
+                "date": date.strftime("%d-%m-%Y"),
+                "format": "DD-MM-YYYY",
+                "day": date.strftime("%d"),
+                "weekday": {"en": date.strftime("%A")},
+                "month": {"number": date.month, "en": date.strftime("%B")},
+                "year": str(date.year),
+            },
+            "hijri": hijri_date_info(date),
+        },
+        "meta": {
+            "latitude": lat,
+            "longitude": lon,
+            "timezone": tz_name,
+            "method": {
+                "id": method,
+                "name": params["name"],
+                "params": {
+                    "Fajr": params["fajr"],
+                    "Isha": params.get("isha", f"{params.get('isha_minutes')} min"),
+                },
+            },
+            "latitudeAdjustmentMethod": "ANGLE_BASED",
+            "midnightMode": "STANDARD",
+            "school": "STANDARD",
+            "source": "local",
+        },
+    }
+
+
+def max_difference_minutes(local_timings, api_timings):
+    """Largest absolute difference in minutes between two ``timings`` dicts."""
+    worst = 0
+    for name in PRAYER_NAMES:
+        a = local_timings.get(name)
+        b = api_timings.get(name)
+        if not a or not b:
+            continue
+        ah, am = (int(x) for x in a[:5].split(':'))
+        bh, bm = (int(x) for x in b[:5].split(':'))
+        diff = abs((ah * 60 + am) - (bh * 60 + bm))
+        worst = max(worst, min(diff, 24 * 60 - diff))
+    return worst
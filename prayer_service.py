@@ -0,0 +1,372 @@
+"""Upstream I/O for the Ramadan Times app: geocoding and prayer timings.
+
+Nothing in here touches Streamlit, so the functions are safe to run on
+worker threads and reusable outside the UI. Errors are raised to the
+caller; ``load_prayer_times`` collects them per stage instead.
+"""
+import collections
+import datetime
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import requests
+
+import config
+import gazetteer
+import geocode_scheduler
+import grid
+import http_client
+import metrics
+from cache import geocode_cache, normalize_query, timings_cache, timings_cache_key, timings_ttl
+from hijri import next_ramadan
+from prayer_calc import compute_prayer_times, max_difference_minutes
+from singleflight import SingleFlight
+from store import get_store
+from timezones import infer_timezone, now_in, today_in
+
+logger = logging.getLogger(__name__)
+
+# Shared pool for upstream calls so one session's fetches run side by side
+_executor = ThreadPoolExecutor(max_workers=config.IO_WORKERS, thread_name_prefix="ramadan-io")
+
+# Concurrent misses for the same key share one upstream call
+geocode_flight = SingleFlight("geocode")
+timings_flight = SingleFlight("timings")
+range_flight = SingleFlight("timings_range")
+
+# Open the on-disk store now, so the hot locations are in memory before the first request
+get_store()
+# Lay out the coordinate grid now too, from its precomputed table
+grid.get_grid()
+
+
+# Function to convert location name to coordinates (Nominatim and/or the offline gazetteer)
+@metrics.timed("geocode_location")
+def geocode_location(location_name, priority=geocode_scheduler.INTERACTIVE, timeout=None):
+    # Serve repeated lookups from the process-wide cache shared by all sessions
+    cache_key = normalize_query(location_name)
+    with metrics.span("cache:geocode"):
+        cached = geocode_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    # The offline gazetteer and the on-disk store answer most misses quickly
+    result = geocode_flight.do(cache_key, _geocode_local, location_name, cache_key)
+    if result is not None:
+        return result
+    # The rest wait for a Nominatim slot, at most `timeout` seconds; the queue
+    # merges lookups of a query that is waiting or being sent into one request
+    return _geocode_nominatim(location_name, cache_key, priority, timeout)
+
+# Function to resolve a cache miss without Nominatim; one call per query runs at a time
+def _geocode_local(location_name, cache_key):
+    # A flight that just finished may have filled the cache since our miss
+    if cache_key in geocode_cache:
+        return geocode_cache.get(cache_key)
+    
+    # Try the bundled offline gazetteer before (or instead of) Nominatim
+    if config.GEOCODER in ("offline", "offline_first"):
+        result = gazetteer.geocode(location_name)
+        if result[0] is not None:
+            geocode_cache.set(cache_key, result)
+            return result
+        if config.GEOCODER == "offline":
+            return result
+    
+    # Then earlier Nominatim answers kept on disk across restarts
+    disk = get_store()
+    if disk is not None:
+        row = disk.get_geocode(cache_key)
+        if row is not None:
+            result = tuple(row[:3])
+            geocode_cache.set(cache_key, result, ttl=row[3] - time.time())
+            return result
+    return None
+
+# Function to look a query up on Nominatim, which allows about one request per second
+def _geocode_nominatim(location_name, cache_key, priority, timeout):
+    disk = get_store()
+    try:
+        data = geocode_scheduler.scheduler.fetch(cache_key, location_name, priority, timeout)
+    except requests.RequestException:
+        # Nominatim is down or failing: an expired result beats no result
+        stale = geocode_cache.get_stale(cache_key)
+        if stale is None and disk is not None:
+            row = disk.get_geocode(cache_key, allow_expired=True)
+            stale = tuple(row[:3]) if row is not None else None
+        if stale is not None:
+            return stale
+        raise
+    
+    if data and len(data) > 0:
+        lat = data[0]['lat']
+        lon = data[0]['lon']
+        display_name = data[0]['display_name']
+        result = (float(lat), float(lon), display_name)
+        geocode_cache.set(cache_key, result)
+        if disk is not None:
+            disk.put_geocode(cache_key, result, config.GEOCODE_CACHE_TTL)
+        return result
+    else:
+        return None, None, None
+
+# Function to download one day's prayer times from AlAdhan API
+def fetch_api_timings(lat, lon, date, method=2, tz_name='US/Eastern'):
+    date_formatted = date.strftime("%d-%m-%Y")
+    # Add timezone parameter to the API request
+    url = f"{config.ALADHAN_BASE_URL}/timings/{date_formatted}"
+    data = http_client.get_json(url, params={"latitude": lat, "longitude": lon, "method": method, "timezone": tz_name})
+    if data["code"] == 200:
+        # Force the correct date in the response
+        data["data"]["date"]["readable"] = date.strftime("%d %b %Y")
+        return data["data"]
+    return None
+
+# Function to download a whole date range of prayer times in one AlAdhan calendar request
+def fetch_api_timings_range(lat, lon, start_date, end_date, method=2, tz_name='US/Eastern'):
+    start_formatted = start_date.strftime("%d-%m-%Y")
+    end_formatted = end_date.strftime("%d-%m-%Y")
+    url = f"{config.ALADHAN_BASE_URL}/calendar/from/{start_formatted}/to/{end_formatted}"
+    data = http_client.get_json(url, params={"latitude": lat, "longitude": lon, "method": method, "timezone": tz_name})
+    if data["code"] != 200:
+        return None
+    
+    # Index the calendar by date; calendar timings carry a " (TZ)" suffix we strip
+    days = {}
+    for day in data["data"]:
+        day_date = datetime.datetime.strptime(day["date"]["gregorian"]["date"], "%d-%m-%Y").date()
+        day["timings"] = {name: value.split(" ")[0] for name, value in day["timings"].items()}
+        day["date"]["readable"] = day_date.strftime("%d %b %Y")
+        days[day_date] = day
+    return days
+
+# Date range fetched together with `date`: the whole of Ramadan (plus the day
+# after, for "tomorrow" on the last night) or the next RANGE_FETCH_DAYS days,
+# stopping short of an upcoming Ramadan so that it is fetched as a whole
+def timings_range_for_date(date):
+    ramadan_start, ramadan_end = next_ramadan(date)
+    if ramadan_start <= date:
+        return ramadan_start, ramadan_end + datetime.timedelta(days=1)
+    return date, min(date + datetime.timedelta(days=config.RANGE_FETCH_DAYS - 1), ramadan_start - datetime.timedelta(days=1))
+
+# Function to download the range around `date` and index every day in the shared cache
+def fetch_api_timings_via_range(lat, lon, date, method=2, tz_name='US/Eastern'):
+    start_date, end_date = timings_range_for_date(date)
+    # Concurrent requests for nearby days of one location share a single range
+    # request, keyed by the location only (the cache key minus its date)
+    cache_key = timings_cache_key(lat, lon, start_date, method, tz_name)
+    days = range_flight.do(cache_key[:2] + cache_key[3:], _fetch_and_remember_range, lat, lon, start_date, end_date, method, tz_name)
+    if days and date not in days:
+        # Joined a range fetched for a day too far from ours
+        days = _fetch_and_remember_range(lat, lon, start_date, end_date, method, tz_name)
+    return days.get(date) if days else None
+
+def _fetch_and_remember_range(lat, lon, start_date, end_date, method, tz_name):
+    days = fetch_api_timings_range(lat, lon, start_date, end_date, method, tz_name)
+    if days:
+        remember_timings([
+            (timings_cache_key(lat, lon, day_date, method, tz_name), day, timings_ttl(day_date, tz_name))
+            for day_date, day in days.items()
+        ])
+    return days
+
+# Function to keep fetched AlAdhan days in the shared cache and the on-disk store
+def remember_timings(entries):
+    for key, day, ttl in entries:
+        timings_cache.set(key, day, ttl=ttl)
+    disk = get_store()
+    if disk is not None:
+        disk.put_timings_many(entries)
+
+# Outcomes of "verify" mode cross-checks, by status
+_verifications = collections.Counter()
+_verifications_lock = threading.Lock()
+
+# Function to compute prayer times locally, optionally cross-checked against AlAdhan
+def compute_local_timings(lat, lon, date, method=2, tz_name='US/Eastern', verify=False):
+    timings = compute_prayer_times(lat, lon, date, method, tz_name)
+    if verify:
+        try:
+            api_timings = fetch_api_timings(lat, lon, date, method, tz_name)
+        except Exception:
+            api_timings = None
+        if api_timings:
+            difference = max_difference_minutes(timings['timings'], api_timings['timings'])
+            status = "ok" if difference <= config.VERIFY_TOLERANCE_MINUTES else "mismatch"
+            if status == "mismatch":
+                # Serve AlAdhan's times rather than local ones known to disagree
+                logger.warning("Local timings for %s,%s on %s (method %s) differ from AlAdhan by %s min",
+                               lat, lon, date, method, difference)
+                timings = api_timings
+            timings['meta']['verification'] = {"status": status, "max_difference_minutes": difference}
+        else:
+            status = "unavailable"
+            timings['meta']['verification'] = {"status": status}
+        with _verifications_lock:
+            _verifications[status] += 1
+    return timings
+
+@metrics.register_collector
+def _verification_metrics():
+    with _verifications_lock:
+        counts = dict(_verifications)
+    return [
+        ("timings_verifications_total", "counter", "Local/AlAdhan cross-checks in verify mode, by outcome.",
+         [({"status": status}, count) for status, count in sorted(counts.items())]),
+    ]
+
+# Function to get one day's prayer times from the configured source, shared across sessions
+@metrics.timed("fetch_timings_for_date")
+def fetch_timings_for_date(lat, lon, date, method=2, tz_name='US/Eastern'):
+    # Nearby points share one grid cell, so one upstream request and one cache entry
+    lat, lon = grid.snap(lat, lon)
+    cache_key = timings_cache_key(lat, lon, date, method, tz_name)
+    with metrics.span("cache:timings"):
+        cached = timings_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    return timings_flight.do(cache_key, _fetch_timings_uncached, cache_key, lat, lon, date, method, tz_name)
+
+# Function to resolve a cache miss; one call per key runs at a time
+def _fetch_timings_uncached(cache_key, lat, lon, date, method, tz_name):
+    # A flight that just finished may have filled the cache since our miss
+    if cache_key in timings_cache:
+        return timings_cache.get(cache_key)
+    
+    if config.TIMINGS_SOURCE in ("local", "verify"):
+        timings = compute_local_timings(lat, lon, date, method, tz_name, verify=config.TIMINGS_SOURCE == "verify")
+        if timings is not None:
+            timings_cache.set(cache_key, timings, ttl=timings_ttl(date, tz_name))
+        return timings
+    
+    # AlAdhan days fetched before a restart are still on disk
+    disk = get_store()
+    if disk is not None:
+        row = disk.get_timings(cache_key)
+        if row is not None:
+            timings_cache.set(cache_key, row[0], ttl=row[1] - time.time())
+            return row[0]
+    
+    try:
+        if config.RANGE_FETCH_DAYS > 1:
+            timings = fetch_api_timings_via_range(lat, lon, date, method, tz_name)
+        else:
+            timings = fetch_api_timings(lat, lon, date, method, tz_name)
+            if timings is not None:
+                remember_timings([(cache_key, timings, timings_ttl(date, tz_name))])
+    except requests.RequestException:
+        timings = fallback_timings(cache_key, lat, lon, date, method, tz_name)
+        if timings is None:
+            raise
+    return timings
+
+# Function to serve something sensible while AlAdhan is down: the last cached
+# copy if there is one, otherwise a locally computed timetable
+def fallback_timings(cache_key, lat, lon, date, method=2, tz_name='US/Eastern'):
+    stale = timings_cache.get_stale(cache_key)
+    if stale is not None:
+        return stale
+    disk = get_store()
+    row = disk.get_timings(cache_key, allow_expired=True) if disk is not None else None
+    if row is not None:
+        return row[0]
+    if not config.LOCAL_FALLBACK:
+        return None
+    timings = compute_prayer_times(lat, lon, date, method, tz_name)
+    timings['meta']['fallback'] = True
+    # Keep it only until the breaker would let AlAdhan be tried again
+    timings_cache.set(cache_key, timings, ttl=config.HTTP_BREAKER_RESET)
+    return timings
+
+# Function to fetch today's (or a given day's) prayer times
+@metrics.timed("fetch_prayer_times")
+def fetch_prayer_times(lat, lon, method=2, tz_name='US/Eastern', date=None):
+    if date is None:
+        date = today_in(tz_name)
+    return fetch_timings_for_date(lat, lon, date, method, tz_name)
+
+# Function to fetch next day's prayer times
+@metrics.timed("fetch_next_day_prayer_times")
+def fetch_next_day_prayer_times(lat, lon, method=2, tz_name='US/Eastern'):
+    tomorrow = today_in(tz_name) + datetime.timedelta(days=1)
+    return fetch_timings_for_date(lat, lon, tomorrow, method, tz_name)
+
+# Whether one upstream call for `date` also fills the cache for `other_date`
+def _shares_range_fetch(date, other_date):
+    if config.TIMINGS_SOURCE != "api" or config.RANGE_FETCH_DAYS <= 1:
+        return False
+    start_date, end_date = timings_range_for_date(date)
+    return start_date <= other_date <= end_date
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+def _collect(future, stage, deadline, result):
+    """Wait for ``future`` until ``deadline``, recording its value, latency or error."""
+    try:
+        value, elapsed = future.result(timeout=max(deadline - time.perf_counter(), 0))
+        result["latencies"][stage] = elapsed
+        return value
+    except FutureTimeoutError:
+        future.cancel()
+        result["errors"][stage] = "timed out"
+    except Exception as e:
+        result["errors"][stage] = str(e)
+    return None
+
+def load_prayer_times(location_name, method=2, tz_name='US/Eastern', date=None, tomorrow=None, timeout=None):
+    """Geocode ``location_name`` and fetch its timings for ``date`` and the next day.
+
+    As soon as coordinates are known both timing fetches are issued
+    concurrently, so a cold load costs roughly the slowest call rather
+    than the sum of all of them. Each stage is bounded by ``timeout``
+    (default ``config.UPSTREAM_TIMEOUT``); unfinished work is cancelled,
+    and a lookup still waiting in the Nominatim queue stays queued.
+    A ``tz_name`` of None infers the timezone from the coordinates.
+
+    Returns a dict with ``location`` (lat, lon, display_name or None),
+    the ``timezone`` used, ``timings``, ``next_day_timings``, per-stage
+    ``latencies`` in seconds and per-stage ``errors``.
+    """
+    timeout = config.UPSTREAM_TIMEOUT if timeout is None else timeout
+    result = {"location": None, "timezone": tz_name, "timings": None, "next_day_timings": None, "latencies": {}, "errors": {}}
+    started = time.perf_counter()
+
+    # Geocode on the calling thread: a lookup waiting for a Nominatim slot
+    # must not hold one of the shared I/O workers other sessions need
+    try:
+        (lat, lon, display_name), result["latencies"]["geocode"] = _timed(
+            geocode_location, location_name, geocode_scheduler.INTERACTIVE, timeout
+        )
+    except Exception as e:
+        lat = lon = display_name = None
+        result["errors"]["geocode"] = str(e)
+    if lat is None or lon is None:
+        result["latencies"]["total"] = time.perf_counter() - started
+        return result
+    result["location"] = (lat, lon, display_name)
+
+    if tz_name is None:
+        tz_name = result["timezone"] = infer_timezone(lat, lon)
+    now = now_in(tz_name)
+    date = date or now.date()
+    tomorrow = tomorrow or (now + datetime.timedelta(days=1)).date()
+    result["date"] = date
+
+    # Pipeline both timing fetches right behind the geocode; when one range
+    # request covers both days, tomorrow becomes a cache lookup afterwards
+    fetch_started = time.perf_counter()
+    today_future = _executor.submit(_timed, fetch_timings_for_date, lat, lon, date, method, tz_name)
+    if _shares_range_fetch(date, tomorrow):
+        result["timings"] = _collect(today_future, "timings", fetch_started + timeout, result)
+        tomorrow_future = _executor.submit(_timed, fetch_timings_for_date, lat, lon, tomorrow, method, tz_name)
+    else:
+        tomorrow_future = _executor.submit(_timed, fetch_timings_for_date, lat, lon, tomorrow, method, tz_name)
+        result["timings"] = _collect(today_future, "timings", fetch_started + timeout, result)
+    result["next_day_timings"] = _collect(tomorrow_future, "next_day_timings", fetch_started + timeout, result)
+
+    result["latencies"]["total"] = time.perf_counter() - started
+    return result
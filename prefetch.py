@@ -0,0 +1,196 @@
+"""Background prefetch of tomorrow's timings ahead of local midnight.
+
+Every (location, method, timezone) a session displays is registered with
+the process-wide ``prefetcher``. A daemon thread then fetches the next
+two days for each of them at a random moment inside the window
+``PREFETCH_WINDOW_START`` to ``PREFETCH_WINDOW_END`` minutes before that
+location's midnight, one at a time, so the upstream sees a trickle
+rather than every session at 00:00.
+
+At the rollover ``rollover`` serves the new day from the shared cache
+without touching the network; whatever is missing is revalidated in the
+background while the session keeps showing its last good data.
+"""
+import datetime
+import logging
+import random
+import threading
+import time
+
+import config
+import grid
+import metrics
+import timezones
+from cache import timings_cache, timings_cache_key
+from prayer_service import _executor, fetch_timings_for_date
+
+logger = logging.getLogger(__name__)
+
+
+def next_midnight(tz_name, now=None):
+    """Epoch seconds of the next midnight in ``tz_name``, DST included."""
+    local_now = datetime.datetime.fromtimestamp(time.time() if now is None else now, timezones.get_zone(tz_name))
+    return timezones.next_midnight(tz_name, local_now).timestamp()
+
+
+class _Target:
+    __slots__ = ("lat", "lon", "method", "tz_name", "last_seen", "due", "midnight")
+
+    def __init__(self, lat, lon, method, tz_name):
+        self.lat = lat
+        self.lon = lon
+        self.method = method
+        self.tz_name = tz_name
+        self.last_seen = 0.0
+        self.due = None
+        self.midnight = None
+
+
+class Prefetcher:
+    """Keeps the days after each active location's midnight in the shared cache."""
+
+    def __init__(self, window_start=None, window_end=None, active_ttl=None, poll_interval=None,
+                 retry_delay=None, clock=time.time):
+        self.window_start = (config.PREFETCH_WINDOW_START if window_start is None else window_start) * 60
+        self.window_end = (config.PREFETCH_WINDOW_END if window_end is None else window_end) * 60
+        self.active_ttl = (config.PREFETCH_ACTIVE_HOURS if active_ttl is None else active_ttl) * 3600
+        self.poll_interval = config.PREFETCH_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.retry_delay = config.PREFETCH_RETRY_DELAY if retry_delay is None else retry_delay
+        self._clock = clock
+        self._targets = {}
+        self._revalidating = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.prefetched = 0
+        self.failures = 0
+        self.revalidations = 0
+
+    def _key(self, lat, lon, method, tz_name):
+        return grid.snap(lat, lon) + (int(method), tz_name)
+
+    def touch(self, lat, lon, method, tz_name):
+        """Register (or keep alive) a location a session is showing."""
+        key = self._key(lat, lon, method, tz_name)
+        with self._lock:
+            target = self._targets.get(key)
+            if target is None:
+                target = self._targets[key] = _Target(lat, lon, method, tz_name)
+            target.last_seen = self._clock()
+        self.start()
+
+    def start(self):
+        if not config.PREFETCH_ENABLED:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="ramadan-prefetch", daemon=True)
+        self._thread.start()
+
+    def _schedule(self, target, now):
+        # A random point in the window spreads locations sharing a midnight
+        target.midnight = next_midnight(target.tz_name, now)
+        lead = random.uniform(self.window_end, max(self.window_start, self.window_end))
+        target.due = max(target.midnight - lead, now)
+
+    def run_once(self, now=None):
+        """Prefetch every target that is due; returns how many were attempted."""
+        now = self._clock() if now is None else now
+        due = []
+        with self._lock:
+            for key, target in list(self._targets.items()):
+                if now - target.last_seen > self.active_ttl:
+                    del self._targets[key]
+                    continue
+                if target.due is None or (target.midnight is not None and now >= target.midnight + self.retry_delay):
+                    self._schedule(target, now)
+                if target.due <= now:
+                    due.append(target)
+        for target in due:
+            self._prefetch(target, now)
+        return len(due)
+
+    def _prefetch(self, target, now):
+        # The two days after midnight: the new "today" and the new "tomorrow"
+        first_day = datetime.datetime.fromtimestamp(target.midnight, timezones.get_zone(target.tz_name)).date()
+        try:
+            with metrics.span("prefetch"):
+                for offset in (0, 1):
+                    fetch_timings_for_date(target.lat, target.lon, first_day + datetime.timedelta(days=offset),
+                                           target.method, target.tz_name)
+        except Exception:
+            logger.warning("Prefetch failed for %s/%s", target.tz_name, (target.lat, target.lon), exc_info=True)
+            self.failures += 1
+            # Try again shortly, still spread out
+            target.due = now + random.uniform(self.retry_delay, 2 * self.retry_delay)
+            return
+        self.prefetched += 1
+        # Done for this midnight; rescheduled for the next one once it has passed
+        target.due = float("inf")
+
+    def _run(self):
+        while True:
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Prefetch loop failed")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def revalidate(self, lat, lon, date, method, tz_name):
+        """Fetch one day on a worker thread unless that fetch is already running."""
+        key = timings_cache_key(lat, lon, date, method, tz_name)
+        with self._lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+        self.revalidations += 1
+
+        def fetch():
+            try:
+                fetch_timings_for_date(lat, lon, date, method, tz_name)
+            finally:
+                with self._lock:
+                    self._revalidating.discard(key)
+        _executor.submit(fetch)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "targets": len(self._targets),
+                "prefetched": self.prefetched,
+                "failures": self.failures,
+                "revalidations": self.revalidations,
+                "running": self._thread is not None,
+            }
+
+
+prefetcher = Prefetcher()
+
+
+def cached_timings(lat, lon, date, method, tz_name):
+    """One day's payload from the shared cache, expired or not; None when absent."""
+    key = timings_cache_key(lat, lon, date, method, tz_name)
+    value = timings_cache.get(key)
+    return value if value is not None else timings_cache.get_stale(key)
+
+
+def rollover(lat, lon, method, tz_name, date, fallback=None):
+    """``(today, tomorrow)`` payloads for a session whose day changed to ``date``.
+
+    Served from the shared cache only, so this never blocks on the
+    network. Days that are missing are revalidated in the background;
+    meanwhile ``fallback`` (the session's previous "tomorrow") stands in
+    for today and tomorrow is None.
+    """
+    today = cached_timings(lat, lon, date, method, tz_name)
+    tomorrow_date = date + datetime.timedelta(days=1)
+    tomorrow = cached_timings(lat, lon, tomorrow_date, method, tz_name)
+    if today is None:
+        prefetcher.revalidate(lat, lon, date, method, tz_name)
+        today = fallback
+    if tomorrow is None:
+        prefetcher.revalidate(lat, lon, tomorrow_date, method, tz_name)
+    prefetcher.touch(lat, lon, method, tz_name)
+    return today, tomorrow
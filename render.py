@@ -0,0 +1,346 @@
+"""Memoized HTML fragments for the page.
+
+Every rerun used to rebuild the full style block and re-format each
+card's f-string, although the output rarely changes from one run to the
+next. The templates below are compacted once at import, and each
+fragment is built once per distinct input (schedule times, timezone,
+theme) and then served from an LRU cache shared by all sessions.
+
+Streamlit still needs every element on every run, but an unchanged
+fragment now costs a dictionary lookup. It also serializes to the same
+bytes as last time, so elements above ``global.minCachedMessageSize``
+(see .streamlit/config.toml) go to the browser as a hash reference
+instead of their full content. The style block is therefore only
+transferred once per session.
+"""
+import functools
+import html
+import re
+
+import config
+
+_LIGHT_VARS = """
+    :root {
+        --bg-primary: #ffffff;
+        --bg-secondary: #f8f9fa;
+        --bg-tertiary: #ecf0f1;
+        --text-primary: #2c3e50;
+        --text-secondary: #34495e;
+        --text-muted: #7f8c8d;
+        --border-primary: #ecf0f1;
+        --card-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
+        --suhoor-bg: #f5eef8;
+        --suhoor-border: #9b59b6;
+        --iftar-bg: #fef5ec;
+        --iftar-border: #e67e22;
+        --prayer-border: #3498db;
+        --button-bg: #3498db;
+        --button-hover: #2980b9;
+    }
+"""
+
+_DARK_VARS = """
+    :root {
+        --bg-primary: #1e1e1e;
+        --bg-secondary: #2d3436;
+        --bg-tertiary: #2c3e50;
+        --text-primary: #ecf0f1;
+        --text-secondary: #bdc3c7;
+        --text-muted: #95a5a6;
+        --border-primary: #34495e;
+        --card-shadow: 0 4px 6px rgba(0, 0, 0, 0.3);
+        --suhoor-bg: #2c2440;
+        --suhoor-border: #9b59b6;
+        --iftar-bg: #3d2c17;
+        --iftar-border: #e67e22;
+        --prayer-border: #3498db;
+        --button-bg: #2980b9;
+        --button-hover: #3498db;
+    }
+
+    /* Override Streamlit's default dark mode styles */
+    .stApp {
+        background-color: var(--bg-primary);
+    }
+
+    .css-1d391kg, .css-12oz5g7 {
+        background-color: var(--bg-primary);
+    }
+"""
+
+_RULES = """
+    /* Main container styling */
+    .main .block-container {
+        padding-top: 2rem;
+        padding-bottom: 2rem;
+    }
+
+    /* Header styling */
+    h1 {
+        color: var(--text-primary);
+        font-weight: 700;
+        margin-bottom: 1.5rem;
+    }
+
+    h2, h3 {
+        color: var(--text-secondary);
+        font-weight: 600;
+    }
+
+    /* Card styling */
+    .css-1r6slb0, .css-keje6w {
+        border-radius: 10px;
+        box-shadow: var(--card-shadow);
+        padding: 1.5rem;
+        margin-bottom: 1rem;
+        background-color: var(--bg-primary);
+    }
+
+    /* Prayer time cards */
+    .prayer-card {
+        background-color: var(--bg-secondary);
+        border-radius: 10px;
+        padding: 1rem;
+        margin-bottom: 0.8rem;
+        border-left: 4px solid var(--prayer-border);
+        transition: transform 0.2s;
+    }
+
+    .prayer-card:hover {
+        transform: translateY(-3px);
+        box-shadow: var(--card-shadow);
+    }
+
+    /* Special prayer highlights */
+    .suhoor-card {
+        border-left: 4px solid var(--suhoor-border);
+        background-color: var(--suhoor-bg);
+    }
+
+    .iftar-card {
+        border-left: 4px solid var(--iftar-border);
+        background-color: var(--iftar-bg);
+    }
+
+    /* Countdown styling */
+    .countdown {
+        font-size: 1.2rem;
+        font-weight: 600;
+        color: var(--text-primary);
+        background-color: var(--bg-tertiary);
+        padding: 1rem;
+        border-radius: 10px;
+        text-align: center;
+        margin: 1.5rem 0;
+    }
+
+    /* Responsive adjustments for mobile */
+    @media (max-width: 768px) {
+        .prayer-card {
+            padding: 0.8rem;
+            margin-bottom: 0.6rem;
+        }
+
+        .countdown {
+            font-size: 1rem;
+            padding: 0.8rem;
+        }
+    }
+
+    /* Footer styling */
+    footer {
+        margin-top: 2rem;
+        padding-top: 1rem;
+        border-top: 1px solid var(--border-primary);
+        color: var(--text-muted);
+        font-size: 0.8rem;
+    }
+
+    /* Sidebar styling */
+    .css-1d391kg, .css-12oz5g7 {
+        padding: 2rem 1rem;
+    }
+
+    .stButton>button {
+        width: 100%;
+        border-radius: 5px;
+        background-color: var(--button-bg);
+        color: white;
+        font-weight: 600;
+    }
+
+    .stButton>button:hover {
+        background-color: var(--button-hover);
+    }
+
+    /* Links styling */
+    a {
+        color: var(--prayer-border);
+        text-decoration: none;
+    }
+
+    a:hover {
+        text-decoration: underline;
+    }
+
+    /* Text color adjustments for readability */
+    p {
+        color: var(--text-secondary);
+    }
+
+    .stTextInput>div>div>input {
+        color: var(--text-primary);
+        background-color: var(--bg-secondary);
+    }
+
+    .stSelectbox>div>div>div {
+        color: var(--text-primary);
+        background-color: var(--bg-secondary);
+    }
+"""
+
+
+def _minify_css(css):
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    return re.sub(r" ?([{};:,>]) ?", r"\1", css).strip()
+
+
+def _compact(template):
+    # Drop the source indentation; it is only bytes on the wire
+    return re.sub(r">\s+<", "><", re.sub(r"\n\s*", " ", template.strip()))
+
+
+TITLE = "<h1 style='text-align: center; color: var(--text-primary);'>🌙 Ramadan Prayer Times</h1>"
+
+LOCATION_HEADING = "<h3 style='text-align: center; color: var(--text-primary);'>📍 Your Location</h3>"
+
+SETTINGS_HEADING = "<h3 style='text-align: center; color: var(--text-primary);'>⚙️ Settings</h3>"
+
+FAST_HEADING = "<h2 style='text-align: center; margin-top: 2rem;'>🌅 Suhoor & Iftar Times</h2>"
+
+PRAYERS_HEADING = "<h2 style='text-align: center; margin-top: 2rem;'>🕌 Today's Prayer Times</h2>"
+
+ABOUT = _compact("""
+<div style='margin-top: 2rem; padding: 1rem; background-color: var(--bg-secondary); border-radius: 10px;'>
+    <h4 style='text-align: center; margin-bottom: 0.5rem; color: var(--text-primary);'>About</h4>
+    <p style='font-size: 0.9rem; color: var(--text-muted);'>
+        This app provides accurate prayer times for Ramadan based on your location.
+        Times are calculated using established methods from Islamic authorities.
+    </p>
+</div>
+""")
+
+WELCOME = _compact("""
+<div style='text-align: center; padding: 3rem 1rem; background-color: var(--bg-secondary); border-radius: 10px; margin: 2rem 0;'>
+    <h2 style='margin-bottom: 1rem; color: var(--text-primary);'>Welcome to Ramadan Prayer Times</h2>
+    <p style='color: var(--text-muted); margin-bottom: 2rem;'>Enter your location in the sidebar and click 'Update Prayer Times' to get started.</p>
+    <img src="https://img.icons8.com/fluency/96/000000/mosque.png" style='margin-bottom: 1rem;'>
+</div>
+""")
+
+FOOTER = _compact("""
+<footer>
+    <p style='text-align: center;'>
+        Prayer times provided by <a href="https://aladhan.com/prayer-times-api" target="_blank">AlAdhan API</a> |
+        Geocoding by <a href="https://nominatim.openstreetmap.org/" target="_blank">OpenStreetMap Nominatim</a>
+    </p>
+    <p style='text-align: center;'>
+        Made with ❤️ for Ramadan
+    </p>
+</footer>
+""")
+
+_LOCATION_CARD = _compact("""
+<div style='background-color: var(--bg-secondary); padding: 1rem; border-radius: 10px; text-align: center;'>
+    <h3 style='margin-bottom: 0.5rem;'>📍 Location</h3>
+    <p style='color: var(--text-muted);'>%(display_name)s</p>
+    <p style='color: var(--text-muted); font-size: 0.9rem;'>Timezone: %(tz_name)s%(detected)s</p>
+</div>
+""")
+
+_FAST_CARD = _compact("""
+<div class='prayer-card %(kind)s-card' style='text-align: center;'>
+    <h3 style='margin-bottom: 0.5rem;'>%(title)s</h3>
+    <p style='font-size: 1.5rem; font-weight: 700; color: var(--text-primary);'>%(time)s</p>
+    <p style='color: var(--text-muted); font-size: 0.9rem;'>%(hint)s</p>
+    %(tomorrow)s
+</div>
+""")
+
+_FAST_TOMORROW = _compact("""
+<div style='margin-top: 0.8rem; padding-top: 0.8rem; border-top: 1px dashed var(--%(kind)s-border);'>
+    <p style='font-size: 0.85rem; color: var(--text-muted);'>Tomorrow (%(date)s): <span style='font-weight: 600;'>%(time)s</span></p>
+</div>
+""")
+
+_PRAYER_CARD = _compact("""
+<div class='prayer-card' style='text-align: center;'>
+    <h3 style='margin-bottom: 0.5rem;'>%(icon)s %(prayer)s</h3>
+    <p style='font-size: 1.2rem; font-weight: 600; color: var(--text-primary);'>%(time)s</p>
+</div>
+""")
+
+_MUTED_NOTE = "<p style='text-align: center; color: var(--text-muted); font-size: 0.8rem;'>%s</p>"
+
+# (title, hint, prayer) of the Suhoor and Iftar cards
+_FAST_CARDS = {
+    "suhoor": ("Suhoor Ends", "Stop eating before Fajr prayer", "Fajr"),
+    "iftar": ("Iftar Time", "Break your fast at Maghrib prayer", "Maghrib"),
+}
+
+
+@functools.lru_cache(maxsize=4)
+def css(theme=None):
+    """The page's style block for Streamlit's ``"light"``/``"dark"`` theme, or the OS preference when None."""
+    if theme == "dark":
+        body = _LIGHT_VARS + _DARK_VARS
+    elif theme == "light":
+        body = _LIGHT_VARS
+    else:
+        body = _LIGHT_VARS + "@media (prefers-color-scheme: dark) {" + _DARK_VARS + "}"
+    return "<style>" + _minify_css(body + _RULES) + "</style>"
+
+
+@functools.lru_cache(maxsize=config.RENDER_CACHE_SIZE)
+def location_card(display_name, tz_name, auto_detected):
+    return _LOCATION_CARD % {
+        "display_name": html.escape(display_name or ""),
+        "tz_name": html.escape(tz_name),
+        "detected": " (auto-detected)" if auto_detected else "",
+    }
+
+
+@functools.lru_cache(maxsize=config.RENDER_CACHE_SIZE)
+def fast_card(kind, time, tomorrow_date=None, tomorrow_time=None):
+    """Suhoor (``kind="suhoor"``) or Iftar card, with tomorrow's time when known."""
+    title, hint, _ = _FAST_CARDS[kind]
+    tomorrow = _FAST_TOMORROW % {"kind": kind, "date": tomorrow_date, "time": tomorrow_time} if tomorrow_time else ""
+    return _FAST_CARD % {"kind": kind, "title": title, "time": time, "hint": hint, "tomorrow": tomorrow}
+
+
+def fast_cards(today, tomorrow=None):
+    """``(suhoor, iftar)`` cards for a ``DaySchedule`` and the next day's, if any."""
+    cards = []
+    for kind, (_, _, prayer) in _FAST_CARDS.items():
+        if tomorrow is not None:
+            cards.append(fast_card(kind, today.formatted(prayer), tomorrow.date.strftime("%d %b"), tomorrow.formatted(prayer)))
+        else:
+            cards.append(fast_card(kind, today.formatted(prayer)))
+    return tuple(cards)
+
+
+@functools.lru_cache(maxsize=config.RENDER_CACHE_SIZE)
+def prayer_card(icon, prayer, time):
+    return _PRAYER_CARD % {"icon": icon, "prayer": prayer, "time": time}
+
+
+@functools.lru_cache(maxsize=config.RENDER_CACHE_SIZE)
+def muted_note(text):
+    """Small centred grey line (refresh countdown, last update)."""
+    return _MUTED_NOTE % html.escape(text)
+
+
+def cache_stats():
+    """Hits and misses of each memoized fragment builder."""
+    return {fn.__name__: fn.cache_info() for fn in (css, location_card, fast_card, prayer_card, muted_note)}
@@ -0,0 +1,84 @@
+"""Parsed, render-ready view of one day's prayer timings.
+
+A ``DaySchedule`` is built once per fetched payload: every "HH:MM" string
+is parsed and localized a single time, and the 12-hour display strings
+are formatted up front. Reruns then only read attributes, and the next
+prayer is found by bisecting a sorted array of epoch seconds.
+"""
+import datetime
+import functools
+from array import array
+from bisect import bisect_right
+
+import config
+from prayer_calc import PRAYER_NAMES
+from timezones import localize
+
+
+def format_time(time_str):
+    """Format an AlAdhan "HH:MM" time as a 12-hour "hh:MM AM" string."""
+    return datetime.datetime.strptime(time_str[:5], '%H:%M').strftime('%I:%M %p')
+
+
+class DaySchedule:
+    """The six daily prayer times of one date in one timezone."""
+
+    __slots__ = ("date", "tz_name", "names", "times", "display", "_order", "_epochs")
+
+    def __init__(self, date, tz_name, names, times):
+        self.date = date
+        self.tz_name = tz_name
+        self.names = tuple(names)
+        self.times = tuple(times)
+        self.display = tuple(moment.strftime('%I:%M %p') for moment in self.times)
+        # Chronological order; differs from `names` only when Isha falls after midnight
+        self._order = tuple(sorted(range(len(self.times)), key=lambda i: self.times[i]))
+        self._epochs = array('d', (self.times[i].timestamp() for i in self._order))
+
+    @classmethod
+    def from_payload(cls, payload, tz_name, date):
+        """Build from an AlAdhan-style payload, placing its times on ``date``."""
+        times = []
+        for name in PRAYER_NAMES:
+            clock = datetime.datetime.strptime(payload['timings'][name][:5], '%H:%M').time()
+            times.append(localize(date, clock, tz_name))
+        return cls(date, tz_name, PRAYER_NAMES, times)
+
+    @classmethod
+    def from_record(cls, record, tz_name, date):
+        """Build from a ``payload_store.DayRecord``, placing its times on ``date``."""
+        times = []
+        for clock_text in record.times:
+            clock = datetime.datetime.strptime(clock_text, '%H:%M').time()
+            times.append(localize(date, clock, tz_name))
+        return cls(date, tz_name, PRAYER_NAMES, times)
+
+    def __getitem__(self, name):
+        return self.times[self.names.index(name)]
+
+    def formatted(self, name):
+        return self.display[self.names.index(name)]
+
+    def upcoming(self, now, tomorrow=None):
+        """``(name, datetime)`` pairs still ahead of ``now``, in order.
+
+        Once today's last prayer has passed this rolls over to tomorrow's
+        first prayer (Fajr) when ``tomorrow`` is given.
+        """
+        start = bisect_right(self._epochs, now.timestamp())
+        pairs = [(self.names[i], self.times[i]) for i in self._order[start:]]
+        if tomorrow is not None:
+            first = tomorrow._order[0]
+            pairs.append((tomorrow.names[first], tomorrow.times[first]))
+        return pairs
+
+    def next_prayer(self, now, tomorrow=None):
+        """``(name, datetime)`` of the next prayer after ``now``, or None."""
+        pairs = self.upcoming(now, tomorrow)
+        return pairs[0] if pairs else None
+
+
+@functools.lru_cache(maxsize=config.RENDER_CACHE_SIZE)
+def shared_schedule(record, tz_name, date):
+    """``DaySchedule.from_record``, built once and shared by every session showing that day."""
+    return DaySchedule.from_record(record, tz_name, date)
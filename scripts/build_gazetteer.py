@@ -0,0 +1,86 @@
+"""Build data/cities15000.tsv.gz, the offline gazetteer used by gazetteer.py.
+
+Input is the GeoNames dump (https://download.geonames.org/export/dump/):
+
+    python scripts/build_gazetteer.py cities15000.txt countryInfo.txt
+
+Alternate names are kept as aliases when they are written in the Latin
+alphabet (accents aside) and capitalized, which leaves out other scripts,
+lower-case transliterations and airport codes. They are stored already
+folded (``gazetteer.fold``) so loading the gazetteer does not redo it.
+
+GeoNames data is licensed under CC BY 4.0.
+"""
+import argparse
+import gzip
+import os
+import sys
+import unicodedata
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from gazetteer import fold  # noqa: E402
+
+COLUMNS = ["name", "admin1", "country_code", "country", "latitude", "longitude", "population", "timezone", "aliases"]
+DEFAULT_OUTPUT = os.path.join(ROOT, "data", "cities15000.tsv.gz")
+
+
+def read_countries(path):
+    countries = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("#") or not line.strip():
+                continue
+            fields = line.rstrip("\n").split("\t")
+            countries[fields[0]] = fields[4]
+    return countries
+
+
+def is_alias(name):
+    if not name[:1].isupper() or (name.isupper() and len(name) <= 3):
+        return False
+    decomposed = unicodedata.normalize("NFKD", name)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).isascii()
+
+
+def aliases(name, alternate_names):
+    kept = {fold(alias) for alias in alternate_names.split(",") if is_alias(alias)} - {fold(name), ""}
+    return ",".join(sorted(kept))
+
+
+def read_cities(path, countries):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            country_code = fields[8]
+            yield [
+                fields[1],
+                fields[10],
+                country_code,
+                countries.get(country_code, country_code),
+                f"{float(fields[4]):.5f}",
+                f"{float(fields[5]):.5f}",
+                fields[14] or "0",
+                fields[17],
+                aliases(fields[1], fields[3]),
+            ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("cities", help="GeoNames citiesNNNN.txt")
+    parser.add_argument("countries", help="GeoNames countryInfo.txt")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    rows = sorted(read_cities(args.cities, read_countries(args.countries)), key=lambda r: -int(r[6]))
+    # mtime=0 keeps the archive byte-for-byte reproducible
+    with gzip.GzipFile(args.output, "wb", mtime=0) as raw:
+        text = "\n".join("\t".join(row) for row in [COLUMNS] + rows) + "\n"
+        raw.write(text.encode("utf-8"))
+    print(f"Wrote {len(rows)} cities to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Build data/grid_sensitivity.txt, the latitude sensitivities used by grid.py.
+
+Measures, with the app's own prayer-time engine, how many seconds the
+latitude-dependent prayer times move per degree of latitude, for each
+whole degree up to grid.MAX_LATITUDE (see
+``grid.measure_latitude_sensitivity``). Rerun it whenever prayer_calc,
+its methods or the grid's sampling change:
+
+    python scripts/build_grid_table.py
+"""
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import grid  # noqa: E402
+
+DEFAULT_OUTPUT = os.path.join(ROOT, "data", "grid_sensitivity.txt")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    values = grid.measure_latitude_sensitivity()
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write("# Latitude sensitivity of prayer times, generated by scripts/build_grid_table.py\n")
+        f.write("# degree, seconds per degree of latitude (steepest of it and its neighbours, with margin)\n")
+        for degree, seconds in enumerate(values):
+            f.write(f"{degree} {seconds!r}\n")
+    print(f"Wrote {len(values)} degrees to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
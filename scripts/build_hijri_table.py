@@ -0,0 +1,270 @@
+"""Build data/umm_al_qura.txt, the Hijri month table used by hijri.py.
+
+Month starts follow the Umm al-Qura rule in use since 1423 AH: on the
+day of the conjunction, if the conjunction falls before sunset at Mecca
+and the moon sets after the sun, the next day is the 1st of the month;
+otherwise the month starts a day later. The conjunction comes from
+Meeus' new-moon series (Astronomical Algorithms, ch. 49), the sun and
+moon positions from truncated versions of chs. 25 and 47:
+
+    python scripts/build_hijri_table.py
+
+The same rule is applied to the whole range, including the years before
+1423 AH, when the published calendar used other criteria.
+"""
+import argparse
+import datetime
+import math
+import os
+
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(__file__), os.pardir, "data", "umm_al_qura.txt")
+
+# Range of the published Umm al-Qura calendar
+FIRST_YEAR = 1356
+LAST_YEAR = 1500
+
+MECCA_LAT = 21.4225
+MECCA_LON = 39.8262
+MECCA_UTC_OFFSET = 3
+
+# Julian day of 0001-01-01 00:00 UT minus one, so JD = ordinal + JD_ORDINAL_OFFSET
+JD_ORDINAL_OFFSET = 1721424.5
+
+# Same arithmetic as hijri.hijri_to_ordinal, used to name the computed months
+ISLAMIC_EPOCH = 227015
+
+
+def _sin(degrees):
+    return math.sin(math.radians(degrees))
+
+
+def _cos(degrees):
+    return math.cos(math.radians(degrees))
+
+
+def delta_t(jd):
+    """TT - UT in seconds (Espenak-Meeus polynomial for 2005-2050, close enough either side)."""
+    t = (jd - 2451544.5) / 365.25
+    return 62.92 + 0.32217 * t + 0.005589 * t * t
+
+
+def new_moon(k):
+    """Julian day (TT) of the new moon of lunation ``k`` (k = 0 on 6 January 2000)."""
+    T = k / 1236.85
+    jde = 2451550.09766 + 29.530588861 * k + 0.00015437 * T ** 2 - 0.000000150 * T ** 3 + 0.00000000073 * T ** 4
+    E = 1 - 0.002516 * T - 0.0000074 * T ** 2
+    M = 2.5534 + 29.10535670 * k - 0.0000014 * T ** 2 - 0.00000011 * T ** 3
+    Mp = 201.5643 + 385.81693528 * k + 0.0107582 * T ** 2 + 0.00001238 * T ** 3 - 0.000000058 * T ** 4
+    F = 160.7108 + 390.67050284 * k - 0.0016118 * T ** 2 - 0.00000227 * T ** 3 + 0.000000011 * T ** 4
+    omega = 124.7746 - 1.56375588 * k + 0.0020672 * T ** 2 + 0.00000215 * T ** 3
+    jde += (
+        -0.40720 * _sin(Mp)
+        + 0.17241 * E * _sin(M)
+        + 0.01608 * _sin(2 * Mp)
+        + 0.01039 * _sin(2 * F)
+        + 0.00739 * E * _sin(Mp - M)
+        - 0.00514 * E * _sin(Mp + M)
+        + 0.00208 * E * E * _sin(2 * M)
+        - 0.00111 * _sin(Mp - 2 * F)
+        - 0.00057 * _sin(Mp + 2 * F)
+        + 0.00056 * E * _sin(2 * Mp + M)
+        - 0.00042 * _sin(3 * Mp)
+        + 0.00042 * E * _sin(M + 2 * F)
+        + 0.00038 * E * _sin(M - 2 * F)
+        - 0.00024 * E * _sin(2 * Mp - M)
+        - 0.00017 * _sin(omega)
+        - 0.00007 * _sin(Mp + 2 * M)
+        + 0.00004 * _sin(2 * Mp - 2 * F)
+        + 0.00004 * _sin(3 * M)
+        + 0.00003 * _sin(Mp + M - 2 * F)
+        + 0.00003 * _sin(2 * Mp + 2 * F)
+        - 0.00003 * _sin(Mp + M + 2 * F)
+        + 0.00003 * _sin(Mp - M + 2 * F)
+        - 0.00002 * _sin(Mp - M - 2 * F)
+        - 0.00002 * _sin(3 * Mp + M)
+        + 0.00002 * _sin(4 * Mp)
+    )
+    # Planetary arguments
+    planetary = (
+        (0.000325, 299.77 + 0.107408 * k - 0.009173 * T ** 2),
+        (0.000165, 251.88 + 0.016321 * k),
+        (0.000164, 251.83 + 26.651886 * k),
+        (0.000126, 349.42 + 36.412478 * k),
+        (0.000110, 84.66 + 18.206239 * k),
+        (0.000062, 141.74 + 53.303771 * k),
+        (0.000060, 207.14 + 2.453732 * k),
+        (0.000056, 154.84 + 7.306860 * k),
+        (0.000047, 34.52 + 27.261239 * k),
+        (0.000042, 207.19 + 0.121824 * k),
+        (0.000040, 291.34 + 1.844379 * k),
+        (0.000037, 161.72 + 24.198154 * k),
+        (0.000035, 239.56 + 25.513099 * k),
+        (0.000023, 331.55 + 3.592518 * k),
+    )
+    return jde + sum(coefficient * _sin(argument) for coefficient, argument in planetary)
+
+
+def _equatorial(longitude, latitude, T):
+    # Ecliptic to right ascension / declination, in degrees
+    obliquity = 23.439291 - 0.0130042 * T
+    ra = math.degrees(math.atan2(
+        _sin(longitude) * _cos(obliquity) - math.tan(math.radians(latitude)) * _sin(obliquity), _cos(longitude)))
+    dec = math.degrees(math.asin(
+        _sin(latitude) * _cos(obliquity) + _cos(latitude) * _sin(obliquity) * _sin(longitude)))
+    return ra, dec
+
+
+def sun_position(jd):
+    """Apparent ``(ra, dec)`` of the sun at Julian day ``jd`` (UT), low precision."""
+    T = (jd + delta_t(jd) / 86400 - 2451545.0) / 36525
+    L0 = 280.46646 + 36000.76983 * T
+    M = 357.52911 + 35999.05029 * T
+    C = (1.914602 - 0.004817 * T) * _sin(M) + 0.019993 * _sin(2 * M) + 0.000289 * _sin(3 * M)
+    omega = 125.04 - 1934.136 * T
+    longitude = L0 + C - 0.00569 - 0.00478 * _sin(omega)
+    return _equatorial(longitude, 0.0, T)
+
+
+def moon_position(jd):
+    """Geocentric ``(ra, dec, parallax)`` of the moon at Julian day ``jd`` (UT)."""
+    T = (jd + delta_t(jd) / 86400 - 2451545.0) / 36525
+    Lp = 218.3164477 + 481267.88123421 * T - 0.0015786 * T ** 2
+    D = 297.8501921 + 445267.1114034 * T - 0.0018819 * T ** 2
+    M = 357.5291092 + 35999.0502909 * T - 0.0001536 * T ** 2
+    Mp = 134.9633964 + 477198.8675055 * T + 0.0087414 * T ** 2
+    F = 93.2720950 + 483202.0175233 * T - 0.0036539 * T ** 2
+    E = 1 - 0.002516 * T - 0.0000074 * T ** 2
+    longitude = Lp + 1e-6 * (
+        6288774 * _sin(Mp)
+        + 1274027 * _sin(2 * D - Mp)
+        + 658314 * _sin(2 * D)
+        + 213618 * _sin(2 * Mp)
+        - 185116 * E * _sin(M)
+        - 114332 * _sin(2 * F)
+        + 58793 * _sin(2 * D - 2 * Mp)
+        + 57066 * E * _sin(2 * D - M - Mp)
+        + 53322 * _sin(2 * D + Mp)
+        + 45758 * E * _sin(2 * D - M)
+        - 40923 * E * _sin(M - Mp)
+        - 34720 * _sin(D)
+        - 30383 * E * _sin(M + Mp)
+        + 15327 * _sin(2 * D - 2 * F)
+        - 12528 * _sin(Mp + 2 * F)
+        + 10980 * _sin(Mp - 2 * F)
+        + 10675 * _sin(4 * D - Mp)
+        + 10034 * _sin(3 * Mp)
+        + 8548 * _sin(4 * D - 2 * Mp)
+        - 7888 * E * _sin(2 * D + M - Mp)
+        - 6766 * E * _sin(2 * D + M)
+        - 5163 * _sin(D - Mp)
+    )
+    latitude = 1e-6 * (
+        5128122 * _sin(F)
+        + 280602 * _sin(Mp + F)
+        + 277693 * _sin(Mp - F)
+        + 173237 * _sin(2 * D - F)
+        + 55413 * _sin(2 * D - Mp + F)
+        + 46271 * _sin(2 * D - Mp - F)
+        + 32573 * _sin(2 * D + F)
+        + 17198 * _sin(2 * Mp + F)
+        + 9266 * _sin(2 * D + Mp - F)
+        + 8822 * _sin(2 * Mp - F)
+    )
+    distance_km = 385000.56 + 1e-3 * (
+        -20905355 * _cos(Mp)
+        - 3699111 * _cos(2 * D - Mp)
+        - 2955968 * _cos(2 * D)
+        - 569925 * _cos(2 * Mp)
+    )
+    ra, dec = _equatorial(longitude, latitude, T)
+    return ra, dec, math.degrees(math.asin(6378.14 / distance_km))
+
+
+def altitude(ra, dec, jd, lat=MECCA_LAT, lon=MECCA_LON):
+    """Geometric altitude of a body at ``(ra, dec)`` seen from ``(lat, lon)`` at ``jd`` (UT)."""
+    sidereal = 280.46061837 + 360.98564736629 * (jd - 2451545.0)
+    hour_angle = sidereal + lon - ra
+    return math.degrees(math.asin(_sin(lat) * _sin(dec) + _cos(lat) * _cos(dec) * _cos(hour_angle)))
+
+
+def mecca_sunset(ordinal):
+    """Julian day (UT) of sunset at Mecca on the given day."""
+    # Sunset there is always between 12:00 and 21:00 local time
+    low = ordinal + JD_ORDINAL_OFFSET + (12 - MECCA_UTC_OFFSET) / 24
+    high = ordinal + JD_ORDINAL_OFFSET + (21 - MECCA_UTC_OFFSET) / 24
+    for _ in range(40):
+        middle = (low + high) / 2
+        if altitude(*sun_position(middle), middle) > -0.8333:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+def month_start(k):
+    """Ordinal of the 1st of the month that begins with lunation ``k``."""
+    conjunction = new_moon(k)
+    conjunction -= delta_t(conjunction) / 86400
+    day = math.floor(conjunction + 0.5 + MECCA_UTC_OFFSET / 24) - math.floor(JD_ORDINAL_OFFSET + 0.5)
+    sunset = mecca_sunset(day)
+    ra, dec, parallax = moon_position(sunset)
+    # The moon's upper limb is on the horizon at this geometric altitude
+    moonset_altitude = 0.7275 * parallax - 0.5667
+    if conjunction < sunset and altitude(ra, dec, sunset) > moonset_altitude:
+        return day + 1
+    return day + 2
+
+
+def tabular_month(ordinal):
+    """``(year, month)`` of the tabular Hijri calendar on that day."""
+    year = (30 * (ordinal - ISLAMIC_EPOCH) + 10646) // 10631
+    first = (year - 1) * 354 + (3 + 11 * year) // 30 + ISLAMIC_EPOCH
+    month = min(12, math.ceil((ordinal - 29 - first) / 29.5) + 1)
+    return year, month
+
+
+def build(first_year=FIRST_YEAR, last_year=LAST_YEAR):
+    """``[(year, ordinal of 1 Muharram, [12 month lengths])]``."""
+    # Lunation of 1 Muharram first_year, a couple of months early for safety
+    first = (first_year - 1) * 354 + (3 + 11 * first_year) // 30 + ISLAMIC_EPOCH
+    k = math.floor((first + JD_ORDINAL_OFFSET - 2451550.1) / 29.530588861) - 2
+    starts = {}
+    while True:
+        start = month_start(k)
+        # Mid-month is never further than the tabular calendar's drift from the right month
+        year, month = tabular_month(start + 14)
+        if year > last_year:
+            break
+        if year >= first_year:
+            starts[(year, month)] = start
+        k += 1
+    starts[(last_year + 1, 1)] = month_start(k)
+    years = []
+    for year in range(first_year, last_year + 1):
+        firsts = [starts[(year, month)] for month in range(1, 13)] + [starts[(year + 1, 1)]]
+        lengths = [b - a for a, b in zip(firsts, firsts[1:])]
+        if any(length not in (29, 30) for length in lengths):
+            raise ValueError(f"{year} AH has a month of {lengths} days")
+        years.append((year, firsts[0], lengths))
+    return years
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--first-year", type=int, default=FIRST_YEAR)
+    parser.add_argument("--last-year", type=int, default=LAST_YEAR)
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    years = build(args.first_year, args.last_year)
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write("# Umm al-Qura month starts, generated by scripts/build_hijri_table.py\n")
+        f.write("# year, 1 Muharram, month lengths from Muharram (1 = 30 days, 0 = 29)\n")
+        for year, first, lengths in years:
+            flags = "".join("1" if length == 30 else "0" for length in lengths)
+            f.write(f"{year} {datetime.date.fromordinal(first).isoformat()} {flags}\n")
+    print(f"Wrote {len(years)} years to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
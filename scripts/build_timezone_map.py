@@ -0,0 +1,224 @@
+"""Build data/timezone_map.txt.gz, the timezone map used by timezones.py.
+
+Input is the timezone-boundary-builder polygons as packaged by
+timezonefinder, which is only needed to build the map:
+
+    pip install timezonefinder
+    python scripts/build_timezone_map.py
+
+The world is cut into 1-degree cells. A cell inside a single zone is
+stored as that zone. A cell that a border between zones crosses keeps
+one of its zones as the default, plus the other zones' polygons clipped
+to the cell and simplified to about ``--tolerance`` degrees. Zones are
+ordered by their total area, smallest first, so that an enclosed zone
+wins where zones overlap; the last is the default. Cells with
+nothing but sea are left out; timezones.py falls back to nearest-city
+and nautical zones there.
+
+The boundary data is (c) OpenStreetMap contributors, licensed under the
+ODbL, via https://github.com/evansiroky/timezone-boundary-builder.
+"""
+import argparse
+import collections
+import gzip
+import math
+import os
+
+# Cell coordinates are stored as integers in units of 1/SCALE degree (~11 m)
+SCALE = 10000
+# Points per side of the grid sampled in each cell
+SAMPLES = 3
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_OUTPUT = os.path.join(ROOT, "data", "timezone_map.txt.gz")
+
+
+def is_land_zone(name):
+    # The Etc/GMT zones cover the oceans
+    return not name.startswith("Etc/")
+
+
+def touched_cells(lons, lats):
+    """1-degree cells that a ring's edges pass through."""
+    cells = set()
+    for i in range(len(lons)):
+        lon1, lat1 = lons[i - 1], lats[i - 1]
+        lon2, lat2 = lons[i], lats[i]
+        steps = int(max(abs(lon2 - lon1), abs(lat2 - lat1)) / 0.25) + 1
+        for step in range(steps + 1):
+            f = step / steps
+            cells.add((math.floor(lat1 + (lat2 - lat1) * f), math.floor(lon1 + (lon2 - lon1) * f)))
+    return cells
+
+
+def clip(points, lat0, lon0):
+    """Sutherland-Hodgman clip of a ring of (x, y) = (lon, lat) points to one cell."""
+    edges = (
+        (lambda p: p[0] >= lon0, 0, lon0),
+        (lambda p: p[0] <= lon0 + 1, 0, lon0 + 1),
+        (lambda p: p[1] >= lat0, 1, lat0),
+        (lambda p: p[1] <= lat0 + 1, 1, lat0 + 1),
+    )
+    for inside, axis, value in edges:
+        if not points:
+            break
+        clipped = []
+        previous = points[-1]
+        for point in points:
+            if inside(point) != inside(previous):
+                t = (value - previous[axis]) / (point[axis] - previous[axis])
+                crossing = [previous[0] + (point[0] - previous[0]) * t, previous[1] + (point[1] - previous[1]) * t]
+                crossing[axis] = value
+                clipped.append(tuple(crossing))
+            if inside(point):
+                clipped.append(point)
+            previous = point
+        points = clipped
+    return points
+
+
+def simplify(points, tolerance):
+    """Douglas-Peucker on an open polyline of integer points."""
+    if len(points) < 3:
+        return points
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        (x1, y1), (x2, y2) = points[first], points[last]
+        length = math.hypot(x2 - x1, y2 - y1)
+        worst, index = 0.0, None
+        for i in range(first + 1, last):
+            x, y = points[i]
+            if length:
+                distance = abs((x2 - x1) * (y1 - y) - (x1 - x) * (y2 - y1)) / length
+            else:
+                distance = math.hypot(x - x1, y - y1)
+            if distance > worst:
+                worst, index = distance, i
+        if index is not None and worst > tolerance:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def cell_ring(points, lat0, lon0, tolerance):
+    """A clipped ring as integer offsets from the cell's corner, simplified; None if it has no area."""
+    ring = []
+    for lon, lat in points:
+        point = (round((lon - lon0) * SCALE), round((lat - lat0) * SCALE))
+        if not ring or ring[-1] != point:
+            ring.append(point)
+    if len(ring) > 1 and ring[0] == ring[-1]:
+        ring.pop()
+    if len(ring) < 3:
+        return None
+    # Split at the point farthest from the first so both halves are open polylines
+    far = max(range(len(ring)), key=lambda i: (ring[i][0] - ring[0][0]) ** 2 + (ring[i][1] - ring[0][1]) ** 2)
+    ring = simplify(ring[:far + 1], tolerance)[:-1] + simplify(ring[far:] + ring[:1], tolerance)[:-1]
+    if len(ring) < 3 or abs(area(ring)) < 1:
+        return None
+    return ring
+
+
+def area(ring):
+    return sum(ring[i - 1][0] * ring[i][1] - ring[i][0] * ring[i - 1][1] for i in range(len(ring))) / 2
+
+
+def build(finder, tolerance):
+    """``(zone names, {cell: zone index}, {cell: (default zone index, [(zone index, ring), ...])})``."""
+    zone_rings = collections.defaultdict(list)
+    zone_areas = collections.Counter()
+    cell_zones = collections.defaultdict(set)
+    for name in finder.timezone_names:
+        if not is_land_zone(name):
+            continue
+        for polygon in finder.get_geometry(tz_name=name, coords_as_pairs=False):
+            outer_lons, outer_lats = polygon[0]
+            zone_areas[name] += abs(area(list(zip(outer_lons, outer_lats))))
+            for lons, lats in polygon:
+                bbox = (min(lats), max(lats), min(lons), max(lons))
+                zone_rings[name].append((bbox, list(zip(lons, lats))))
+                for cell in touched_cells(lons, lats):
+                    cell_zones[cell].add(name)
+
+    names = sorted(zone_rings)
+    index = {name: i for i, name in enumerate(names)}
+    uniform, borders = {}, {}
+    for lat0 in range(-90, 90):
+        for lon0 in range(-180, 180):
+            cell = (lat0, lon0)
+            # Zones whose borders cross the cell, and zones sampled inside it:
+            # some zones overlap others (e.g. Asia/Urumqi lies within
+            # Asia/Shanghai), and the enclosing zone has no border there
+            zones = set(cell_zones.get(cell, ()))
+            for i in range(SAMPLES):
+                for j in range(SAMPLES):
+                    zone = finder.timezone_at(lng=lon0 + (j + 0.5) / SAMPLES, lat=lat0 + (i + 0.5) / SAMPLES)
+                    if zone and is_land_zone(zone):
+                        zones.add(zone)
+            if len(zones) < 2:
+                if zones:
+                    uniform[cell] = index[zones.pop()]
+                continue
+            # Every ring of the cell's zones that may overlap it, including
+            # ones enclosing it entirely (they clip to the whole cell)
+            rings = []
+            for zone in zones:
+                for (south, north, west, east), points in zone_rings[zone]:
+                    if south > lat0 + 1 or north < lat0 or west > lon0 + 1 or east < lon0:
+                        continue
+                    ring = cell_ring(clip(points, lat0, lon0), lat0, lon0, tolerance * SCALE)
+                    if ring is not None:
+                        rings.append((index[zone], ring))
+            areas = collections.Counter()
+            for zone, ring in rings:
+                areas[zone] += abs(area(ring))
+            if not areas:
+                continue
+            if len(areas) == 1:
+                uniform[cell] = next(iter(areas))
+                continue
+            # timezones.py takes the first zone containing a point, so where
+            # zones overlap the enclosed, smaller one must come first. Zones
+            # are ordered by their total area, and the last one (usually the
+            # one covering most of the cell) is the default whose rings are
+            # left out
+            order = sorted(areas, key=lambda zone: zone_areas[names[zone]])
+            rings.sort(key=lambda item: order.index(item[0]))
+            default = order[-1]
+            borders[cell] = (default, [(zone, ring) for zone, ring in rings if zone != default])
+    return names, uniform, borders
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tolerance", type=float, default=0.001, help="simplification tolerance in degrees")
+    parser.add_argument("-o", "--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args()
+
+    from timezonefinder import TimezoneFinder
+
+    names, uniform, borders = build(TimezoneFinder(in_memory=True), args.tolerance)
+    points = 0
+    with gzip.open(args.output, "wt", encoding="utf-8") as f:
+        f.write("# Timezone map in 1-degree cells, generated by scripts/build_timezone_map.py\n")
+        f.write("# Z zone-id name | C lat lon zone-id | B lat lon default-zone-id, then P zone-id x y dx dy dx dy ...\n")
+        f.write(f"# (a ring's first point in 1/{SCALE} degree from the cell's south-west corner, then steps from the point before)\n")
+        for i, name in enumerate(names):
+            f.write(f"Z {i} {name}\n")
+        for (lat, lon), zone in sorted(uniform.items()):
+            f.write(f"C {lat} {lon} {zone}\n")
+        for (lat, lon), (default, rings) in sorted(borders.items()):
+            f.write(f"B {lat} {lon} {default}\n")
+            for zone, ring in rings:
+                points += len(ring)
+                steps = [ring[0]] + [(x - px, y - py) for (px, py), (x, y) in zip(ring, ring[1:])]
+                f.write(f"P {zone} " + " ".join(f"{x} {y}" for x, y in steps) + "\n")
+    print(f"Wrote {len(uniform)} single-zone cells and {len(borders)} border cells ({points} points) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Coalescing of identical concurrent calls ("single flight").
+
+When a popular entry expires, every session misses it at once. Routing
+the miss through ``SingleFlight.do`` lets only the first caller for a
+key run the upstream call; callers arriving while it is in flight wait
+and share its result, or its exception. Nothing is cached here: once
+the call returns, the next caller starts a new flight.
+"""
+import threading
+
+import metrics
+
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """Per-key call coalescing with issued/coalesced counters."""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.issued = 0
+        self.coalesced = 0
+        _flights.append(self)
+
+    def do(self, key, fn, *args, **kwargs):
+        """Run ``fn(*args, **kwargs)`` unless a call for ``key`` is already running; then wait for that one."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.issued += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        with self._lock:
+            return {"issued": self.issued, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+
+_flights = []
+
+
+def flight_stats():
+    """Counters of every flight in the process, by name."""
+    return {flight.name: flight.stats() for flight in _flights}
+
+
+@metrics.register_collector
+def _flight_metrics():
+    stats = flight_stats()
+    return [
+        ("singleflight_calls_total", "counter", "Calls that ran upstream (issued) or shared one in flight (coalesced).",
+         [({"flight": name, "outcome": outcome}, counts[outcome])
+          for name, counts in stats.items() for outcome in ("issued", "coalesced")]),
+        ("singleflight_in_flight", "gauge", "Calls currently in flight.",
+         [({"flight": name}, counts["in_flight"]) for name, counts in stats.items()]),
+    ]
@@ -0,0 +1,251 @@
+"""On-disk store for geocode results and daily timetables.
+
+The in-memory caches in cache.py vanish with the process, so every
+deploy used to start cold. This module persists what was fetched from
+Nominatim and AlAdhan in a SQLite database (WAL mode, so readers never
+wait on the writer) and reads it back on a memory miss. When the store
+is first opened, the timetables of the most requested locations around
+today, and the most requested geocode results, are preloaded into the
+memory caches, so a fresh instance answers them without any upstream
+call.
+
+Expired rows are kept for a grace period so they can still be served
+while an upstream is down, then removed by a periodic compaction.
+Set ``RAMADAN_STORE_PATH`` to an empty string to disable the store.
+"""
+import datetime
+import functools
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+import config
+import metrics
+from cache import geocode_cache, timings_cache
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS geocode (
+    query TEXT PRIMARY KEY,
+    lat REAL NOT NULL,
+    lon REAL NOT NULL,
+    display_name TEXT,
+    fetched_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS geocode_hits ON geocode (hits DESC);
+CREATE INDEX IF NOT EXISTS geocode_expiry ON geocode (expires_at);
+
+CREATE TABLE IF NOT EXISTS timetables (
+    lat REAL NOT NULL,
+    lon REAL NOT NULL,
+    date TEXT NOT NULL,
+    method INTEGER NOT NULL,
+    tz_name TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (lat, lon, method, tz_name, date)
+);
+CREATE INDEX IF NOT EXISTS timetables_date ON timetables (date);
+CREATE INDEX IF NOT EXISTS timetables_expiry ON timetables (expires_at);
+"""
+
+
+def _best_effort(fn):
+    # Reads and writes are an optimization: a locked or failing database
+    # degrades to a miss instead of failing the request
+    @functools.wraps(fn)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return fn(self, *args, **kwargs)
+        except sqlite3.Error:
+            logger.warning("Store %s failed", fn.__name__, exc_info=True)
+            return None
+    return wrapper
+
+
+class Store:
+    """Thread-safe SQLite-backed store; one connection guarded by a lock."""
+
+    def __init__(self, path, clock=time.time):
+        self.path = path
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(_SCHEMA)
+        self._maintenance = None
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # Geocode results, keyed by cache.normalize_query(query)
+    @_best_effort
+    def get_geocode(self, query, allow_expired=False):
+        """``(lat, lon, display_name, expires_at)`` or None."""
+        with metrics.span("store:geocode"), self._lock:
+            row = self._conn.execute(
+                "SELECT lat, lon, display_name, expires_at FROM geocode WHERE query = ?", (query,)
+            ).fetchone()
+            if row is None or (row[3] <= self._clock() and not allow_expired):
+                return None
+            self._conn.execute("UPDATE geocode SET hits = hits + 1 WHERE query = ?", (query,))
+        return row
+
+    @_best_effort
+    def put_geocode(self, query, result, ttl):
+        lat, lon, display_name = result
+        now = self._clock()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO geocode (query, lat, lon, display_name, fetched_at, expires_at) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (query) DO UPDATE SET lat = excluded.lat, lon = excluded.lon, "
+                "display_name = excluded.display_name, fetched_at = excluded.fetched_at, "
+                "expires_at = excluded.expires_at, hits = hits + 1",
+                (query, lat, lon, display_name, now, now + ttl),
+            )
+
+    # Timetables, keyed by cache.timings_cache_key(...)
+    @_best_effort
+    def get_timings(self, key, allow_expired=False):
+        """``(payload, expires_at)`` or None."""
+        lat, lon, date, method, tz_name = key
+        with metrics.span("store:timings"), self._lock:
+            row = self._conn.execute(
+                "SELECT payload, expires_at FROM timetables WHERE lat = ? AND lon = ? AND method = ? AND tz_name = ? AND date = ?",
+                (lat, lon, method, tz_name, date),
+            ).fetchone()
+            if row is None or (row[1] <= self._clock() and not allow_expired):
+                return None
+            self._conn.execute(
+                "UPDATE timetables SET hits = hits + 1 WHERE lat = ? AND lon = ? AND method = ? AND tz_name = ? AND date = ?",
+                (lat, lon, method, tz_name, date),
+            )
+        return json.loads(row[0]), row[1]
+
+    @_best_effort
+    def put_timings_many(self, entries):
+        """Store ``(key, payload, ttl)`` triples in one transaction."""
+        now = self._clock()
+        rows = [key + (json.dumps(payload, separators=(",", ":")), now, now + ttl) for key, payload, ttl in entries]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO timetables (lat, lon, date, method, tz_name, payload, fetched_at, expires_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (lat, lon, method, tz_name, date) DO UPDATE SET payload = excluded.payload, "
+                    "fetched_at = excluded.fetched_at, expires_at = excluded.expires_at, hits = hits + 1",
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def put_timings(self, key, payload, ttl):
+        self.put_timings_many([(key, payload, ttl)])
+
+    def preload(self, locations=None):
+        """Copy the hottest unexpired rows into the memory caches; returns rows loaded.
+
+        Timetables are loaded for the ``locations`` most requested
+        coordinates, from yesterday to two days ahead (UTC dates, wide
+        enough for every timezone), together with the same number of
+        geocode results.
+        """
+        locations = config.STORE_PRELOAD_LOCATIONS if locations is None else locations
+        now = self._clock()
+        today = datetime.datetime.fromtimestamp(now, datetime.timezone.utc).date()
+        first, last = (today + datetime.timedelta(days=offset) for offset in (-1, 2))
+        with self._lock:
+            geocodes = self._conn.execute(
+                "SELECT query, lat, lon, display_name, expires_at FROM geocode "
+                "WHERE expires_at > ? ORDER BY hits DESC LIMIT ?",
+                (now, locations),
+            ).fetchall()
+            timetables = self._conn.execute(
+                "SELECT t.lat, t.lon, t.date, t.method, t.tz_name, t.payload, t.expires_at FROM timetables t "
+                "JOIN (SELECT lat, lon FROM timetables WHERE expires_at > ? "
+                "      GROUP BY lat, lon ORDER BY SUM(hits) DESC LIMIT ?) hot USING (lat, lon) "
+                "WHERE t.expires_at > ? AND t.date BETWEEN ? AND ?",
+                (now, locations, now, first.isoformat(), last.isoformat()),
+            ).fetchall()
+        for query, lat, lon, display_name, expires_at in geocodes:
+            geocode_cache.set(query, (lat, lon, display_name), ttl=expires_at - now)
+        for lat, lon, date, method, tz_name, payload, expires_at in timetables:
+            timings_cache.set((lat, lon, date, method, tz_name), json.loads(payload), ttl=expires_at - now)
+        return len(geocodes) + len(timetables)
+
+    def compact(self, grace=None):
+        """Delete rows expired more than ``grace`` seconds ago and checkpoint the WAL."""
+        grace = config.STORE_EXPIRED_GRACE if grace is None else grace
+        cutoff = self._clock() - grace
+        with metrics.span("store:compact"), self._lock:
+            removed = self._conn.execute("DELETE FROM geocode WHERE expires_at < ?", (cutoff,)).rowcount
+            removed += self._conn.execute("DELETE FROM timetables WHERE expires_at < ?", (cutoff,)).rowcount
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._conn.execute("PRAGMA optimize")
+        return removed
+
+    def start_maintenance(self, interval=None):
+        """Run ``compact`` every ``interval`` seconds on a daemon thread."""
+        interval = config.STORE_COMPACT_INTERVAL if interval is None else interval
+        if self._maintenance is not None or interval <= 0:
+            return
+
+        def run():
+            while True:
+                try:
+                    removed = self.compact()
+                    logger.info("Store compaction removed %d expired rows", removed)
+                except Exception:
+                    logger.exception("Store compaction failed")
+                time.sleep(interval)
+
+        self._maintenance = threading.Thread(target=run, name="ramadan-store-compact", daemon=True)
+        self._maintenance.start()
+
+    @_best_effort
+    def stats(self):
+        """Row counts for diagnostics, or None if the database cannot be read."""
+        with self._lock:
+            geocodes = self._conn.execute("SELECT COUNT(*) FROM geocode").fetchone()[0]
+            timetables = self._conn.execute("SELECT COUNT(*) FROM timetables").fetchone()[0]
+        return {"path": self.path, "geocode_rows": geocodes, "timetable_rows": timetables}
+
+
+_store = None
+_store_failed = False
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """The process-wide store, opened, preloaded and compacted on first use; None if disabled."""
+    global _store, _store_failed
+    if not config.STORE_PATH or _store_failed:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None and not _store_failed:
+                try:
+                    store = Store(config.STORE_PATH)
+                    loaded = store.preload()
+                except sqlite3.Error:
+                    # A broken or read-only store must not take the app down
+                    logger.exception("Could not open store at %s", config.STORE_PATH)
+                    _store_failed = True
+                    return None
+                logger.info("Preloaded %d rows from %s", loaded, config.STORE_PATH)
+                store.start_maintenance()
+                _store = store
+    return _store
@@ -0,0 +1,4 @@
+import os
+
+# Same isolation as the benchmarks: no on-disk store shared with a running app
+os.environ.setdefault("RAMADAN_STORE_PATH", "")
@@ -0,0 +1,86 @@
+import http.client
+import json
+import threading
+import unittest
+from unittest import mock
+
+import api_server
+from prayer_calc import compute_prayer_times
+
+TIMES = "/v1/times?lat=33.7515&lon=-84.7477&date=2026-02-18&method=2&tz=America/New_York"
+
+
+def _local_timings(lat, lon, date, method=2, tz_name="US/Eastern"):
+    return compute_prayer_times(lat, lon, date, method, tz_name)
+
+
+class ApiServerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Timings are computed locally, so the tests never reach AlAdhan
+        cls.patchers = [
+            mock.patch.object(api_server, "fetch_timings_for_date", side_effect=_local_timings),
+            mock.patch.object(api_server.ApiHandler, "log_message"),
+        ]
+        for patcher in cls.patchers:
+            patcher.start()
+        cls.server = api_server.make_server("127.0.0.1", 0)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        for patcher in cls.patchers:
+            patcher.stop()
+
+    def _get(self, path, headers=None):
+        conn = http.client.HTTPConnection(*self.server.server_address, timeout=10)
+        try:
+            conn.request("GET", path, headers=headers or {})
+            response = conn.getresponse()
+            return response, response.read()
+        finally:
+            conn.close()
+
+    def test_times_are_served_with_an_etag(self):
+        response, body = self._get(TIMES)
+        self.assertEqual(response.status, 200)
+        data = json.loads(body)
+        self.assertEqual(data["date"], "2026-02-18")
+        self.assertEqual(data["timezone"], "America/New_York")
+        self.assertEqual(data["iftar"], data["formatted"]["Maghrib"])
+        self.assertEqual(response.getheader("ETag"), api_server.etag_for(body))
+        self.assertTrue(response.getheader("Cache-Control").startswith("public, max-age="))
+
+    def test_matching_if_none_match_returns_304(self):
+        response, _ = self._get(TIMES)
+        etag = response.getheader("ETag")
+        response, body = self._get(TIMES, {"If-None-Match": f'"other", {etag}'})
+        self.assertEqual(response.status, 304)
+        self.assertEqual(body, b"")
+        self.assertEqual(response.getheader("ETag"), etag)
+
+        response, _ = self._get(TIMES, {"If-None-Match": '"other"'})
+        self.assertEqual(response.status, 200)
+
+    def test_bad_parameters_return_400(self):
+        for query in (
+            "lat=abc&lon=-84.7",
+            "lat=91&lon=-84.7",
+            "lat=33.7&lon=nan",
+            "lat=33.7&lon=-84.7&method=9",
+            "lat=33.7&lon=-84.7&tz=Mars/Olympus",
+            "lat=33.7&lon=-84.7&tz=America/New_York&date=18/02/2026",
+            "",
+        ):
+            with self.subTest(query=query):
+                response, body = self._get("/v1/times?" + query)
+                self.assertEqual(response.status, 400)
+                self.assertIn("error", json.loads(body))
+                self.assertEqual(response.getheader("Cache-Control"), "no-store")
+
+
+if __name__ == "__main__":
+    unittest.main()
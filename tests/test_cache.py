@@ -0,0 +1,59 @@
+import unittest
+
+from cache import TTLCache, normalize_query
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class NormalizeQueryTest(unittest.TestCase):
+    def test_equivalent_spellings_share_a_key(self):
+        for query in ("Douglasville, GA", "douglasville  ga", " DOUGLASVILLE,GA. "):
+            self.assertEqual(normalize_query(query), "douglasville ga")
+
+    def test_coordinate_queries_do_not_collide(self):
+        queries = ("-33.9, 18.4", "33.9, -18.4", "33.9,18.4", "339, 184")
+        keys = [normalize_query(query) for query in queries]
+        self.assertEqual(len(set(keys)), len(queries), keys)
+        self.assertEqual(normalize_query("-33.9, 18.4"), "-33.9 18.4")
+
+
+class TTLCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = TTLCache(maxsize=2, ttl=60, clock=self.clock)
+
+    def test_entries_expire_after_their_ttl(self):
+        self.cache.set("a", 1)
+        self.cache.set("b", 2, ttl=10)
+        self.clock.now += 30
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertIsNone(self.cache.get("b"))
+        self.assertNotIn("b", self.cache)
+        self.assertEqual(self.cache.stats()["expirations"], 1)
+
+    def test_expired_entries_stay_available_to_get_stale(self):
+        self.cache.set("a", 1)
+        self.clock.now += 61
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.get_stale("a"), 1)
+        self.assertEqual(self.cache.get_stale("missing", "default"), "default")
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.set("a", 1)
+        self.cache.set("b", 2)
+        self.cache.get("a")
+        self.cache.set("c", 3)
+        self.assertIsNone(self.cache.get_stale("b"))
+        self.assertEqual((self.cache.get("a"), self.cache.get("c")), (1, 3))
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+        self.assertEqual(len(self.cache), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
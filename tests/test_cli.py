@@ -0,0 +1,66 @@
+import csv
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEADER = "location,latitude,longitude,timezone\n"
+MAKKAH = "Makkah,21.4225,39.8262,Asia/Riyadh\n"
+LONDON = "London,51.5074,-0.1278,Europe/London\n"
+
+
+class ResumeTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.input = os.path.join(self.dir.name, "locations.csv")
+        self.output = os.path.join(self.dir.name, "out.csv")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def _write_input(self, text):
+        with open(self.input, "w", encoding="utf-8") as f:
+            f.write(text)
+
+    def _cli(self, *args):
+        # Local calculation, so the run never reaches AlAdhan or Nominatim
+        env = dict(os.environ, RAMADAN_STORE_PATH="")
+        return subprocess.run(
+            [sys.executable, os.path.join(ROOT, "cli.py"), self.input, "-o", self.output,
+             "--from", "2026-02-18", "--days", "2", "--source", "local", "--workers", "1", *args],
+            cwd=ROOT, env=env, capture_output=True, text=True, timeout=120,
+        )
+
+    def _rows(self):
+        with open(self.output, newline="", encoding="utf-8") as f:
+            return list(csv.DictReader(f))
+
+    def test_resume_retries_only_the_failed_record(self):
+        self._write_input(HEADER + MAKKAH + LONDON.replace("Europe/London", "Europe/Nowhere"))
+        result = self._cli()
+        self.assertEqual(result.returncode, 1, result.stderr)
+        self.assertIn("record 2: unknown timezone", result.stderr)
+        self.assertTrue(os.path.exists(self.output + ".progress"))
+        self.assertEqual([row["record"] for row in self._rows()], ["1", "1"])
+
+        # Half a row after the last commit, as a crash mid-write would leave
+        with open(self.output, "a", encoding="utf-8") as f:
+            f.write("3,Partial")
+
+        self._write_input(HEADER + MAKKAH + LONDON)
+        result = self._cli("--resume")
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("Resuming: 1 locations already written", result.stderr)
+        self.assertFalse(os.path.exists(self.output + ".progress"))
+        rows = self._rows()
+        self.assertEqual([(row["record"], row["date"]) for row in rows], [
+            ("1", "2026-02-18"), ("1", "2026-02-19"), ("2", "2026-02-18"), ("2", "2026-02-19"),
+        ])
+        self.assertEqual(rows[2]["timezone"], "Europe/London")
+
+
+if __name__ == "__main__":
+    unittest.main()
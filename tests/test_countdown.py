@@ -0,0 +1,25 @@
+import types
+import unittest
+from unittest import mock
+
+import countdown
+
+
+class EmbedTest(unittest.TestCase):
+    def test_uses_st_iframe_when_available(self):
+        fake_st = types.SimpleNamespace(iframe=mock.Mock())
+        with mock.patch.object(countdown, "st", fake_st), \
+                mock.patch.object(countdown.components, "html") as html:
+            countdown._embed("<p>hi</p>", 120)
+        fake_st.iframe.assert_called_once_with("<p>hi</p>", height=120)
+        html.assert_not_called()
+
+    def test_falls_back_to_components_html_without_st_iframe(self):
+        with mock.patch.object(countdown, "st", types.SimpleNamespace()), \
+                mock.patch.object(countdown.components, "html") as html:
+            countdown._embed("<p>hi</p>", 120)
+        html.assert_called_once_with("<p>hi</p>", height=120)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,22 @@
+import unittest
+
+import gazetteer
+
+
+class GazetteerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.gazetteer = gazetteer.get_gazetteer()
+
+    def test_aliases_find_the_largest_city(self):
+        self.assertEqual(self.gazetteer.geocode("Mecca")[2], "Makkah, Saudi Arabia")
+        self.assertEqual(self.gazetteer.geocode("Medina")[2], "Madinah, Saudi Arabia")
+        self.assertEqual(self.gazetteer.geocode("Medina, OH")[2], "Medina, OH, United States")
+
+    def test_partial_names_are_left_to_the_online_geocoder(self):
+        self.assertEqual(self.gazetteer.geocode("Par"), (None, None, None))
+        self.assertEqual(self.gazetteer.suggest("Par", limit=1), ["Paris, France"])
+
+
+if __name__ == "__main__":
+    unittest.main()
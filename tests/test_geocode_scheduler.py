@@ -0,0 +1,98 @@
+import threading
+import unittest
+
+from geocode_scheduler import BACKGROUND, INTERACTIVE, GeocodeScheduler, QueueFullError, TokenBucket
+
+
+class GeocodeSchedulerTest(unittest.TestCase):
+    def test_lookup_joins_a_request_in_flight(self):
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def fetch(query):
+            calls.append(query)
+            started.set()
+            release.wait(5)
+            return [query]
+
+        scheduler = GeocodeScheduler(fetch, rate=0, maxsize=10, retries=0)
+        first = scheduler.submit("mecca", "Mecca")
+        self.assertTrue(started.wait(5))
+        second = scheduler.submit("mecca", "Mecca")
+        self.assertIs(second, first)
+        self.assertEqual(scheduler.stats()["in_flight"], 1)
+        release.set()
+        self.assertEqual(second.wait(5), ["Mecca"])
+        self.assertEqual(calls, ["Mecca"])
+        self.assertEqual(scheduler.stats()["deduplicated"], 1)
+
+    def _blocked_scheduler(self, maxsize=10):
+        # The first lookup holds the worker until released, so the rest queue up
+        self.release = threading.Event()
+        self.started = threading.Event()
+        self.order = []
+
+        def fetch(query):
+            self.order.append(query)
+            if query == "blocker":
+                self.started.set()
+                self.release.wait(5)
+            return [query]
+
+        scheduler = GeocodeScheduler(fetch, rate=0, maxsize=maxsize, retries=0)
+        scheduler.submit("blocker", "blocker")
+        self.assertTrue(self.started.wait(5))
+        return scheduler
+
+    def test_interactive_lookups_go_before_background_ones(self):
+        scheduler = self._blocked_scheduler()
+        tickets = [
+            scheduler.submit("prefetch 1", "prefetch 1", BACKGROUND),
+            scheduler.submit("user 1", "user 1", INTERACTIVE),
+            scheduler.submit("prefetch 2", "prefetch 2", BACKGROUND),
+            scheduler.submit("user 2", "user 2", INTERACTIVE),
+        ]
+        self.assertEqual([ticket.position() for ticket in tickets], [3, 1, 4, 2])
+        self.release.set()
+        for ticket in tickets:
+            ticket.wait(5)
+        self.assertEqual(self.order, ["blocker", "user 1", "user 2", "prefetch 1", "prefetch 2"])
+
+    def test_waiting_lookups_are_deduplicated_and_promoted(self):
+        scheduler = self._blocked_scheduler()
+        background = scheduler.submit("other", "other", BACKGROUND)
+        first = scheduler.submit("mecca", "Mecca", BACKGROUND)
+        second = scheduler.submit("mecca", "Mecca", INTERACTIVE)
+        self.assertIs(second, first)
+        self.assertEqual(first.position(), 1)
+        self.release.set()
+        self.assertEqual(second.wait(5), ["Mecca"])
+        background.wait(5)
+        self.assertEqual(self.order, ["blocker", "Mecca", "other"])
+        self.assertEqual(scheduler.stats()["deduplicated"], 1)
+
+    def test_full_queue_drops_background_lookups_for_interactive_ones(self):
+        scheduler = self._blocked_scheduler(maxsize=1)
+        background = scheduler.submit("prefetch", "prefetch", BACKGROUND)
+        with self.assertRaises(QueueFullError):
+            scheduler.submit("prefetch 2", "prefetch 2", BACKGROUND)
+        interactive = scheduler.submit("user", "user", INTERACTIVE)
+        with self.assertRaises(QueueFullError):
+            background.wait(1)
+        self.release.set()
+        self.assertEqual(interactive.wait(5), ["user"])
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_tokens_refill_at_the_rate(self):
+        now = [0.0]
+        bucket = TokenBucket(rate=1.0, burst=1, clock=lambda: now[0])
+        self.assertEqual(bucket.delay(), 0.0)
+        bucket.take()
+        self.assertAlmostEqual(bucket.delay(), 1.0)
+        now[0] += 0.25
+        self.assertAlmostEqual(bucket.delay(), 0.75)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import datetime
+import unittest
+from unittest import mock
+
+import config
+import grid
+
+# A few points of interest across the bands, both hemispheres and the antimeridian
+POINTS = ((21.4225, 39.8262), (51.5074, -0.1278), (-33.9249, 18.4241), (0.01, 179.99), (59.9, 10.75))
+
+DATES = [datetime.date(2026, 1, 1) + datetime.timedelta(days=i) for i in range(0, 365, 30)]
+
+
+class GridTest(unittest.TestCase):
+    def setUp(self):
+        self.grid = grid.Grid(30)
+
+    def test_points_stay_inside_their_cell(self):
+        for lat, lon in POINTS:
+            cell = self.grid.cell(lat, lon)
+            self.assertLessEqual(abs(lat - cell.lat), cell.lat_half_height + 1e-9, (lat, lon))
+            lon_offset = (lon - cell.lon + 180.0) % 360.0 - 180.0
+            self.assertLessEqual(abs(lon_offset), cell.lon_half_width + 1e-9, (lat, lon))
+            self.assertLessEqual(cell.max_error, 30 + 1e-9)
+
+    def test_snapping_changes_times_by_at_most_the_budget(self):
+        for lat, lon in POINTS:
+            cell = self.grid.cell(lat, lon)
+            change = grid.time_change(lat, lon, cell.lat, cell.lon, DATES)
+            self.assertLessEqual(change, 30, (lat, lon))
+
+    def test_nearby_points_share_a_cell(self):
+        a = self.grid.cell(21.4225, 39.8262)
+        b = self.grid.cell(21.4230, 39.8270)
+        self.assertEqual((a.lat, a.lon), (b.lat, b.lon))
+
+    def test_high_latitudes_are_not_snapped(self):
+        cell = self.grid.cell(64.1466, -21.9426)
+        self.assertEqual((cell.lat, cell.lon), (64.1466, -21.9426))
+        self.assertIsNone(cell.max_error)
+
+
+class SnapTest(unittest.TestCase):
+    def test_snap_returns_the_rounded_cell_centre(self):
+        with mock.patch.object(config, "GRID_MAX_ERROR", 30), mock.patch.object(config, "TIMINGS_COORD_PRECISION", 4):
+            cell = grid.get_grid(30).cell(51.5074, -0.1278)
+            self.assertEqual(grid.snap(51.5074, -0.1278), (round(cell.lat, 4), round(cell.lon, 4)))
+
+    def test_budget_of_zero_only_rounds(self):
+        with mock.patch.object(config, "GRID_MAX_ERROR", 0), mock.patch.object(config, "TIMINGS_COORD_PRECISION", 2):
+            self.assertEqual(grid.snap(51.5074, -0.1278), (51.51, -0.13))
+
+
+if __name__ == "__main__":
+    unittest.main()
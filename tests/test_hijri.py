@@ -0,0 +1,36 @@
+import datetime
+import unittest
+
+import hijri
+
+# Umm al-Qura: 1 and 29/30 Ramadan
+RAMADANS = {
+    1445: (datetime.date(2024, 3, 11), datetime.date(2024, 4, 9)),
+    1446: (datetime.date(2025, 3, 1), datetime.date(2025, 3, 29)),
+    1447: (datetime.date(2026, 2, 18), datetime.date(2026, 3, 19)),
+}
+
+
+class RamadanRangesTest(unittest.TestCase):
+    def test_umm_al_qura_dates_for_1445_to_1447(self):
+        for hijri_year, (first, last) in RAMADANS.items():
+            self.assertEqual(hijri.ramadan_ranges(first.year), [(hijri_year, first, last)])
+            self.assertEqual(hijri.ramadan_range(hijri_year), (first, last))
+
+    def test_conversion_round_trips_at_the_ends_of_ramadan(self):
+        for hijri_year, (first, last) in RAMADANS.items():
+            self.assertEqual(hijri.gregorian_to_hijri(first), (hijri_year, hijri.RAMADAN, 1))
+            self.assertEqual(hijri.gregorian_to_hijri(last)[:2], (hijri_year, hijri.RAMADAN))
+            self.assertEqual(hijri.gregorian_to_hijri(last + datetime.timedelta(days=1)), (hijri_year, hijri.RAMADAN + 1, 1))
+
+    def test_a_year_with_two_ramadans(self):
+        years = [hijri_year for hijri_year, _, _ in hijri.ramadan_ranges(2030)]
+        self.assertEqual(years, [1451, 1452])
+
+    def test_next_ramadan(self):
+        self.assertEqual(hijri.next_ramadan(datetime.date(2025, 3, 10)), RAMADANS[1446])
+        self.assertEqual(hijri.next_ramadan(datetime.date(2025, 3, 30)), RAMADANS[1447])
+
+
+if __name__ == "__main__":
+    unittest.main()
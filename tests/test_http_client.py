@@ -0,0 +1,75 @@
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import http_client
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        headers = {}
+        if self.path == "/slow":
+            time.sleep(0.6)
+        if self.path == "/limited" and self.server.paths.count(self.path) == 1:
+            status, body, headers = 429, b"{}", {"Retry-After": "1"}
+        else:
+            status, body = {
+                "/forbidden": (403, b"<html>Forbidden</html>"),
+                "/garbled": (200, b"<html"),
+                "/limited": (200, b'{"ok": true}'),
+                "/slow": (503, b"{}"),
+            }[self.path]
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class GetJsonTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.paths = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base = f"http://127.0.0.1:{self.server.server_port}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_error_page_is_not_retried_or_charged_to_the_breaker(self):
+        for _ in range(http_client.config.HTTP_BREAKER_THRESHOLD + 1):
+            with self.assertRaises(http_client.ErrorResponse) as raised:
+                http_client.get_json(self.base + "/forbidden", retries=2)
+            self.assertFalse(http_client.is_transient(raised.exception))
+        self.assertEqual(len(self.server.paths), http_client.config.HTTP_BREAKER_THRESHOLD + 1)
+        host = self.base.split("//")[1]
+        self.assertEqual(http_client.get_breaker(host).state, http_client.CircuitBreaker.CLOSED)
+
+    def test_garbled_success_body_is_retried(self):
+        with self.assertRaises(ValueError):
+            http_client.get_json(self.base + "/garbled", retries=1)
+        self.assertEqual(len(self.server.paths), 2)
+
+    def test_retry_after_is_honoured(self):
+        started = time.monotonic()
+        self.assertEqual(http_client.get_json(self.base + "/limited", retries=1), {"ok": True})
+        self.assertGreaterEqual(time.monotonic() - started, 1.0)
+        self.assertEqual(len(self.server.paths), 2)
+
+    def test_retries_stay_within_the_deadline(self):
+        started = time.monotonic()
+        with self.assertRaises(http_client.requests.RequestException):
+            http_client.get_json(self.base + "/slow", timeout=1.0, retries=10)
+        self.assertLess(time.monotonic() - started, 1.5)
+        self.assertLessEqual(len(self.server.paths), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
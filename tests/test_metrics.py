@@ -0,0 +1,43 @@
+import unittest
+import urllib.request
+
+import metrics
+from streamlit.runtime.scriptrunner import RerunException, StopException
+
+
+class SpanTest(unittest.TestCase):
+    def setUp(self):
+        metrics.registry.reset()
+
+    def _errors(self, name):
+        return metrics.registry.snapshot()[name]["errors"]
+
+    def test_exceptions_count_as_errors(self):
+        with self.assertRaises(KeyError):
+            with metrics._Span("lookup"):
+                raise KeyError("missing")
+        self.assertEqual(self._errors("lookup"), 1)
+
+    def test_streamlit_rerun_and_stop_are_not_errors(self):
+        for control in (RerunException(None), StopException()):
+            with self.assertRaises(type(control)):
+                with metrics._Span("render"):
+                    raise control
+        snapshot = metrics.registry.snapshot()["render"]
+        self.assertEqual((snapshot["count"], snapshot["errors"]), (2, 0))
+
+
+class HttpServerTest(unittest.TestCase):
+    def test_serves_the_process_registry(self):
+        server = metrics.start_http_server("127.0.0.1", 0)
+        self.assertIs(metrics.start_http_server("127.0.0.1", 0), server)
+        with metrics._Span("render"):
+            pass
+        url = f"http://127.0.0.1:{server.server_port}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            body = response.read().decode("utf-8")
+        self.assertIn('ramadan_span_duration_seconds_count{span="render"}', body)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import datetime
+import gc
+import unittest
+
+from payload_store import PayloadStore
+from prayer_calc import compute_prayer_times
+
+DOUGLASVILLE = (33.7515, -84.7477)
+TZ_NAME = "America/New_York"
+DAYS = [datetime.date(2026, 2, 18) + datetime.timedelta(days=offset) for offset in range(3)]
+
+
+class PayloadStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.store = PayloadStore(maxsize=1)
+
+    def _put(self, date):
+        payload = compute_prayer_times(*DOUGLASVILLE, date, 2, TZ_NAME)
+        return self.store.put(*DOUGLASVILLE, 2, TZ_NAME, date, payload)
+
+    def test_referenced_days_are_pinned_and_released_days_evicted(self):
+        first, second = self._put(DAYS[0]), self._put(DAYS[1])
+        # Over maxsize, but both days are still held by a session
+        self.assertEqual(self.store.memory_report()["entries"], 2)
+        self.assertEqual(self.store.get(first).date, DAYS[0])
+
+        del first
+        gc.collect()
+        third = self._put(DAYS[2])
+        report = self.store.memory_report()
+        self.assertEqual((report["entries"], report["handles"], report["evictions"]), (2, 2, 1))
+        self.assertIsNone(self.store.acquire(*DOUGLASVILLE, 2, TZ_NAME, DAYS[0]))
+        self.assertIsNotNone(self.store.get(second))
+        self.assertIsNotNone(self.store.get(third))
+
+    def test_acquire_adds_a_reference(self):
+        handle = self._put(DAYS[0])
+        again = self.store.acquire(*DOUGLASVILLE, 2, TZ_NAME, DAYS[0])
+        del handle
+        gc.collect()
+        self._put(DAYS[1])
+        self._put(DAYS[2])
+        self.assertEqual(self.store.get(again).date, DAYS[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import datetime
+import unittest
+
+from prayer_calc import POLAR_LATITUDE_STEP, compute_day_hours, compute_prayer_times
+
+try:
+    import numpy
+    import batch
+except ImportError:  # pragma: no cover - optional dependency
+    numpy = None
+
+TROMSO = (69.65, 18.96)
+
+
+class PolarDayNightTest(unittest.TestCase):
+    def test_midnight_sun_and_polar_night_use_nearest_latitude(self):
+        for date in (datetime.date(2026, 6, 21), datetime.date(2026, 12, 21)):
+            with self.subTest(date=date):
+                timings = compute_prayer_times(*TROMSO, date, 3, "Europe/Oslo")["timings"]
+                self.assertEqual(len(timings), 9)
+                for value in timings.values():
+                    self.assertRegex(value, r"^\d{2}:\d{2}$")
+
+    def test_nearest_latitude_is_first_with_sunrise_and_sunset(self):
+        date = datetime.date(2026, 6, 21)
+        hours = compute_day_hours(*TROMSO, date, 3, 2.0)
+        latitude = TROMSO[0]
+        while True:
+            latitude -= POLAR_LATITUDE_STEP
+            nearest = compute_day_hours(latitude, TROMSO[1], date, 3, 2.0)
+            if nearest == hours:
+                break
+            self.assertGreater(latitude, 60)
+
+    def test_southern_hemisphere(self):
+        timings = compute_prayer_times(-75.0, 0.0, datetime.date(2026, 6, 21), 2, "UTC")["timings"]
+        self.assertLess(timings["Sunrise"], timings["Dhuhr"])
+        self.assertLess(timings["Dhuhr"], timings["Maghrib"])
+
+    def test_ordinary_latitudes_unchanged(self):
+        hours = compute_day_hours(33.75, -84.39, datetime.date(2026, 3, 1), 2, -5.0)
+        self.assertAlmostEqual(hours["Sunrise"] % 24, 6.9, delta=0.3)
+
+
+
+@unittest.skipIf(numpy is None, "needs NumPy")
+class BatchPolarTest(unittest.TestCase):
+    def test_batch_matches_scalar_engine_at_high_latitudes(self):
+        locations = [TROMSO, (-75.0, 0.0)]
+        start = datetime.date(2026, 6, 19)
+        table = batch.compute_timetable(
+            [lat for lat, _ in locations], [lon for _, lon in locations], ["Europe/Oslo", "UTC"], 3, start, 5
+        )
+        self.assertTrue(table.valid.all())
+        for i, (lat, lon) in enumerate(locations):
+            for day in range(5):
+                date = start + datetime.timedelta(days=day)
+                expected = compute_prayer_times(lat, lon, date, 3, ["Europe/Oslo", "UTC"][i])["timings"]
+                for name, value in table.timings(i, day).items():
+                    self.assertEqual(value, expected[name])
+
+    def test_uncomputable_cells_are_masked(self):
+        table = batch.compute_timetable([float("nan")], [0.0], ["UTC"], 2, datetime.date(2026, 1, 1), 1)
+        self.assertFalse(table.valid[table.names.index("Maghrib"), 0, 0])
+        self.assertEqual(table["Maghrib"][0, 0], batch.MISSING)
+        self.assertIsNone(table.timings(0, 0)["Maghrib"])
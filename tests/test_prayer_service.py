@@ -0,0 +1,41 @@
+import copy
+import datetime
+import unittest
+from unittest import mock
+
+import prayer_service
+from prayer_calc import compute_prayer_times
+
+DOUGLASVILLE = (33.7515, -84.7477)
+DATE = datetime.date(2026, 2, 18)
+
+
+class VerifyModeTest(unittest.TestCase):
+    def _api_payload(self, shift_minutes):
+        payload = copy.deepcopy(compute_prayer_times(*DOUGLASVILLE, DATE, 2, "America/New_York"))
+        hours, minutes = map(int, payload["timings"]["Maghrib"].split(":"))
+        total = hours * 60 + minutes + shift_minutes
+        payload["timings"]["Maghrib"] = f"{total // 60:02d}:{total % 60:02d}"
+        payload["meta"]["source"] = "api"
+        return payload
+
+    def _verify(self, api_payload):
+        with mock.patch.object(prayer_service, "fetch_api_timings", return_value=api_payload):
+            return prayer_service.compute_local_timings(*DOUGLASVILLE, DATE, 2, "America/New_York", verify=True)
+
+    def test_agreeing_local_times_are_served(self):
+        timings = self._verify(self._api_payload(1))
+        self.assertEqual(timings["meta"]["source"], "local")
+        self.assertEqual(timings["meta"]["verification"]["status"], "ok")
+
+    def test_mismatch_serves_the_api_times_and_is_counted(self):
+        before = prayer_service._verifications["mismatch"]
+        with self.assertLogs(prayer_service.logger, "WARNING"):
+            timings = self._verify(self._api_payload(30))
+        self.assertEqual(timings["meta"]["source"], "api")
+        self.assertEqual(timings["meta"]["verification"], {"status": "mismatch", "max_difference_minutes": 30})
+        self.assertEqual(prayer_service._verifications["mismatch"], before + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
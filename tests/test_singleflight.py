@@ -0,0 +1,43 @@
+import threading
+import time
+import unittest
+
+from singleflight import SingleFlight
+
+
+class SingleFlightTest(unittest.TestCase):
+    def test_concurrent_calls_share_one_upstream_call(self):
+        flight = SingleFlight("test_shared")
+        release = threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            release.wait(5)
+            return "value"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do("key", fetch))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        # Let every caller arrive while the first call is still running
+        deadline = time.monotonic() + 5
+        while flight.stats()["coalesced"] < 4 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(results, ["value"] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.stats(), {"issued": 1, "coalesced": 4, "in_flight": 0})
+
+    def test_errors_reach_every_waiter_and_the_next_call_starts_afresh(self):
+        flight = SingleFlight("test_errors")
+        with self.assertRaises(ValueError):
+            flight.do("key", lambda: int("not a number"))
+        self.assertEqual(flight.do("key", lambda: 42), 42)
+        self.assertEqual(flight.stats()["issued"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+
+from store import Store
+
+KEY = (33.75, -84.75, "2026-02-18", 2, "America/New_York")
+PAYLOAD = {"timings": {"Fajr": "06:19", "Maghrib": "18:27"}, "meta": {"source": "api"}}
+
+
+class StoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.now = 1_000_000.0
+        self.store = Store(os.path.join(self.directory.name, "store.sqlite3"), clock=lambda: self.now)
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def test_geocode_round_trip_and_expiry(self):
+        self.store.put_geocode("douglasville ga", (33.7515, -84.7477, "Douglasville, GA"), ttl=60)
+        self.assertEqual(self.store.get_geocode("douglasville ga"),
+                         (33.7515, -84.7477, "Douglasville, GA", self.now + 60))
+        self.now += 61
+        self.assertIsNone(self.store.get_geocode("douglasville ga"))
+        self.assertEqual(self.store.get_geocode("douglasville ga", allow_expired=True)[2], "Douglasville, GA")
+
+    def test_timings_round_trip(self):
+        self.store.put_timings_many([(KEY, PAYLOAD, 3600)])
+        self.assertEqual(self.store.get_timings(KEY), (PAYLOAD, self.now + 3600))
+        self.assertIsNone(self.store.get_timings(KEY[:2] + ("2026-02-19",) + KEY[3:]))
+
+    def test_reopened_store_keeps_its_rows(self):
+        self.store.put_timings_many([(KEY, PAYLOAD, 3600)])
+        self.store.close()
+        self.store = Store(self.store.path, clock=lambda: self.now)
+        self.assertEqual(self.store.get_timings(KEY)[0], PAYLOAD)
+
+    def test_compaction_removes_rows_expired_past_the_grace(self):
+        self.store.put_geocode("old", (1.0, 2.0, "Old"), ttl=10)
+        self.store.put_geocode("recent", (1.0, 2.0, "Recent"), ttl=100)
+        self.store.put_timings_many([(KEY, PAYLOAD, 10)])
+        self.now += 200
+        self.assertEqual(self.store.compact(grace=150), 2)
+        self.assertEqual(self.store.stats()["geocode_rows"], 1)
+        self.assertEqual(self.store.stats()["timetable_rows"], 0)
+        self.assertIsNotNone(self.store.get_geocode("recent", allow_expired=True))
+
+    def test_stats_degrade_to_none_when_the_database_fails(self):
+        self.assertEqual(self.store.stats()["geocode_rows"], 0)
+        self.store.close()
+        with self.assertLogs("store", "WARNING"):
+            self.assertIsNone(self.store.stats())
+
+
+if __name__ == "__main__":
+    unittest.main()
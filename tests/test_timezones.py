@@ -0,0 +1,26 @@
+import unittest
+
+import timezones
+
+
+class InferTimezoneTest(unittest.TestCase):
+    def test_border_towns_get_their_own_zone(self):
+        # Laughlin, NV and Bullhead City, AZ face each other across the Colorado
+        cases = {
+            (35.167, -114.573): "America/Los_Angeles",
+            (35.147, -114.568): "America/Phoenix",
+            (42.331, -83.046): "America/Detroit",
+            (42.317, -83.036): "America/Toronto",
+        }
+        for (lat, lon), tz_name in cases.items():
+            with self.subTest(lat=lat, lon=lon):
+                self.assertEqual(timezones.infer_timezone(lat, lon), tz_name)
+
+    def test_single_zone_cells_and_sea(self):
+        self.assertEqual(timezones.infer_timezone(21.42, 39.83), "Asia/Riyadh")
+        # Mid-Pacific: no map cell and no city nearby
+        self.assertEqual(timezones.infer_timezone(0.0, -140.0), "Etc/GMT+9")
+
+
+if __name__ == "__main__":
+    unittest.main()
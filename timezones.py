@@ -0,0 +1,211 @@
+"""Timezone service: memoized zone objects and inference from coordinates.
+
+Every zone lookup in the app goes through ``get_zone``, which returns a
+memoized stdlib ``ZoneInfo``, so a rerun never rebuilds a zone. The
+helpers below build local datetimes with ``combine(..., tzinfo=zone)``
+and measure spans through epoch seconds: aware datetimes that share a
+``ZoneInfo`` subtract as wall-clock times, which is an hour off across
+a DST change.
+
+A point's zone comes from the bundled timezone map
+(``data/timezone_map.txt.gz``, built by scripts/build_timezone_map.py
+from the timezone-boundary-builder polygons). The map stores one zone
+for each 1-degree cell that lies in a single zone, and simplified border
+polygons for the cells a border crosses, so a point-in-polygon test is
+only needed near borders. At sea, or without the map file, the zone of
+the nearest city in the gazetteer is used, and far from any city the
+nautical zone derived from the longitude. Results are memoized per
+~100 m cell, so repeated lookups for the same place are a dictionary
+hit.
+"""
+import datetime
+import functools
+import gzip
+import logging
+import math
+import threading
+import zoneinfo
+from array import array
+
+import config
+
+logger = logging.getLogger(__name__)
+
+# Decimal places of the coordinates that share a memoized answer (3 ~ 100 m,
+# finer than the map's simplified borders)
+CELL_PRECISION = 3
+
+# Border polygon points are stored in 1/MAP_SCALE degree from their cell's corner
+MAP_SCALE = 10000
+
+# Shown first in the sidebar; every other IANA name follows alphabetically
+COMMON_TIMEZONES = (
+    'US/Eastern', 'US/Central', 'US/Mountain', 'US/Pacific',
+    'US/Alaska', 'US/Hawaii', 'Europe/London', 'Europe/Paris',
+    'Asia/Dubai', 'Asia/Karachi', 'Asia/Kolkata', 'Asia/Singapore',
+    'Australia/Sydney',
+)
+
+
+@functools.lru_cache(maxsize=None)
+def get_zone(tz_name):
+    """``ZoneInfo`` for an IANA name; raises ``zoneinfo.ZoneInfoNotFoundError`` if unknown."""
+    return zoneinfo.ZoneInfo(tz_name)
+
+
+def is_valid_timezone(tz_name):
+    try:
+        get_zone(tz_name)
+    except (zoneinfo.ZoneInfoNotFoundError, ValueError, TypeError):
+        return False
+    return True
+
+
+@functools.lru_cache(maxsize=1)
+def timezone_names():
+    """Every available IANA name, the common ones first."""
+    common = [name for name in COMMON_TIMEZONES if is_valid_timezone(name)]
+    return tuple(common) + tuple(sorted(zoneinfo.available_timezones() - set(common)))
+
+
+def now_in(tz_name):
+    """The current time in ``tz_name``."""
+    return datetime.datetime.now(get_zone(tz_name))
+
+
+def today_in(tz_name):
+    return now_in(tz_name).date()
+
+
+def localize(date, clock, tz_name):
+    """``date`` at wall-clock time ``clock`` in ``tz_name``."""
+    return datetime.datetime.combine(date, clock, tzinfo=get_zone(tz_name))
+
+
+def next_midnight(tz_name, now=None):
+    """The first local midnight in ``tz_name`` after ``now`` (an aware datetime, default now)."""
+    now = now_in(tz_name) if now is None else now.astimezone(get_zone(tz_name))
+    return localize(now.date() + datetime.timedelta(days=1), datetime.time(0, 0), tz_name)
+
+
+def seconds_until_midnight(tz_name, now=None):
+    """Real seconds until the next midnight in ``tz_name``, DST included."""
+    now = now_in(tz_name) if now is None else now
+    return max(next_midnight(tz_name, now).timestamp() - now.timestamp(), 0.0)
+
+
+def nautical_timezone(lon):
+    """Etc/GMT zone for a longitude; note the POSIX sign inversion."""
+    offset = int(round(lon / 15.0))
+    if offset == 0:
+        return "Etc/GMT"
+    return f"Etc/GMT{-offset:+d}"
+
+
+def _inside(ring, x, y):
+    """Even-odd ray cast against a flat ``x0, y0, x1, y1, ...`` ring."""
+    inside = False
+    x1, y1 = ring[-2], ring[-1]
+    for i in range(0, len(ring), 2):
+        x2, y2 = ring[i], ring[i + 1]
+        if (y2 > y) != (y1 > y) and x < x1 + (x2 - x1) * (y - y1) / (y2 - y1):
+            inside = not inside
+        x1, y1 = x2, y2
+    return inside
+
+
+class TimezoneMap:
+    """Zones of the world in 1-degree cells (see scripts/build_timezone_map.py)."""
+
+    def __init__(self, path):
+        self.zones = []
+        self._uniform = {}
+        # Border cell -> [default zone id, "P" lines, parsed lazily into {zone id: [rings]}]
+        self._borders = {}
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            border = None
+            for line in f:
+                kind = line[:1]
+                if kind == "P":
+                    border[1].append(line)
+                elif kind == "C":
+                    _, lat, lon, zone = line.split()
+                    self._uniform[(int(lat), int(lon))] = int(zone)
+                elif kind == "B":
+                    _, lat, lon, zone = line.split()
+                    border = self._borders[(int(lat), int(lon))] = [int(zone), []]
+                elif kind == "Z":
+                    _, zone, name = line.split()
+                    if int(zone) != len(self.zones):
+                        raise ValueError(f"{path}: zone {zone} is out of sequence")
+                    self.zones.append(name)
+
+    def _rings(self, border):
+        rings = border[1]
+        if isinstance(rings, list):
+            parsed = {}
+            for line in rings:
+                _, zone, *values = line.split()
+                # Points after the first are stored as steps from the one before
+                ring = array("l", map(int, values))
+                for i in range(2, len(ring)):
+                    ring[i] += ring[i - 2]
+                parsed.setdefault(int(zone), []).append(ring)
+            # Replacing the lines with their parsed form is safe to race on
+            rings = border[1] = parsed
+        return rings
+
+    def zone_at(self, lat, lon):
+        """IANA name of the zone at a point, or None at sea."""
+        lon = (lon + 180.0) % 360.0 - 180.0
+        cell = (math.floor(lat), math.floor(lon))
+        zone = self._uniform.get(cell)
+        if zone is not None:
+            return self.zones[zone]
+        border = self._borders.get(cell)
+        if border is None:
+            return None
+        x, y = (lon - cell[1]) * MAP_SCALE, (lat - cell[0]) * MAP_SCALE
+        # Zones come in the order they are stored, enclosed zones before the ones around them
+        for zone, rings in self._rings(border).items():
+            # Holes are rings too: inside an odd number of a zone's rings is inside the zone
+            if sum(_inside(ring, x, y) for ring in rings) % 2:
+                return self.zones[zone]
+        return self.zones[border[0]]
+
+
+_map = None
+_map_lock = threading.Lock()
+
+
+def get_map():
+    """The process-wide timezone map, loaded on first use (None without its data file)."""
+    global _map
+    if _map is None:
+        with _map_lock:
+            if _map is None:
+                try:
+                    _map = TimezoneMap(config.TIMEZONE_MAP_PATH)
+                except OSError:
+                    logger.warning("No timezone map at %s; using the nearest city's zone", config.TIMEZONE_MAP_PATH)
+                    _map = False
+    return _map or None
+
+
+@functools.lru_cache(maxsize=config.TIMEZONE_CACHE_SIZE)
+def _infer_cell(lat, lon):
+    zone_map = get_map()
+    tz_name = zone_map.zone_at(lat, lon) if zone_map else None
+    if tz_name is not None:
+        return tz_name
+    # Imported here: gazetteer imports cache, which uses the zone helpers above
+    import gazetteer
+    index = gazetteer.get_gazetteer().nearest(lat, lon)
+    if index is None:
+        return nautical_timezone(lon)
+    return gazetteer.get_gazetteer().timezone(index)
+
+
+def infer_timezone(lat, lon):
+    """IANA timezone name for a point."""
+    return _infer_cell(round(float(lat), CELL_PRECISION), round(float(lon), CELL_PRECISION))